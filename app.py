@@ -1,6 +1,6 @@
 import streamlit as st
 from src.auth.database import AuthDatabase
-from config import MONGODB_URI, MONGODB_DB_NAME
+from config import MONGODB_URI, MONGODB_DB_NAME, ALLOWED_EXTENSIONS, DEDUP_ENABLED
 import time
 import tempfile
 import os
@@ -350,6 +350,12 @@ def init_database():
 
 db = init_database()
 
+# One vector store (embedding model, worker pool, query batcher) shared by every upload
+@st.cache_resource
+def init_vector_store():
+    from src.embeddings.vector_store_simple import VectorStore
+    return VectorStore()
+
 # Render header
 def render_header():
     cols = st.columns([1, 2, 1])
@@ -435,11 +441,11 @@ def show_home_page():
     st.markdown('<div class="modern-container">', unsafe_allow_html=True)
     
     st.markdown("## Upload your book")
-    st.markdown("Upload a PDF or TXT file and get an AI-generated summary in seconds.")
+    st.markdown("Upload a PDF, EPUB, HTML or TXT file and get an AI-generated summary in seconds.")
     
     uploaded_file = st.file_uploader(
         "Choose a file",
-        type=['pdf', 'txt'],
+        type=ALLOWED_EXTENSIONS,
         label_visibility="collapsed"
     )
     
@@ -471,7 +477,7 @@ def show_processing_page():
     
     if 'uploaded_file' in st.session_state:
         from src.document_processor.extractor import DocumentExtractor
-        from src.embeddings.vector_store_simple import VectorStore
+        from src.document_processor.extraction_cache import ExtractionCache
         from src.summarizer.groq_summarizer import GroqSummarizer
         
         # User prompt
@@ -507,7 +513,7 @@ def show_processing_page():
                     
                     # Initialize components
                     extractor = DocumentExtractor()
-                    vector_store = VectorStore()
+                    vector_store = init_vector_store()
                     summarizer = GroqSummarizer()
 
                     if not summarizer.initialized:
@@ -519,17 +525,33 @@ def show_processing_page():
                     progress_bar.progress(10)
                     
                     file_type = st.session_state.uploaded_file.name.split('.')[-1].lower()
-                    text = extractor.extract_text(tmp_path, file_type)
+                    extraction_cache = ExtractionCache()
+                    digest = ExtractionCache.hash_bytes(st.session_state.uploaded_file.getvalue())
+                    cache_key = ExtractionCache.key_for(digest, extractor.cache_signature())
+                    cached = extraction_cache.get(cache_key)
+                    
+                    if cached:
+                        # Same file seen before: reuse its cleaned text and chunks
+                        text = cached["text"]
+                        chunks = cached["chunks"]
+                        st.info(f"⚡ Loaded {len(text)} characters and {len(chunks)} chunks from cache")
+                    else:
+                        text = extractor.extract_text(tmp_path, file_type)
+                        chunks = None
                     
                     if text:
-                        st.info(f"📊 Extracted {len(text)} characters")
-                        
-                        # Step 2: Split into chunks
-                        status_text.text("✂️ Creating chunks...")
-                        progress_bar.progress(30)
-                        
-                        chunks = extractor.chunk_text(text)
-                        st.info(f"📑 Created {len(chunks)} chunks")
+                        if chunks is None:
+                            st.info(f"📊 Extracted {len(text)} characters")
+                            
+                            # Step 2: Split into chunks
+                            status_text.text("✂️ Creating chunks...")
+                            progress_bar.progress(30)
+                            
+                            chunks = extractor.chunk_spans(text)
+                            if DEDUP_ENABLED:
+                                chunks = list(extractor.deduplicate(chunks))
+                            extraction_cache.put(cache_key, text, chunks, extractor.extraction_metadata, extractor.duplicates)
+                            st.info(f"📑 Created {len(chunks)} chunks")
                         
                         # Step 3: Store in vector database
                         status_text.text("📦 Storing in vector database...")
@@ -539,7 +561,8 @@ def show_processing_page():
                             chunks=chunks,
                             metadata={"source": "upload"},
                             user_email=st.session_state.user_email,
-                            book_title=st.session_state.uploaded_file.name
+                            book_title=st.session_state.uploaded_file.name,
+                            content_id=digest
                         )
                         
                         if store_success:
@@ -1,18 +1,21 @@
 import os
-import shutil
 import tempfile
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import uvicorn
 
 # Imports from existing logic
+from config import (ALLOWED_EXTENSIONS, SEARCH_BATCH_MAX_QUERIES, SEARCH_MAX_TOP_K, PASSAGE_MERGING_ENABLED,
+                    PASSAGE_CANDIDATES_FACTOR)
 from src.auth.database import AuthDatabase
 from src.document_processor.extractor import DocumentExtractor
+from src.document_processor.extraction_cache import ExtractionCache
 from src.embeddings.vector_store_simple import VectorStore
 from src.summarizer.groq_summarizer import GroqSummarizer
+from src.summarizer.passage_merger import merge_passages
 
 app = FastAPI(title="BookSum API")
 
@@ -25,10 +28,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global services
-db = AuthDatabase()
+# Global services; the vector store comes first because its embedding pool forks,
+# which is only safe before other clients (pymongo's monitor threads) have started threads
 vector_store = VectorStore()
+db = AuthDatabase()
 summarizer = GroqSummarizer()
+extraction_cache = ExtractionCache()
 
 # Pydantic Models
 class LoginRequest(BaseModel):
@@ -53,6 +58,11 @@ class GenerateRequest(BaseModel):
     # `results = self.index.query(..., filter={"user_email": {"$eq": user_email}}, ...)`
     # Yes, it searches all user's chunks.
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    # Hybrid search fetches HYBRID_CANDIDATES_FACTOR x top_k candidates per query
+    top_k: int = Field(5, ge=1, le=SEARCH_MAX_TOP_K)
+
 class SummaryResponse(BaseModel):
     summary: str
     chunks: List[dict]
@@ -125,32 +135,51 @@ async def process_book(
 ):
     # Save to temp file
     file_ext = file.filename.split('.')[-1].lower()
-    if file_ext not in ['pdf', 'txt']:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Unsupported file format")
     
     with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_ext}") as tmp:
-        shutil.copyfileobj(file.file, tmp)
+        digest = ExtractionCache.copy_and_hash(file.file, tmp)
         tmp_path = tmp.name
 
+    cache_entry = None
     try:
         extractor = DocumentExtractor()
-        text = extractor.extract_text(tmp_path, file_ext)
-        
-        if not text:
-            raise HTTPException(status_code=400, detail="Failed to extract text")
+        cache_key = ExtractionCache.key_for(digest, extractor.cache_signature())
+        cached = extraction_cache.lookup(cache_key)
         
-        chunks = extractor.chunk_text(text)
+        if cached:
+            # Same file seen before: skip extraction and replay its cached chunks
+            chunks = extraction_cache.iter_chunks(cache_key)
+        else:
+            # Pages are extracted, cleaned, chunked, embedded and upserted as one stream,
+            # so the whole book is never held in memory at once
+            cache_entry = extraction_cache.writer(cache_key)
+            chunks = extractor.stream_chunks(tmp_path, file_ext, cache_entry)
         
-        # Store in vector store
-        success = vector_store.store_chunks(
+        stats = vector_store.store_chunk_stream(
             chunks=chunks,
             metadata={"source": "api_upload"},
             user_email=email,
-            book_title=file.filename
+            book_title=file.filename,
+            content_id=digest
         )
         
-        if not success:
+        if stats is None:
+            # A failed extraction stops the ingest before stale chunks are deleted or the
+            # manifest is replaced; the finally below discards the partial cache entry
+            if extractor.extraction_error:
+                raise HTTPException(status_code=400, detail=f"Failed to extract text: {extractor.extraction_error}")
             raise HTTPException(status_code=500, detail="Failed to store chunks in vector db")
+        
+        text_length = cached["text_length"] if cached else extractor.text_length
+        if not text_length:
+            raise HTTPException(status_code=400, detail="Failed to extract text")
+        
+        extraction = cached.get("extraction", {}) if cached else extractor.extraction_metadata
+        if cache_entry:
+            cache_entry.commit(extraction)
+            cache_entry = None
             
         # Update stats
         db.increment_books_processed(email)
@@ -158,13 +187,44 @@ async def process_book(
         return {
             "message": "Book processed successfully",
             "filename": file.filename,
-            "chunks_count": len(chunks),
-            "text_length": len(text)
+            "chunks_count": stats["chunks"],
+            "chunks_embedded": stats["embedded"],
+            "chunks_deleted": stats["deleted"],
+            "text_length": text_length,
+            "cached": bool(cached),
+            "extraction": extraction
         }
         
     finally:
+        if cache_entry:
+            cache_entry.discard()
         os.unlink(tmp_path)
 
+@app.get("/cache/stats")
+def get_cache_stats(email: str = Depends(get_current_user_email)):
+    return {
+        "extraction": extraction_cache.stats(),
+        "embedding": vector_store.embedding_cache.stats() if vector_store.embedding_cache else None,
+        "query": vector_store.query_cache_stats(),
+        "chunk_text": vector_store.chunk_store.stats() if vector_store.chunk_store else None
+    }
+
+@app.post("/search/batch")
+def search_batch(
+    req: BatchSearchRequest,
+    email: str = Depends(get_current_user_email)
+):
+    if not req.queries:
+        raise HTTPException(status_code=400, detail="No queries given")
+    if len(req.queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {SEARCH_BATCH_MAX_QUERIES} queries per request")
+        
+    # All queries are embedded and scored together
+    response = vector_store.search_similar_chunks_many(req.queries, email, top_k=req.top_k)
+    if response is None:
+        raise HTTPException(status_code=500, detail="Search failed")
+    return response
+
 @app.post("/generate")
 def generate_summary(
     req: GenerateRequest,
@@ -178,11 +238,18 @@ def generate_summary(
     results = vector_store.search_similar_chunks(
         query=req.prompt,
         user_email=email,
-        top_k=5
+        top_k=5 * PASSAGE_CANDIDATES_FACTOR if PASSAGE_MERGING_ENABLED else 5
     )
     
     if not results:
          raise HTTPException(status_code=404, detail="No relevant context found. Try processing a book first.")
+    
+    # Merge overlapping neighbours into passages, using the freed room for more hits
+    context_stats = None
+    if PASSAGE_MERGING_ENABLED:
+        results, context_stats = merge_passages(results, top_k=5)
+        print(f"🧩 {context_stats['hits_used']} hits in {context_stats['passages']} passages, "
+              f"~{context_stats['tokens_saved']} prompt tokens saved")
          
     # Generate summary
     summary_text = summarizer.generate_summary(results, req.prompt)
@@ -228,6 +295,7 @@ def generate_summary(
     return {
         "summary": summary_text,
         "results": results,
+        "context": context_stats,
         "history_id": "saved"
     }
 
@@ -0,0 +1,87 @@
+"""Benchmark recall@k and latency of the local IVF index against exact search.
+
+Run from the backend directory:
+    python benchmarks/bench_ann.py [--vectors 1000000] [--queries 200] [--k 10]
+
+A synthetic corpus of topic clusters (384-d, like all-MiniLM-L6-v2 embeddings) is
+loaded into one user partition of LocalIndex. The exact scan is the ground
+truth; each nprobe setting reports recall@k and mean query latency.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Build the IVF index regardless of the configured threshold
+os.environ["LOCAL_ANN_ENABLED"] = "true"
+os.environ["LOCAL_ANN_MIN_VECTORS"] = "1"
+
+from src.embeddings.local_index import LocalIndex
+
+DIMENSION = 384
+
+
+def sample(centres: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Normalised points scattered around random topic centres"""
+    points = np.empty((count, DIMENSION), dtype=np.float32)
+    for start in range(0, count, 65536):
+        end = min(start + 65536, count)
+        labels = rng.integers(0, len(centres), end - start)
+        points[start:end] = centres[labels] + rng.standard_normal((end - start, DIMENSION), dtype=np.float32) * 1.5
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    return points
+
+
+def timed_queries(index: LocalIndex, queries: np.ndarray, k: int, **kwargs):
+    """Result ids per query and mean latency in milliseconds"""
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        response = index.query(query, top_k=k, filter={"user_email": {"$eq": "bench"}}, **kwargs)
+        results.append({match.id for match in response.matches})
+    return results, (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    centres = rng.standard_normal((max(1, args.vectors // 500), DIMENSION)).astype(np.float32)
+    corpus = sample(centres, args.vectors, rng)
+    # Queries are fresh draws from the same topics, not copies of stored vectors
+    queries = sample(centres, args.queries, rng)
+
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalIndex(path, dimension=DIMENSION)
+        partition = index._partition("bench")
+
+        started = time.perf_counter()
+        partition.upsert([str(i) for i in range(len(corpus))], corpus, [{}] * len(corpus))
+        print(f"Indexed {len(corpus):,} vectors in {time.perf_counter() - started:.1f}s "
+              f"({partition.ivf.nlist} IVF cells)")
+
+        # Ground truth from the exact scan
+        ivf, partition.ivf = partition.ivf, None
+        truth, exact_ms = timed_queries(index, queries, args.k)
+        partition.ivf = ivf
+        print(f"exact       recall@{args.k}=1.000  {exact_ms:8.2f} ms/query")
+
+        for nprobe in (1, 2, 4, 8, 16, 32, 64):
+            if nprobe > ivf.nlist:
+                break
+            results, ivf_ms = timed_queries(index, queries, args.k, nprobe=nprobe)
+            recall = np.mean([len(got & want) / args.k for got, want in zip(results, truth)])
+            print(f"nprobe={nprobe:<4} recall@{args.k}={recall:.3f}  {ivf_ms:8.2f} ms/query "
+                  f"({exact_ms / ivf_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark what hybrid (BM25 + vector) retrieval adds on top of vector search.
+
+Run from the backend directory:
+    python benchmarks/bench_hybrid_search.py [--chunks 50000] [--books 5] [--queries 300]
+
+A synthetic library (Zipf-distributed vocabulary, ~150 words per chunk) is
+ingested for one user through VectorStore with the local index, which also
+builds the per-book BM25 segments. Queries of 2-5 words are then run in
+"dense" and "hybrid" mode with the result cache off; query embeddings come
+from a stand-in encoder so only retrieval is timed. The lexical lookup alone
+is timed too, and the lexical index size is reported per chunk.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ["QUERY_CACHE_ENABLED"] = "false"
+os.environ["EMBED_BATCHING_ENABLED"] = "false"
+for setting in ("LOCAL_INDEX_DIR", "LEXICAL_INDEX_DIR", "BOOK_MANIFEST_DIR"):
+    os.environ[setting] = tempfile.mkdtemp(prefix="bench-hybrid-")
+
+from src.embeddings.vector_store_simple import VectorStore
+
+
+def stand_in_embeddings(texts):
+    return [np.random.default_rng(zlib.crc32(text.encode())).standard_normal(384).astype(np.float32)
+            for text in texts]
+
+
+def percentiles(samples):
+    samples = np.array(samples) * 1000
+    return f"p50 {np.percentile(samples, 50):7.2f} ms  p95 {np.percentile(samples, 95):7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--vocabulary", type=int, default=30000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    words = np.array([f"w{i}" for i in range(args.vocabulary)])
+    store = VectorStore()
+    store.generate_embeddings = store.generate_query_embeddings = stand_in_embeddings
+
+    started = time.perf_counter()
+    per_book = args.chunks // args.books
+    for book in range(args.books):
+        chunks = (" ".join(words[np.minimum(rng.zipf(1.2, 150), args.vocabulary) - 1]) for _ in range(per_book))
+        with contextlib.redirect_stdout(io.StringIO()):
+            store.store_chunk_stream(chunks, {}, "reader@bench", f"Book {book}")
+    print(f"Ingested {per_book * args.books:,} chunks in {args.books} books: {time.perf_counter() - started:.1f}s")
+    lexical_bytes = store.lexical_index.stats("reader@bench")["bytes"]
+    print(f"Lexical index: {lexical_bytes / 2 ** 20:.1f} MB ({lexical_bytes / (per_book * args.books):.0f} bytes/chunk)")
+
+    queries = [" ".join(words[rng.integers(0, 3000, rng.integers(2, 6))]) for _ in range(args.queries)]
+    store.lexical_index.search(queries[0], "reader@bench", 20)  # load the segments
+
+    timings = {"dense": [], "hybrid": [], "bm25 only": []}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query in queries:
+            for mode in ("dense", "hybrid"):
+                started = time.perf_counter()
+                store.search_similar_chunks(query, "reader@bench", top_k=5, mode=mode)
+                timings[mode].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            store.lexical_index.search(query, "reader@bench", 20)
+            timings["bm25 only"].append(time.perf_counter() - started)
+
+    for name, samples in timings.items():
+        print(f"{name:<10} {percentiles(samples)}")
+    added = np.median(timings["hybrid"]) - np.median(timings["dense"])
+    print(f"hybrid adds {added * 1000:.2f} ms at the median ({added / np.median(timings['dense']):.0%})")
+
+
+if __name__ == "__main__":
+    main()
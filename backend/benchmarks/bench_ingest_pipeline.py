@@ -0,0 +1,70 @@
+"""Benchmark pipelined ingest (embed while upserting) against the sequential path.
+
+Run from the backend directory:
+    python benchmarks/bench_ingest_pipeline.py [--chunks 3000] [--upsert-ms 150] [--embed-ms 1.5]
+                                               [--concurrency 4] [--failure-rate 0.05]
+
+The local index is wrapped in LatencyInjectingIndex so every upsert costs
+--upsert-ms and fails with --failure-rate (exercising per-batch retries).
+Without sentence-transformers, embedding is simulated at --embed-ms per chunk.
+The ideal pipelined time is max(embed, upload); sequential is their sum.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ["LOCAL_INDEX_DIR"] = tempfile.mkdtemp(prefix="bench-ingest-")
+
+from src.embeddings import vector_store_simple
+from src.embeddings.latency_index import LatencyInjectingIndex
+from src.embeddings.vector_store_simple import VectorStore
+from config import INGEST_BATCH_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--upsert-ms", type=float, default=150)
+    parser.add_argument("--embed-ms", type=float, default=1.5, help="simulated per-chunk cost without a model")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    store = VectorStore()
+    if store.embedding_model is None:
+        def simulated_embeddings(texts):
+            time.sleep(args.embed_ms / 1000 * len(texts))
+            return np.random.randn(len(texts), 384).astype(np.float32).tolist()
+        store.generate_embeddings = simulated_embeddings
+    store.index = LatencyInjectingIndex(store.index, args.upsert_ms, args.failure_rate, seed=1)
+    vector_store_simple.INGEST_RETRY_BACKOFF = 0.05
+
+    chunks = [f"chunk {i} " + "lorem ipsum dolor sit amet " * 18 for i in range(args.chunks)]
+    batches = -(-args.chunks // INGEST_BATCH_SIZE)
+    results = {}
+    for name, concurrency in (("sequential", 0), (f"pipelined x{args.concurrency}", args.concurrency)):
+        stats = store.store_chunk_stream(
+            iter(chunks), {}, f"{name}@bench", "Bench Book", upsert_concurrency=concurrency)
+        if stats is None:
+            print(f"❌ {name}: ingest failed after retries")
+            sys.exit(1)
+        results[name] = stats
+        print(f"{name:<14} {stats['total_seconds']:7.2f}s  embed {stats['embed_seconds']:.2f}s  "
+              f"first vector {stats['first_upsert_seconds']:.2f}s  retries {stats['upsert_retries']}  "
+              f"stored {stats['chunks']}/{args.chunks}")
+
+    embed = results["sequential"]["embed_seconds"]
+    upload = batches * args.upsert_ms / 1000
+    print(f"embed {embed:.2f}s + upload {upload:.2f}s = {embed + upload:.2f}s sequential; "
+          f"ideal pipelined max(embed, upload / {args.concurrency}) = {max(embed, upload / args.concurrency):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
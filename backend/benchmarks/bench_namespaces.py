@@ -0,0 +1,94 @@
+"""Benchmark per-user namespaces against one shared, user-filtered namespace.
+
+Run from the backend directory:
+    python benchmarks/bench_namespaces.py [--users 200] [--vectors-per-user 500] [--per-vector-us 0.5]
+
+Vectors for --users users are written to the shared namespace of a local
+index wrapped in LatencyInjectingIndex, which charges every query
+--per-vector-us per vector in the namespace it searches (the cost model of a
+serverless index). Searches are timed in shared mode, the vectors are moved
+with tools/migrate_namespaces.py, and the same searches are timed again in
+per-user namespaces, checking they return the same chunks.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ["QUERY_CACHE_ENABLED"] = "false"
+os.environ["EMBED_BATCHING_ENABLED"] = "false"
+os.environ["RETRIEVAL_MODE"] = "dense"
+os.environ["LOCAL_INDEX_DIR"] = tempfile.mkdtemp(prefix="bench-namespaces-")
+
+from src.embeddings.latency_index import LatencyInjectingIndex
+from src.embeddings.vector_store_simple import VectorStore
+from tools.migrate_namespaces import migrate
+
+
+def timed_searches(store, users, queries):
+    latencies, results = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for user_email, query in zip(users, queries):
+            started = time.perf_counter()
+            results.append([chunk["id"] for chunk in store.search_similar_chunks(query, user_email, top_k=5)])
+            latencies.append(time.perf_counter() - started)
+    return np.array(latencies) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--vectors-per-user", type=int, default=500)
+    parser.add_argument("--per-vector-us", type=float, default=0.5)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    store = VectorStore()
+    store.index = LatencyInjectingIndex(store.index, latency_ms=0, per_vector_us=args.per_vector_us)
+    query_vectors = {}
+    store.generate_query_embeddings = lambda texts: [query_vectors[text] for text in texts]
+
+    # Legacy layout: everyone's vectors in the shared namespace
+    store.namespaces = False
+    for user in range(args.users):
+        user_email = f"user{user}@bench"
+        book_id = store.book_id_for(user_email, "Book")
+        store.index.upsert([{
+            "id": f"{book_id}_{i}",
+            "values": rng.standard_normal(384).tolist(),
+            "metadata": {"user_email": user_email, "book_id": book_id, "book_title": "Book", "chunk_index": i},
+        } for i in range(args.vectors_per_user)])
+    total = args.users * args.vectors_per_user
+    print(f"{args.users} users x {args.vectors_per_user} vectors = {total:,} vectors, "
+          f"{args.per_vector_us} us per vector scanned")
+
+    users = [f"user{rng.integers(args.users)}@bench" for _ in range(args.queries)]
+    queries = [f"query {i}" for i in range(args.queries)]
+    query_vectors.update((query, rng.standard_normal(384).tolist()) for query in queries)
+
+    shared_ms, shared_results = timed_searches(store, users, queries)
+    print(f"shared namespace + filter  p50 {np.median(shared_ms):7.2f} ms  p95 {np.percentile(shared_ms, 95):7.2f} ms")
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = migrate(store, batch_size=1000)
+    print(f"migrated {stats['moved']:,} vectors of {stats['users']} users in {time.perf_counter() - started:.1f}s")
+
+    store.namespaces = True
+    namespaced_ms, namespaced_results = timed_searches(store, users, queries)
+    print(f"per-user namespaces        p50 {np.median(namespaced_ms):7.2f} ms  "
+          f"p95 {np.percentile(namespaced_ms, 95):7.2f} ms  same results: {shared_results == namespaced_results}")
+    print(f"shared namespace left: {store.index.namespace_size(''):,} vectors")
+
+
+if __name__ == "__main__":
+    main()
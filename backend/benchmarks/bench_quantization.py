@@ -0,0 +1,80 @@
+"""Benchmark memory per vector and recall of int8-quantized local index storage.
+
+Run from the backend directory:
+    python benchmarks/bench_quantization.py [--vectors 200000] [--queries 200] [--k 10]
+
+One synthetic corpus (384-d, topic clusters) is stored in a LocalIndex
+partition with LOCAL_QUANTIZATION=int8, which keeps both the float16 rows and
+the int8 codes. Ground truth is an exact float32 search; each mode reports the
+bytes a search reads per vector, recall@k and mean query latency.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LOCAL_ANN_ENABLED"] = "false"
+os.environ["LOCAL_QUANTIZATION"] = "int8"
+
+from src.embeddings import local_index
+from src.embeddings.local_index import LocalIndex
+
+DIMENSION = 384
+
+
+def sample(centres: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Normalised points scattered around random topic centres"""
+    points = centres[rng.integers(0, len(centres), count)]
+    points = points + rng.standard_normal(points.shape, dtype=np.float32) * 1.5
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+def run(index: LocalIndex, queries: np.ndarray, truth, k: int):
+    """Recall@k against the float32 ground truth and mean latency in milliseconds"""
+    recalls = []
+    started = time.perf_counter()
+    for query, want in zip(queries, truth):
+        response = index.query(query, top_k=k, filter={"user_email": "bench"})
+        recalls.append(len({int(match.id) for match in response.matches} & want) / k)
+    return float(np.mean(recalls)), (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    centres = rng.standard_normal((max(1, args.vectors // 500), DIMENSION)).astype(np.float32)
+    corpus = sample(centres, args.vectors, rng)
+    queries = sample(centres, args.queries, rng)
+    truth = [set(np.argpartition(-(corpus @ query), args.k)[:args.k]) for query in queries]
+
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalIndex(path, dimension=DIMENSION)
+        partition = index._partition("bench")
+        for start in range(0, len(corpus), 10000):
+            end = min(start + 10000, len(corpus))
+            partition.upsert([str(i) for i in range(start, end)], corpus[start:end], [{}] * (end - start))
+
+        codes, scales = partition.codes, partition.scales
+        print(f"{'mode':<22}{'bytes/vector':>13}{'vs float32':>11}{'recall@' + str(args.k):>11}{'ms/query':>10}")
+        modes = [("float16 exact", None, None), ("int8, no rescoring", 1, codes), ("int8 + rescore x4", 4, codes),
+                 ("int8 + rescore x10", 10, codes)]
+        for name, factor, mode_codes in modes:
+            partition.codes = mode_codes
+            partition.scales = scales if mode_codes is not None else None
+            local_index.LOCAL_RESCORE_FACTOR = factor or 1
+            recall, latency = run(index, queries, truth, args.k)
+            per_vector = partition.bytes_per_vector()
+            print(f"{name:<22}{per_vector:>13}{DIMENSION * 4 / per_vector:>10.1f}x{recall:>11.3f}{latency:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
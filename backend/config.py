@@ -13,11 +13,125 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "book-summaries")
 
+# Vector Backend Configuration
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()  # "pinecone" or "local"
+# Simulated network latency / failures in front of the index, for testing ingest and search locally
+VECTOR_INDEX_LATENCY_MS = float(os.getenv("VECTOR_INDEX_LATENCY_MS", "0"))
+VECTOR_INDEX_FAILURE_RATE = float(os.getenv("VECTOR_INDEX_FAILURE_RATE", "0"))
+VECTOR_INDEX_PER_VECTOR_US = float(os.getenv("VECTOR_INDEX_PER_VECTOR_US", "0"))  # query cost per vector in the namespace
+# "user": one namespace per user (queries only touch that user's vectors); "shared": one namespace filtered by user_email
+VECTOR_NAMESPACES = os.getenv("VECTOR_NAMESPACES", "user").lower()
+LOCAL_INDEX_DIR = os.getenv(
+    "LOCAL_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "vectors")
+)
+LOCAL_TOMBSTONE_MAX_RATIO = 0.2  # deleted rows tolerated before a partition is compacted
+# Users with this many vectors are searched through an IVF (approximate) index
+LOCAL_ANN_ENABLED = os.getenv("LOCAL_ANN_ENABLED", "true").lower() == "true"
+LOCAL_ANN_MIN_VECTORS = int(os.getenv("LOCAL_ANN_MIN_VECTORS", "50000"))
+LOCAL_ANN_NLIST = int(os.getenv("LOCAL_ANN_NLIST", "0"))  # cells; 0 = sqrt(vectors)
+LOCAL_ANN_NPROBE = int(os.getenv("LOCAL_ANN_NPROBE", "16"))  # cells scanned per query (recall vs latency)
+LOCAL_ANN_REBUILD_GROWTH = 2.0  # retrain the quantizer once the partition grows by this factor
+# "int8" scores candidates on int8 codes (~4x less memory than float32) and rescores the best
+LOCAL_QUANTIZATION = os.getenv("LOCAL_QUANTIZATION", "none").lower()  # "none" or "int8"
+LOCAL_RESCORE_FACTOR = 4  # candidates rescored at full precision per requested result
+
 # Application Configuration
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB in bytes
-ALLOWED_EXTENSIONS = ['pdf', 'txt']
+ALLOWED_EXTENSIONS = ['pdf', 'txt', 'epub', 'html', 'htm']
 CHUNK_SIZE = 500  # characters per chunk
-CHUNK_OVERLAP = 50  # overlap between chunks
+CHUNK_OVERLAP = 50  # characters shared by consecutive chunks
+
+# Extraction Configuration
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = 40  # smaller PDFs are extracted serially (pool startup costs more)
+PDF_PROBE_PAGES = 4  # sample pages parsed by both engines to choose one
+PDF_ENGINE_MIN_YIELD = 0.9  # an engine must extract this share of the best word count
+
+# Running headers/footers: edge lines of a page repeated on this share of pages are stripped
+BOILERPLATE_EDGE_LINES = 3  # lines checked at the top and bottom of each page
+BOILERPLATE_MIN_PAGE_RATIO = 0.5
+BOILERPLATE_WARMUP_PAGES = 20  # pages buffered before stripping starts
+
+# Near-duplicate chunks (MinHash/LSH) are collapsed before embedding
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_JACCARD_THRESHOLD = float(os.getenv("DEDUP_JACCARD_THRESHOLD", "0.85"))
+DEDUP_NUM_PERM = 64  # MinHash permutations per chunk
+DEDUP_BANDS = 16  # LSH bands (DEDUP_NUM_PERM / DEDUP_BANDS rows each)
+DEDUP_REPORT_SAMPLE = 20  # collapsed chunks listed in the dedup report (the rest are only counted)
+
+# Extraction Cache Configuration
+EXTRACTION_CACHE_DIR = os.getenv(
+    "EXTRACTION_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "extractions")
+)
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+# Embedding Cache Configuration
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings.sqlite3")
+)
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")  # or float32
+
+# Ingestion Configuration
+INGEST_BATCH_SIZE = 100  # chunks embedded and upserted together while streaming a book
+INGEST_UPSERT_CONCURRENCY = int(os.getenv("INGEST_UPSERT_CONCURRENCY", "4"))  # upserts in flight while embedding
+INGEST_UPSERT_RETRIES = 3  # retries per failed upsert batch
+INGEST_RETRY_BACKOFF = 0.5  # seconds before the first retry, doubled each time
+BOOK_MANIFEST_DIR = os.getenv(
+    "BOOK_MANIFEST_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "manifests")
+)  # chunk ids stored per book, for incremental re-indexing
+# A different file uploaded under a stored book's title replaces it as a new version if at least this share
+# of its first INGEST_BATCH_SIZE chunks are already in the stored version; otherwise it is kept as another book
+BOOK_VERSION_MIN_SHARED = float(os.getenv("BOOK_VERSION_MIN_SHARED", "0.5"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))  # texts per forward pass, grouped by length
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # forked processes sharing the model for bulk embedding
+
+# Query embeddings from concurrent requests are encoded together in micro-batches
+EMBED_BATCHING_ENABLED = os.getenv("EMBED_BATCHING_ENABLED", "true").lower() == "true"
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))  # latency a query may add waiting for company
+
+# In-memory caches of query embeddings and search results, invalidated per user on store/delete,
+# also by other processes sharing BOOK_MANIFEST_DIR; hosts that do not share it see their changes
+# only once cached results expire after QUERY_CACHE_TTL_SECONDS
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "2000"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "600"))
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "32"))  # per /search/batch request
+SEARCH_MAX_TOP_K = 50  # results per query a search request may ask for
+
+# Lexical (BM25) index built at ingest, fused with vector search in hybrid retrieval
+LEXICAL_INDEX_DIR = os.getenv(
+    "LEXICAL_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "lexical")
+)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # "hybrid" (BM25 + vector) or "dense"
+HYBRID_CANDIDATES_FACTOR = 4  # each retriever contributes top_k x this candidates to the fusion
+RRF_K = 60  # reciprocal-rank fusion constant: score = sum of 1 / (RRF_K + rank)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Full chunk texts live in compressed per-book block files instead of the vectors' metadata
+CHUNK_STORE_ENABLED = os.getenv("CHUNK_STORE_ENABLED", "true").lower() == "true"
+CHUNK_STORE_DIR = os.getenv(
+    "CHUNK_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "chunks")
+)
+CHUNK_STORE_BLOCK_BYTES = 64 * 1024  # uncompressed text per block
+CHUNK_STORE_CACHE_BLOCKS = int(os.getenv("CHUNK_STORE_CACHE_BLOCKS", "256"))  # decompressed blocks kept in memory
+# Text prefix still kept in metadata, for hits whose texts are not in this host's chunk store;
+# a whole chunk by default, so hosts without the store still send full chunks to the summarizer
+CHUNK_STORE_FALLBACK_CHARS = int(os.getenv("CHUNK_STORE_FALLBACK_CHARS", str(CHUNK_SIZE)))
+
+# Overlapping neighbouring hits are merged into passages before summarizing
+PASSAGE_MERGING_ENABLED = os.getenv("PASSAGE_MERGING_ENABLED", "true").lower() == "true"
+PASSAGE_CANDIDATES_FACTOR = 3  # hits retrieved per context slot, to fill the room merging frees
 
 # Model Configuration
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
@@ -0,0 +1,97 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Set
+from config import BOILERPLATE_EDGE_LINES, BOILERPLATE_MIN_PAGE_RATIO, BOILERPLATE_WARMUP_PAGES
+
+_DIGITS_RE = re.compile(r'\d+')
+_SPACES_RE = re.compile(r'\s+')
+
+
+class BoilerplateFilter:
+    """Strips running headers and footers that repeat across the pages of a document.
+
+    The first and last few non-empty lines of every page are fingerprinted (case,
+    whitespace and digits normalised, so "Page 12" and "Page 13" match). Edge lines
+    whose fingerprint appears on at least `min_page_ratio` of the pages seen so far
+    are dropped. The first `warmup_pages` pages are buffered so the counts are
+    meaningful before anything is emitted; after that pages stream through.
+
+    `is_content` (the line cleaner's predicate) decides which removed lines count
+    as savings: lines the cleaner would have dropped anyway are not reported.
+    """
+
+    def __init__(self, edge_lines: int = BOILERPLATE_EDGE_LINES,
+                 min_page_ratio: float = BOILERPLATE_MIN_PAGE_RATIO,
+                 warmup_pages: int = BOILERPLATE_WARMUP_PAGES, min_repeats: int = 3,
+                 is_content: Optional[Callable[[str], bool]] = None):
+        self.edge_lines = edge_lines
+        self.min_page_ratio = min_page_ratio
+        self.warmup_pages = warmup_pages
+        self.min_repeats = min_repeats
+        self.is_content = is_content or (lambda line: bool(line))
+        self.counts: Counter = Counter()
+        self.pages_seen = 0
+        self.chars_saved = 0
+        self.lines_removed = 0
+
+    @staticmethod
+    def fingerprint(line: str) -> str:
+        """Short hash of a line with case, whitespace and numbers normalised"""
+        normalised = _SPACES_RE.sub(' ', _DIGITS_RE.sub('#', line.lower())).strip()
+        return hashlib.blake2b(normalised.encode('utf-8'), digest_size=8).hexdigest()
+
+    def _edge_indices(self, lines: List[str]) -> List[int]:
+        """Indices of the first and last `edge_lines` non-empty lines of a page"""
+        content = [i for i, line in enumerate(lines) if line.strip()]
+        if len(content) <= self.edge_lines * 2:
+            return content
+        return content[:self.edge_lines] + content[-self.edge_lines:]
+
+    def _observe(self, page: str) -> List[str]:
+        """Count a page's edge fingerprints and return its lines"""
+        lines = page.split('\n')
+        fingerprints: Set[str] = {self.fingerprint(lines[i]) for i in self._edge_indices(lines)}
+        self.counts.update(fingerprints)
+        self.pages_seen += 1
+        return lines
+
+    def _strip(self, lines: List[str]) -> str:
+        """Drop the page's edge lines that are boilerplate given the counts so far"""
+        cutoff = max(self.min_repeats, self.pages_seen * self.min_page_ratio)
+        drop = {i for i in self._edge_indices(lines) if self.counts[self.fingerprint(lines[i])] >= cutoff}
+        if not drop:
+            return '\n'.join(lines)
+
+        for i in drop:
+            line = lines[i].strip()
+            self.lines_removed += 1
+            if self.is_content(line):
+                self.chars_saved += len(line) + 1
+        return '\n'.join(line for i, line in enumerate(lines) if i not in drop)
+
+    def filter_pages(self, pages: Iterable[str]) -> Generator[str, None, None]:
+        """Yield pages with their repeated headers and footers removed"""
+        warmup: Optional[List[List[str]]] = []
+        for page in pages:
+            lines = self._observe(page)
+            if warmup is None:
+                yield self._strip(lines)
+                continue
+            warmup.append(lines)
+            if len(warmup) >= self.warmup_pages:
+                for buffered in warmup:
+                    yield self._strip(buffered)
+                warmup = None
+
+        for buffered in warmup or []:
+            yield self._strip(buffered)
+
+    def report(self, chunk_step: int) -> Dict[str, Any]:
+        """Lines removed, content characters saved and the chunks that no longer need embedding"""
+        return {
+            "pages": self.pages_seen,
+            "lines_removed": self.lines_removed,
+            "chars_saved": self.chars_saved,
+            "chunks_saved": self.chars_saved // chunk_step if chunk_step > 0 else 0,
+        }
@@ -0,0 +1,117 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple
+import numpy as np
+from config import DEDUP_JACCARD_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_REPORT_SAMPLE
+
+_WORD_RE = re.compile(r'\w+')
+
+# Universal hashing modulo a Mersenne prime; a * x stays below 2**63 for 32-bit x
+_PRIME = (1 << 31) - 1
+
+
+class ChunkDeduplicator:
+    """Collapses near-duplicate chunks with MinHash signatures and LSH banding.
+
+    Each chunk's word shingles are hashed into a `num_perm` MinHash signature,
+    split into `bands` bands. Chunks sharing a band bucket with an earlier kept
+    chunk are compared on their signatures; if the estimated Jaccard similarity
+    reaches `threshold` the chunk is collapsed into that canonical chunk instead
+    of being embedded. Only canonical signatures are kept, as uint32.
+
+    Every collapsed chunk is mapped in `collapsed_into` to its canonical chunk's
+    position among kept chunks (the chunk_index it is stored under) and offsets;
+    the report lists only the first `report_sample` of them.
+    """
+
+    def __init__(self, threshold: float = DEDUP_JACCARD_THRESHOLD, num_perm: int = DEDUP_NUM_PERM,
+                 bands: int = DEDUP_BANDS, shingle_size: int = 3, seed: int = 1,
+                 report_sample: int = DEDUP_REPORT_SAMPLE):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.report_sample = report_sample
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+        self._spans: List[Tuple[Optional[int], Optional[int]]] = []
+        self.chunks_in = 0
+        self.collapsed = 0
+        # Every collapsed chunk's pointer to its canonical chunk, in chunk order
+        self.collapsed_into: List[Dict[str, Any]] = []
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text's word shingles"""
+        words = _WORD_RE.findall(text.lower())
+        k = min(self.shingle_size, len(words)) or 1
+        shingles = {' '.join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def find_canonical(self, signature: np.ndarray) -> int:
+        """Index of a kept chunk similar enough to collapse into, or -1 (best match wins)"""
+        candidates = set()
+        for band in range(self.bands):
+            key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best, best_similarity = -1, self.threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    def _keep(self, signature: np.ndarray, chunk: Dict[str, Any]) -> int:
+        """Index a new canonical chunk and return its position among kept chunks"""
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._spans.append((chunk.get("start"), chunk.get("end")))
+        for band in range(self.bands):
+            self._buckets[band][signature[band * self.rows:(band + 1) * self.rows].tobytes()].append(index)
+        return index
+
+    def filter_chunks(self, chunks: Iterable[Dict[str, Any]]) -> Generator[Dict[str, Any], None, None]:
+        """Yield canonical chunks; collapsed ones are recorded in `collapsed_into` with a
+        pointer (`canonical_index` and its offsets) to the kept chunk they duplicate"""
+        for chunk in chunks:
+            position = self.chunks_in
+            self.chunks_in += 1
+            signature = self.signature(chunk["text"])
+            canonical = self.find_canonical(signature)
+            if canonical >= 0:
+                self.collapsed += 1
+                canonical_start, canonical_end = self._spans[canonical]
+                self.collapsed_into.append({
+                    "chunk": position,
+                    "start": chunk.get("start"),
+                    "end": chunk.get("end"),
+                    "canonical_index": canonical,
+                    "canonical_start": canonical_start,
+                    "canonical_end": canonical_end,
+                })
+                continue
+            self._keep(signature, chunk)
+            yield chunk
+
+    def report(self) -> Dict[str, Any]:
+        """Dedup counts and ratio, with a sample of collapsed chunks' pointers to their canonical chunks"""
+        return {
+            "chunks_in": self.chunks_in,
+            "chunks_kept": len(self._signatures),
+            "collapsed": self.collapsed,
+            "dedup_ratio": round(self.collapsed / self.chunks_in, 4) if self.chunks_in else 0.0,
+            "threshold": self.threshold,
+            # A whole book's worth of pointers would bloat the report; the full map is in collapsed_into
+            "duplicates_sample": self.collapsed_into[:self.report_sample],
+        }
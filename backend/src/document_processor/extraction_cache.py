@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, Generator, Iterable, List, Optional
+from config import EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES
+
+
+class ExtractionCache:
+    """On-disk cache of cleaned text and chunks, keyed by a SHA-256 of the uploaded file.
+
+    Each entry is a directory holding text.txt, chunks.jsonl, meta.json and, when
+    dedup collapsed any chunks, duplicates.jsonl mapping each to its canonical chunk.
+    Entries are written to a temp directory and renamed into place, so readers
+    never see a half-written entry. The least recently used entries are evicted
+    once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = EXTRACTION_CACHE_DIR, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        """SHA-256 hex digest of an in-memory upload"""
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def copy_and_hash(source: BinaryIO, destination: BinaryIO, block_size: int = 1024 * 1024) -> str:
+        """Copy an upload to disk and return its SHA-256 hex digest in the same pass"""
+        digest = hashlib.sha256()
+        while True:
+            block = source.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+            destination.write(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def key_for(digest: str, signature: str) -> str:
+        """Cache key for file contents processed with a given extractor configuration"""
+        return f"{digest}-{signature}"
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the entry's metadata on a hit (marking it recently used), else None"""
+        meta_path = os.path.join(self._entry_dir(key), "meta.json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return meta
+
+    def iter_chunks(self, key: str) -> Generator[Dict[str, Any], None, None]:
+        """Stream a cached entry's chunks without loading them all"""
+        with open(os.path.join(self._entry_dir(key), "chunks.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def iter_duplicates(self, key: str) -> Generator[Dict[str, Any], None, None]:
+        """Stream a cached entry's collapsed-chunk -> canonical-chunk pointers"""
+        try:
+            f = open(os.path.join(self._entry_dir(key), "duplicates.jsonl"), "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Load a cached entry as {"text", "chunks"}, or None on a miss"""
+        if self.lookup(key) is None:
+            return None
+        try:
+            with open(os.path.join(self._entry_dir(key), "text.txt"), "r", encoding="utf-8") as f:
+                text = f.read()
+            return {"text": text, "chunks": list(self.iter_chunks(key))}
+        except OSError as e:
+            print(f"⚠️ Extraction cache entry unreadable: {e}")
+            return None
+
+    def put(self, key: str, text: str, chunks: List[Dict[str, Any]], extraction: Optional[Dict[str, Any]] = None,
+            duplicates: Optional[List[Dict[str, Any]]] = None):
+        """Cache a fully materialised extraction"""
+        entry = self.writer(key)
+        for _ in entry.record_text([text]):
+            pass
+        for _ in entry.record_chunks(chunks):
+            pass
+        entry.record_duplicates(duplicates or [])
+        entry.commit(extraction)
+
+    def writer(self, key: str) -> "CacheEntryWriter":
+        """Start writing an entry incrementally while the extraction streams past"""
+        return CacheEntryWriter(self, key)
+
+    def _install(self, key: str, temp_dir: str):
+        """Move a finished entry into place and evict down to the size cap"""
+        try:
+            os.rename(temp_dir, self._entry_dir(key))
+        except OSError:
+            # Another request cached the same file first
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                meta_path = os.path.join(self.cache_dir, name, "meta.json")
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        size = json.load(f).get("bytes", 0)
+                    entries.append((os.path.getmtime(meta_path), size, name))
+                    total += size
+                except (OSError, ValueError):
+                    continue
+
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+                total -= size
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size of the cache"""
+        entries = 0
+        size = 0
+        for name in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self.cache_dir, name, "meta.json")
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    size += json.load(f).get("bytes", 0)
+                entries += 1
+            except (OSError, ValueError):
+                continue
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class CacheEntryWriter:
+    """Writes one cache entry from the cleaned-text and chunk streams as they are consumed"""
+
+    def __init__(self, cache: ExtractionCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.temp_dir = os.path.join(cache.cache_dir, f".tmp-{key}-{uuid.uuid4().hex}")
+        os.makedirs(self.temp_dir)
+        self.text_length = 0
+        self.chunk_count = 0
+        self._text_file = open(os.path.join(self.temp_dir, "text.txt"), "w", encoding="utf-8")
+        self._chunks_file = open(os.path.join(self.temp_dir, "chunks.jsonl"), "w", encoding="utf-8")
+
+    def record_text(self, pieces: Iterable[str]) -> Generator[str, None, None]:
+        """Pass cleaned text through unchanged, appending it to the entry"""
+        for piece in pieces:
+            self._text_file.write(piece)
+            self.text_length += len(piece)
+            yield piece
+
+    def record_chunks(self, chunks: Iterable[Dict[str, Any]]) -> Generator[Dict[str, Any], None, None]:
+        """Pass chunks through unchanged, appending them to the entry"""
+        for chunk in chunks:
+            self._chunks_file.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            self.chunk_count += 1
+            yield chunk
+
+    def record_duplicates(self, duplicates: Iterable[Dict[str, Any]]):
+        """Write dedup's collapsed-chunk -> canonical-chunk pointers into the entry"""
+        duplicates = list(duplicates)
+        if not duplicates:
+            return
+        with open(os.path.join(self.temp_dir, "duplicates.jsonl"), "w", encoding="utf-8") as f:
+            for pointer in duplicates:
+                f.write(json.dumps(pointer) + "\n")
+
+    def commit(self, extraction: Optional[Dict[str, Any]] = None):
+        """Finish the entry; call only after both streams were fully consumed.
+
+        `extraction` (e.g. the chosen PDF engine) is kept with the entry's metadata.
+        """
+        self._text_file.close()
+        self._chunks_file.close()
+        size = sum(os.path.getsize(os.path.join(self.temp_dir, name)) for name in os.listdir(self.temp_dir))
+        meta = {
+            "text_length": self.text_length,
+            "chunks": self.chunk_count,
+            "bytes": size,
+            "created": time.time(),
+            "extraction": extraction or {},
+        }
+        with open(os.path.join(self.temp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        self.cache._install(self.key, self.temp_dir)
+
+    def discard(self):
+        """Drop a partial entry, e.g. when ingestion failed midway"""
+        self._text_file.close()
+        self._chunks_file.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
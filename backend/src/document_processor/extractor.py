@@ -1,158 +1,335 @@
 import PyPDF2
 import pdfplumber
+import codecs
+import hashlib
+import io
+import mmap
+import multiprocessing
 import os
 import re
-from typing import List, Optional, Generator
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Generator, Iterable, Tuple
+from config import (CHUNK_SIZE, CHUNK_OVERLAP, PDF_EXTRACTION_WORKERS, PDF_PARALLEL_MIN_PAGES,
+                    PDF_PROBE_PAGES, PDF_ENGINE_MIN_YIELD, DEDUP_ENABLED, DEDUP_JACCARD_THRESHOLD,
+                    DEDUP_NUM_PERM, DEDUP_BANDS, BOILERPLATE_EDGE_LINES, BOILERPLATE_MIN_PAGE_RATIO,
+                    BOILERPLATE_WARMUP_PAGES)
+from src.document_processor.extraction_cache import CacheEntryWriter
+from src.document_processor.formats import FORMAT_EXTRACTORS, LATIN1_FALLBACK, PAGED_FORMATS, register_format
+from src.document_processor.boilerplate import BoilerplateFilter
+from src.document_processor.dedup import ChunkDeduplicator
+
+
+# Bump when cleaning or chunking output changes, to invalidate extraction cache entries
+EXTRACTION_VERSION = 5
+
+# Common noise patterns to filter out
+NOISE_PATTERNS = [
+    r'^page\s+\d+$', r'^\d+$',           # Page numbers
+    r'copyright\s+©', r'all rights reserved',  # Copyright
+    r'www\.', r'http', r'@',              # URLs and emails
+    r'newsletter', r'subscribe',          # Newsletter signups
+    r'terms of service', r'privacy policy',
+    r'ebook', r'kindle', r'epub',         # Ebook metadata
+    r'chapter\s+\d+',                     # Chapter headers (keep if you want)
+    r'prologue', r'epilogue', r'appendix',
+    r'illustration', r'figure', r'table',
+    r'[•\-*]\s*',                          # Bullet points (keep content)
+]
+
+# All noise patterns as one alternation, so each line is scanned once
+_NOISE_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in NOISE_PATTERNS), re.IGNORECASE)
+
+# Characters that are neither alphanumeric nor whitespace (\w also matches '_', which isn't alnum)
+_SPECIAL_CHAR_RE = re.compile(r'[^\w\s]|_')
+
+# ASCII alphanumerics and whitespace, deleted with bytes.translate to count special characters
+_ASCII_ALNUM_SPACE = bytes(c for c in range(128) if chr(c).isalnum() or chr(c).isspace())
+
+
+# Preferred places to end a chunk, best first
+_CHUNK_BREAKS = ('\n\n', '\n', '. ', ' ')
+_SPACE_RE = re.compile(r'\s+')
+_NON_SPACE_RE = re.compile(r'\S')
+
+
+def _keep_line(line: str) -> bool:
+    """Decide whether a stripped line is content (True) or noise (False)"""
+    length = len(line)
+    
+    # Skip very short lines (likely noise)
+    if length < 20:
+        return False
+    
+    # Noise patterns only apply to short lines; longer ones have substantial content
+    if length <= 50 and _NOISE_RE.search(line):
+        return False
+    
+    # Skip lines with too many special characters
+    if line.isascii():
+        special_chars = len(line.encode('ascii').translate(None, _ASCII_ALNUM_SPACE))
+    else:
+        special_chars = len(_SPECIAL_CHAR_RE.findall(line))
+    if special_chars > length * 0.3:
+        return False
+    
+    # Skip lines that are mostly uppercase (often headers); count the cheap
+    # isupper() words first and only apply the length rule when it could matter
+    words = line.split()
+    if sum(map(str.isupper, words)) > len(words) * 0.7:
+        uppercase_words = sum(1 for w in words if w.isupper() and len(w) > 2)
+        if uppercase_words > len(words) * 0.7:
+            return False
+    
+    return True
+
+
+def _clean_lines(lines: Iterable[str]) -> List[str]:
+    """Strip a batch of lines and keep only the content lines"""
+    return [line for line in map(str.strip, lines) if _keep_line(line)]
+
+
+def _extract_plumber_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str, float]]:
+    """Extract pages [start, end) with pdfplumber in a worker process, timing each page"""
+    results = []
+    with pdfplumber.open(file_path) as pdf:
+        for page_num in range(start, end):
+            page_start = time.perf_counter()
+            page_text = pdf.pages[page_num].extract_text() or ""
+            results.append((page_num, page_text, time.perf_counter() - page_start))
+    return results
+
+
+# Worker pools for page-parallel pdfplumber extraction, one per worker count, shared by every
+# request. Workers are spawned rather than forked: forking from a request thread while other
+# threads (pymongo monitors, the query batcher, upsert pools) hold locks can deadlock the child.
+_PDF_POOLS: Dict[int, ProcessPoolExecutor] = {}
+_PDF_POOLS_LOCK = threading.Lock()
+
+
+def _pdf_pool(workers: int) -> ProcessPoolExecutor:
+    with _PDF_POOLS_LOCK:
+        pool = _PDF_POOLS.get(workers)
+        if pool is None:
+            pool = _PDF_POOLS[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+def _discard_pdf_pool(workers: int, pool: ProcessPoolExecutor):
+    """Forget a broken pool so the next extraction starts a fresh one"""
+    with _PDF_POOLS_LOCK:
+        if _PDF_POOLS.get(workers) is pool:
+            del _PDF_POOLS[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
 
 class DocumentExtractor:
-    def __init__(self):
-        self.supported_formats = ['pdf', 'txt']
-        self.chunk_size = 500
-        self.overlap = 50
+    def __init__(self, workers: Optional[int] = None):
+        self.supported_formats = sorted(FORMAT_EXTRACTORS)
+        self.chunk_size = CHUNK_SIZE
+        self.overlap = CHUNK_OVERLAP
+        self.workers = workers or PDF_EXTRACTION_WORKERS
+        self.page_timings: List[float] = []
+        self.extraction_stats: dict = {}
+        self.extraction_metadata: dict = {}
+        self.duplicates: List[Dict[str, Any]] = []  # collapsed chunk -> canonical chunk pointers
+        self.extraction_error: Optional[str] = None  # set when extraction failed part-way
+        self.text_length = 0
+    
+    # Below this many kept lines the cleaner gives up and returns the raw text
+    min_clean_lines = 20
     
     def clean_extracted_text(self, text: str) -> str:
         """Remove repetitive headers, footers, and noise from extracted text"""
         if not text:
             return text
         
-        # Split into lines
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        # Common noise patterns to filter out
-        noise_patterns = [
-            r'^page\s+\d+$', r'^\d+$',           # Page numbers
-            r'copyright\s+©', r'all rights reserved',  # Copyright
-            r'www\.', r'http', r'@',              # URLs and emails
-            r'newsletter', r'subscribe',          # Newsletter signups
-            r'terms of service', r'privacy policy',
-            r'ebook', r'kindle', r'epub',         # Ebook metadata
-            r'chapter\s+\d+',                     # Chapter headers (keep if you want)
-            r'prologue', r'epilogue', r'appendix',
-            r'illustration', r'figure', r'table',
-            r'[•\-*]\s*',                          # Bullet points (keep content)
-        ]
+        cleaned_lines = _clean_lines(text.split('\n'))
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Skip very short lines (likely noise)
-            if len(line) < 20:
+        # If we removed too much, be less aggressive
+        if len(cleaned_lines) < self.min_clean_lines:
+            return text
+        
+        return '\n'.join(cleaned_lines)
+    
+    def iter_clean_text(self, segments: Iterable[str]) -> Generator[str, None, None]:
+        """Streaming clean_extracted_text: yields cleaned text pieces whose concatenation
+        equals clean_extracted_text of the concatenated segments.
+        
+        Raw segments are only buffered until min_clean_lines lines have been kept,
+        after which memory is bounded by the size of one segment.
+        """
+        self.text_length = 0
+        pending = ""            # partial line carried over to the next segment
+        raw_buffer = []         # raw segments, in case the whole text has to be returned
+        clean_buffer = []       # kept lines before the min_clean_lines decision
+        decided = False
+        
+        for segment in segments:
+            if not segment:
                 continue
+            if not decided:
+                raw_buffer.append(segment)
             
-            # Check if line matches any noise pattern
-            is_noise = False
-            for pattern in noise_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    # But keep if it has substantial content
-                    if len(line) > 50:
-                        continue
-                    is_noise = True
-                    break
+            lines = (pending + segment).split('\n')
+            pending = lines.pop()
+            kept = _clean_lines(lines)
             
-            # Skip lines with too many special characters
-            special_chars = sum(not c.isalnum() and not c.isspace() for c in line)
-            if special_chars > len(line) * 0.3:
+            if decided:
+                if kept:
+                    piece = '\n' + '\n'.join(kept)
+                    self.text_length += len(piece)
+                    yield piece
                 continue
             
-            # Skip lines that are mostly uppercase (often headers)
-            words = line.split()
-            if words:
-                uppercase_words = sum(1 for w in words if w.isupper() and len(w) > 2)
-                if uppercase_words > len(words) * 0.7:
-                    continue
-            
-            if not is_noise:
-                cleaned_lines.append(line)
+            clean_buffer.extend(kept)
+            if len(clean_buffer) >= self.min_clean_lines:
+                decided = True
+                raw_buffer = []
+                piece = '\n'.join(clean_buffer)
+                clean_buffer = []
+                self.text_length += len(piece)
+                yield piece
         
-        # If we removed too much, be less aggressive
-        if len(cleaned_lines) < 20:
-            return text
+        last_line = pending.strip()
+        if decided:
+            if _keep_line(last_line):
+                self.text_length += len(last_line) + 1
+                yield '\n' + last_line
+            return
         
-        return '\n'.join(cleaned_lines)
+        if _keep_line(last_line):
+            clean_buffer.append(last_line)
+        if len(clean_buffer) >= self.min_clean_lines:
+            piece = '\n'.join(clean_buffer)
+        else:
+            # If we removed too much, be less aggressive
+            piece = ''.join(raw_buffer)
+        self.text_length += len(piece)
+        if piece:
+            yield piece
     
-    def extract_text_from_pdf_pypdf2(self, file_path: str) -> Optional[str]:
-        """Extract text using PyPDF2 (fast but basic)"""
+    @staticmethod
+    def _split_page_range(page_count: int, parts: int) -> List[Tuple[int, int]]:
+        """Split [0, page_count) into at most `parts` contiguous, near-equal ranges"""
+        parts = max(1, min(parts, page_count))
+        step, remainder = divmod(page_count, parts)
+        ranges = []
+        start = 0
+        for i in range(parts):
+            end = start + step + (1 if i < remainder else 0)
+            ranges.append((start, end))
+            start = end
+        return ranges
+    
+    def _record_page_timings(self, wall_seconds: float, workers: int):
+        """Summarise per-page timings into extraction_stats and log the speedup"""
+        page_seconds = sum(self.page_timings)
+        self.extraction_stats = {
+            "pages": len(self.page_timings),
+            "workers": workers,
+            "wall_seconds": round(wall_seconds, 3),
+            "page_seconds_total": round(page_seconds, 3),
+            "page_seconds_max": round(max(self.page_timings, default=0.0), 3),
+            "speedup": round(page_seconds / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        }
+        print(f"⏱️ Extracted {len(self.page_timings)} pages in {wall_seconds:.2f}s "
+              f"({page_seconds:.2f}s of page work, {workers} worker(s), "
+              f"{self.extraction_stats['speedup']}x)")
+    
+    def probe_pdf_engines(self, file_path: str) -> Dict[str, Any]:
+        """Time both PDF engines on a few sample pages and pick one for the whole document.
+        
+        An engine is adequate if it yields at least PDF_ENGINE_MIN_YIELD of the best
+        word count on the sample; the fastest adequate engine wins. The decision is
+        kept in extraction_metadata.
+        """
+        engines = {}
         try:
-            text = ""
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                    
-                    if page_num % 10 == 0:
-                        import gc
-                        gc.collect()
-            
-            return text
-        except Exception as e:
-            print(f"PyPDF2 extraction error: {e}")
-            return None
-    
-    def extract_text_from_pdf_plumber(self, file_path: str) -> Optional[str]:
-        """Extract text using pdfplumber (better formatting)"""
-        try:
-            text = ""
+                page_count = len(pdf_reader.pages)
+                sample = self._sample_pages(page_count)
+                engines['pypdf2'] = self._time_sample(lambda n: pdf_reader.pages[n].extract_text(), sample)
             with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            return text
+                engines['pdfplumber'] = self._time_sample(lambda n: pdf.pages[n].extract_text(), sample)
         except Exception as e:
-            print(f"pdfplumber extraction error: {e}")
-            return None
-    
-    def extract_text_from_pdf(self, file_path: str) -> Optional[str]:
-        """Extract text using multiple methods and take the best result"""
-        
-        # Try pdfplumber first (better formatting)
-        text = self.extract_text_from_pdf_plumber(file_path)
+            print(f"PDF engine probe error: {e}")
+            self.extraction_metadata = {"engine": "pdfplumber", "reason": "probe failed"}
+            return self.extraction_metadata
         
-        # If pdfplumber fails or returns little text, try PyPDF2
-        if not text or len(text) < 100:
-            print("pdfplumber extracted little text, trying PyPDF2...")
-            text = self.extract_text_from_pdf_pypdf2(file_path)
+        best_words = max(result["words_per_page"] for result in engines.values())
+        if best_words == 0:
+            engine = "pdfplumber"
+            reason = "no text on sampled pages"
+        else:
+            adequate = [name for name, result in engines.items()
+                        if result["words_per_page"] >= best_words * PDF_ENGINE_MIN_YIELD]
+            engine = min(adequate, key=lambda name: engines[name]["seconds_per_page"])
+            reason = "fastest adequate engine"
         
-        # If both fail, return None
-        if not text:
+        self.extraction_metadata = {
+            "engine": engine,
+            "reason": reason,
+            "pages": page_count,
+            "sampled_pages": sample,
+            "probe": engines,
+        }
+        print(f"🔎 Using {engine} for {page_count} pages ({reason}: " + ", ".join(
+            f"{name} {result['words_per_page']} words/page in {result['seconds_per_page'] * 1000:.0f}ms"
+            for name, result in engines.items()) + ")")
+        return self.extraction_metadata
+    
+    @staticmethod
+    def _sample_pages(page_count: int) -> List[int]:
+        """Evenly spaced sample of page numbers, avoiding the cover and last page when possible"""
+        count = min(PDF_PROBE_PAGES, page_count)
+        return sorted({int((i + 0.5) * page_count / count) for i in range(count)}) if count else []
+    
+    @staticmethod
+    def _time_sample(extract_page, sample: List[int]) -> Dict[str, float]:
+        """Words and seconds per page for one engine over the sample pages"""
+        words = 0
+        started = time.perf_counter()
+        for page_num in sample:
+            words += len((extract_page(page_num) or "").split())
+        seconds = time.perf_counter() - started
+        pages = max(len(sample), 1)
+        return {"words_per_page": round(words / pages, 1), "seconds_per_page": round(seconds / pages, 4)}
+    
+    def extract_text_from_pdf(self, file_path: str) -> Optional[str]:
+        """Extract text with the engine picked by probing sample pages, minus running headers/footers"""
+        try:
+            cleaned_text = ''.join(self.iter_clean_text(self.strip_boilerplate(self.iter_pages(file_path, 'pdf'))))
+        except Exception:
             return None
         
-        # Clean the extracted text
-        cleaned_text = self.clean_extracted_text(text)
+        # If both engines fail, return None
+        if not cleaned_text:
+            return None
         
         print(f"✅ Extracted {len(cleaned_text)} characters after cleaning")
         return cleaned_text
     
+    def strip_boilerplate(self, pages: Iterable[str]) -> Generator[str, None, None]:
+        """Drop headers/footers repeated across pages; the savings land in extraction_metadata"""
+        boilerplate = BoilerplateFilter(is_content=_keep_line)
+        yield from boilerplate.filter_pages(pages)
+        
+        report = boilerplate.report(self.chunk_size - self.overlap)
+        self.extraction_metadata["boilerplate"] = report
+        if report["lines_removed"]:
+            print(f"🧹 Removed {report['lines_removed']} repeated header/footer lines "
+                  f"({report['chars_saved']} chars, ~{report['chunks_saved']} chunks)")
+    
     def extract_text_from_txt(self, file_path: str) -> Optional[str]:
         """Extract text from TXT file"""
         try:
-            text = ""
-            with open(file_path, 'r', encoding='utf-8') as file:
-                while True:
-                    chunk = file.read(1024 * 1024)
-                    if not chunk:
-                        break
-                    text += chunk
-            
-            cleaned_text = self.clean_extracted_text(text)
-            return cleaned_text
-            
-        except UnicodeDecodeError:
-            try:
-                with open(file_path, 'r', encoding='latin-1') as file:
-                    text = file.read()
-                cleaned_text = self.clean_extracted_text(text)
-                return cleaned_text
-            except Exception as e:
-                print(f"Error extracting TXT text: {e}")
-                return None
+            # Lines stream from the memory-mapped file straight into the cleaner,
+            # so only the cleaned text is ever materialised
+            return ''.join(self.iter_clean_text(self.iter_txt_blocks(file_path)))
         except Exception as e:
             print(f"Error extracting TXT text: {e}")
             return None
@@ -163,45 +340,302 @@ class DocumentExtractor:
             return self.extract_text_from_pdf(file_path)
         elif file_type == 'txt':
             return self.extract_text_from_txt(file_path)
+        elif file_type in FORMAT_EXTRACTORS:
+            try:
+                return ''.join(self.iter_clean_text(self.iter_pages(file_path, file_type))) or None
+            except Exception:
+                return None
         else:
             return None
     
-    def chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
+    def iter_pdf_pages(self, file_path: str) -> Generator[str, None, None]:
+        """Yield raw PDF page texts in order, one page at a time.
+        
+        Uses the engine picked by probe_pdf_engines (pdfplumber runs over the worker
+        pool for long documents) and falls back to the other engine when it fails
+        or yields almost nothing before any page is released. Pages are held back
+        only until 100 characters are seen; once they are, an engine error is
+        raised rather than ending the book early.
+        """
+        engines = {"pdfplumber": self._iter_pdf_pages_plumber, "pypdf2": self._iter_pdf_pages_pypdf2}
+        primary = self.probe_pdf_engines(file_path)["engine"]
+        fallback = "pypdf2" if primary == "pdfplumber" else "pdfplumber"
+        
+        held_back = []
+        held_chars = 0
+        released = False
+        
+        try:
+            for page_text in engines[primary](file_path):
+                if released:
+                    yield page_text
+                    continue
+                held_back.append(page_text)
+                held_chars += len(page_text)
+                if held_chars >= 100:
+                    released = True
+                    yield from held_back
+                    held_back = []
+        except Exception as e:
+            if released:
+                raise
+            print(f"{primary} extraction error: {e}")
+        
+        if not released:
+            print(f"{primary} extracted little text, trying {fallback}...")
+            self.extraction_metadata["engine"] = fallback
+            yield from engines[fallback](file_path)
+    
+    def _iter_pdf_pages_plumber(self, file_path: str) -> Generator[str, None, None]:
+        """Yield pdfplumber page texts (with trailing newline), in page order, timing each page.
+        
+        Long documents are extracted over the shared worker pool; if the pool
+        fails, the pages not yielded yet are extracted serially instead. Any
+        other error is raised to the caller.
+        """
+        started = time.perf_counter()
+        self.page_timings = []
+        with pdfplumber.open(file_path) as pdf:
+            page_count = len(pdf.pages)
+            if self.workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+                yield from self._iter_plumber_serial(pdf, 0)
+                self._record_page_timings(time.perf_counter() - started, workers=1)
+                return
+        
+        # Keep a bounded window of page ranges in flight and yield them in order
+        next_page = 0
+        in_flight = []
+        pool = _pdf_pool(self.workers)
+        try:
+            for start, end in self._split_page_range(page_count, self.workers * 4):
+                in_flight.append(pool.submit(_extract_plumber_page_range, file_path, start, end))
+                if len(in_flight) > self.workers * 2:
+                    next_page = yield from self._collect_page_range(in_flight.pop(0))
+            while in_flight:
+                next_page = yield from self._collect_page_range(in_flight.pop(0))
+        except Exception as e:
+            print(f"Parallel pdfplumber extraction error: {e}, falling back to serial from page {next_page + 1}")
+            _discard_pdf_pool(self.workers, pool)
+            with pdfplumber.open(file_path) as pdf:
+                yield from self._iter_plumber_serial(pdf, next_page)
+            self._record_page_timings(time.perf_counter() - started, workers=1)
+            return
+        finally:
+            # The pool outlives this document; don't leave it working on abandoned ranges
+            for future in in_flight:
+                future.cancel()
+        self._record_page_timings(time.perf_counter() - started, workers=self.workers)
+    
+    def _iter_plumber_serial(self, pdf, first_page: int) -> Generator[str, None, None]:
+        """Yield the page texts of an open pdfplumber document from `first_page` on, timing each page"""
+        for page in pdf.pages[first_page:]:
+            page_start = time.perf_counter()
+            page_text = page.extract_text()
+            self.page_timings.append(time.perf_counter() - page_start)
+            # Drop pdfplumber's cached layout objects so memory stays per-page
+            page.close()
+            if page_text:
+                yield page_text + "\n"
+    
+    def _collect_page_range(self, future) -> Generator[str, None, int]:
+        """Yield the page texts of a finished worker range, recording their timings; returns the next page number"""
+        next_page = 0
+        for page_num, page_text, seconds in future.result():
+            self.page_timings.append(seconds)
+            next_page = page_num + 1
+            if page_text:
+                yield page_text + "\n"
+        return next_page
+    
+    def _iter_pdf_pages_pypdf2(self, file_path: str) -> Generator[str, None, None]:
+        """Yield PyPDF2 page texts (with trailing newline), in page order"""
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for page in pdf_reader.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    yield page_text + "\n"
+    
+    def iter_txt_blocks(self, file_path: str, block_size: int = 1024 * 1024) -> Generator[str, None, None]:
+        """Yield decoded blocks of a memory-mapped TXT file.
+        
+        Decodes UTF-8 incrementally; bytes that aren't valid UTF-8 are decoded as
+        latin-1 in place, so a single bad byte never forces a second full decode.
+        Line endings are normalised to \\n as in text-mode reads.
+        """
+        decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder('utf-8-sig')(errors=LATIN1_FALLBACK), translate=True
+        )
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, 'madvise'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                for offset in range(0, len(mapped), block_size):
+                    yield decoder.decode(mapped[offset:offset + block_size])
+        yield decoder.decode(b'', final=True)
+    
+    def iter_pages(self, file_path: str, file_type: str) -> Generator[str, None, None]:
+        """Yield raw text segments (pages, blocks or chapters) from the format's registered extractor.
+        
+        An error part-way through is recorded in extraction_error and raised, so
+        a truncated book is never mistaken for a complete one.
+        """
+        format_extractor = FORMAT_EXTRACTORS.get(file_type)
+        if not format_extractor:
+            print(f"Unsupported file format: {file_type}")
+            return
+        self.extraction_error = None
+        try:
+            yield from format_extractor(self, file_path)
+        except Exception as e:
+            self.extraction_error = str(e) or type(e).__name__
+            print(f"Error extracting {file_type.upper()} text: {e}")
+            raise
+    
+    def stream_chunks(self, file_path: str, file_type: str,
+                      cache_entry: Optional[CacheEntryWriter] = None) -> Generator[Dict[str, Any], None, None]:
+        """Extract, clean and chunk a file as one lazy page -> text -> chunk pipeline.
+        
+        After the generator is exhausted, text_length holds the cleaned text length.
+        If cache_entry is given, the cleaned text and chunks are recorded into it.
+        """
+        pages = self.iter_pages(file_path, file_type)
+        if file_type in PAGED_FORMATS:
+            pages = self.strip_boilerplate(pages)
+        text = self.iter_clean_text(pages)
+        if cache_entry:
+            text = cache_entry.record_text(text)
+        chunks = self.iter_chunks(text, self.chunk_size, self.overlap)
+        if DEDUP_ENABLED:
+            chunks = self.deduplicate(chunks, cache_entry)
+        if cache_entry:
+            chunks = cache_entry.record_chunks(chunks)
+        return chunks
+    
+    def deduplicate(self, chunks: Iterable[Dict[str, Any]],
+                    cache_entry: Optional[CacheEntryWriter] = None) -> Generator[Dict[str, Any], None, None]:
+        """Collapse near-duplicate chunks before embedding; the report lands in extraction_metadata.
+        
+        The full collapsed -> canonical mapping is kept in `duplicates` and recorded into cache_entry.
+        """
+        deduplicator = ChunkDeduplicator()
+        yield from deduplicator.filter_chunks(chunks)
+        
+        self.duplicates = deduplicator.collapsed_into
+        if cache_entry:
+            cache_entry.record_duplicates(self.duplicates)
+        report = deduplicator.report()
+        self.extraction_metadata["dedup"] = report
+        if report["collapsed"]:
+            print(f"🧬 Collapsed {report['collapsed']}/{report['chunks_in']} near-duplicate chunks "
+                  f"({report['dedup_ratio']:.1%})")
+    
+    def cache_signature(self) -> str:
+        """Identifies every setting that changes the cleaned text or chunks, so cached results from other settings miss"""
+        settings = [
+            PDF_PROBE_PAGES, PDF_ENGINE_MIN_YIELD,
+            BOILERPLATE_EDGE_LINES, BOILERPLATE_MIN_PAGE_RATIO, BOILERPLATE_WARMUP_PAGES,
+            DEDUP_ENABLED and (DEDUP_JACCARD_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS),
+        ]
+        digest = hashlib.sha1(repr(settings).encode('utf-8')).hexdigest()[:12]
+        return f"v{EXTRACTION_VERSION}-{self.chunk_size}-{self.overlap}-{digest}"
+    
+    def chunk_text(self, text: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None) -> List[str]:
         """Split text into overlapping chunks intelligently"""
+        return [chunk["text"] for chunk in self.chunk_spans(text, chunk_size, overlap)]
+    
+    def chunk_spans(self, text: str, chunk_size: Optional[int] = None,
+                    overlap: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Split text into chunks, each a dict with its text and (start, end) offsets into text"""
         if not text:
             return []
         
-        chunks = []
+        chunks = list(self.iter_chunks([text], chunk_size, overlap))
+        
+        print(f"Created {len(chunks)} chunks")
+        return chunks
+    
+    def iter_chunks(self, segments: Iterable[str], chunk_size: Optional[int] = None,
+                    overlap: Optional[int] = None) -> Generator[Dict[str, Any], None, None]:
+        """Yield chunks of at most chunk_size characters from a stream of text segments.
         
-        # First split by paragraphs
-        paragraphs = text.split('\n\n')
+        Consecutive chunks share up to `overlap` characters. Each chunk is
+        {"text", "start", "end"} with offsets into the concatenated stream; only
+        a window of a few chunks is buffered between segments.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        overlap = self.overlap if overlap is None else overlap
+        window = chunk_size * 8
         
-        current_chunk = ""
+        buffer = ""     # unconsumed text, starting at stream offset `base`
+        base = 0
+        start = 0       # next chunk start, relative to buffer
+        pending = []
+        pending_length = 0
         
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
+        for segment in segments:
+            pending.append(segment)
+            pending_length += len(segment)
+            if pending_length < window:
                 continue
             
-            # If adding this paragraph exceeds chunk size, save current chunk and start new
-            if len(current_chunk) + len(para) > chunk_size and current_chunk:
-                chunks.append(current_chunk.strip())
-                # Keep overlap from end of previous chunk
-                words = current_chunk.split()
-                overlap_text = ' '.join(words[-int(len(words) * overlap/100):]) if words else ""
-                current_chunk = overlap_text + " " + para
-            else:
-                if current_chunk:
-                    current_chunk += "\n\n" + para
-                else:
-                    current_chunk = para
+            buffer = buffer[start:] + ''.join(pending)
+            base += start
+            pending = []
+            pending_length = 0
+            start = yield from self._iter_chunk_spans(buffer, base, chunk_size, overlap, final=False)
+        
+        buffer = buffer[start:] + ''.join(pending)
+        base += start
+        yield from self._iter_chunk_spans(buffer, base, chunk_size, overlap, final=True)
+    
+    @staticmethod
+    def _iter_chunk_spans(text: str, base: int, chunk_size: int, overlap: int,
+                          final: bool) -> Generator[Dict[str, Any], None, int]:
+        """Yield chunks of text, preferring paragraph, line, sentence and word breaks.
         
-        # Add the last chunk
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        Unless `final`, stops before a chunk that could still grow with more text
+        and returns the offset the next chunk starts from.
+        """
+        length = len(text)
+        start = 0
         
-        print(f"Created {len(chunks)} chunks")
-        return chunks
+        while True:
+            # Chunks never start on whitespace
+            match = _NON_SPACE_RE.search(text, start)
+            if not match:
+                return length
+            start = match.start()
+            
+            if start + chunk_size >= length:
+                if not final:
+                    return start
+                end = length
+            else:
+                end = start + chunk_size
+                lower = start + chunk_size // 2
+                for separator in _CHUNK_BREAKS:
+                    position = text.rfind(separator, lower, end)
+                    if position != -1:
+                        end = position + len(separator)
+                        break
+            
+            chunk_end = end
+            while chunk_end > start and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            yield {"text": text[start:chunk_end], "start": base + start, "end": base + chunk_end}
+            
+            if end >= length:
+                return length
+            
+            # Step back by the overlap, then forward to the next word so chunks don't open mid-word
+            next_start = max(end - overlap, start + 1)
+            if not text[next_start - 1].isspace():
+                match = _SPACE_RE.search(text, next_start, end)
+                next_start = match.end() if match else next_start
+            start = next_start
     
     def get_file_info(self, file_path: str) -> dict:
         """Get file information"""
@@ -214,4 +648,8 @@ class DocumentExtractor:
             'size_mb': round(file_size, 2),
             'type': file_ext,
             'path': file_path
-        }
\ No newline at end of file
+        }
+
+
+register_format('pdf', DocumentExtractor.iter_pdf_pages, paged=True)
+register_format('txt', DocumentExtractor.iter_txt_blocks)
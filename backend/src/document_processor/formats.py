@@ -0,0 +1,184 @@
+import codecs
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from typing import Any, BinaryIO, Callable, Dict, Generator, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote
+
+# A format plugin takes (extractor, file_path) and yields raw text segments
+# (pages, blocks or chapters) that feed DocumentExtractor.iter_clean_text
+FormatExtractor = Callable[[Any, str], Iterable[str]]
+
+FORMAT_EXTRACTORS: Dict[str, FormatExtractor] = {}
+
+# Formats whose segments are real pages, so running headers/footers can be detected
+PAGED_FORMATS: Set[str] = set()
+
+
+
+def _decode_as_latin1(error: UnicodeDecodeError) -> Tuple[str, int]:
+    """Codec error handler: decode the offending bytes as latin-1 and carry on"""
+    return error.object[error.start:error.end].decode('latin-1'), error.end
+
+
+# UTF-8 decoding error handler for TXT and HTML: stray non-UTF-8 bytes become latin-1 characters
+LATIN1_FALLBACK = 'booksum-latin1-fallback'
+codecs.register_error(LATIN1_FALLBACK, _decode_as_latin1)
+
+# Where an HTML document declares its encoding: <meta charset>, <meta http-equiv content> or <?xml encoding>
+_DECLARED_CHARSET_RE = re.compile(
+    rb'<meta[^>]*?charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)|<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9_.:-]+)',
+    re.IGNORECASE,
+)
+# How far into a document the declaration is looked for, as browsers do
+_CHARSET_SNIFF_BYTES = 1024
+# Browsers read these labels as windows-1252, which is what such pages are actually written in
+_WINDOWS_1252_LABELS = {'iso-8859-1', 'iso8859-1', 'latin1', 'latin-1', 'us-ascii', 'ascii'}
+
+
+def register_format(extension: str, extractor: FormatExtractor, paged: bool = False):
+    """Register (or replace) the extractor for a file extension"""
+    extension = extension.lower().lstrip('.')
+    FORMAT_EXTRACTORS[extension] = extractor
+    if paged:
+        PAGED_FORMATS.add(extension)
+    else:
+        PAGED_FORMATS.discard(extension)
+
+
+class _HTMLTextParser(HTMLParser):
+    """Incremental HTML-to-text parser that puts block elements on their own lines"""
+
+    block_tags = {
+        'p', 'div', 'br', 'li', 'tr', 'section', 'article', 'blockquote', 'pre',
+        'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'dt', 'dd', 'hr', 'table', 'ul', 'ol',
+    }
+    skip_tags = {'script', 'style', 'head', 'title', 'noscript', 'svg'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.skip_tags:
+            self._skip_depth += 1
+        elif tag in self.block_tags:
+            self.parts.append('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.block_tags:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.skip_tags:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.block_tags:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            # Source line breaks inside a paragraph are just whitespace
+            self.parts.append(' '.join(data.split('\n')))
+
+    def take_text(self) -> str:
+        """Return and clear the text collected so far"""
+        text = ''.join(self.parts)
+        self.parts = []
+        return text
+
+
+def _html_encoding(head: bytes) -> Optional[str]:
+    """Encoding an HTML document's BOM or charset declaration names, if Python knows it"""
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8'
+    match = _DECLARED_CHARSET_RE.search(head[:_CHARSET_SNIFF_BYTES])
+    if not match:
+        return None
+    label = (match.group(1) or match.group(2)).decode('ascii').lower()
+    if label in _WINDOWS_1252_LABELS:
+        return 'cp1252'
+    try:
+        encoding = codecs.lookup(label).name
+    except LookupError:
+        return None
+    # Text that could declare its charset in ASCII is not UTF-16/32, whatever it says
+    return 'utf-8' if encoding.startswith(('utf-16', 'utf-32')) else encoding
+
+
+def _iter_html_stream(stream: BinaryIO, block_size: int = 64 * 1024) -> Generator[str, None, None]:
+    """Feed a binary HTML stream to the parser block by block, yielding text as it is produced.
+
+    Decodes with the encoding the document declares; undeclared (or unknown)
+    ones are read as UTF-8, with stray bytes decoded as latin-1 like TXT files.
+    """
+    parser = _HTMLTextParser()
+    block = stream.read(block_size)
+    encoding = _html_encoding(block) or 'utf-8'
+    if encoding == 'utf-8':
+        decoder = codecs.getincrementaldecoder('utf-8-sig')(errors=LATIN1_FALLBACK)
+    else:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    while block:
+        parser.feed(decoder.decode(block))
+        text = parser.take_text()
+        if text:
+            yield text
+        block = stream.read(block_size)
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    text = parser.take_text()
+    if text:
+        yield text
+
+
+def iter_html_text(extractor, file_path: str) -> Generator[str, None, None]:
+    """Yield text from an HTML file without loading the whole document"""
+    with open(file_path, 'rb') as file:
+        yield from _iter_html_stream(file)
+
+
+def _epub_spine(archive: zipfile.ZipFile) -> List[str]:
+    """Archive paths of an EPUB's content documents in reading (spine) order"""
+    container = ET.fromstring(archive.read('META-INF/container.xml'))
+    rootfile = next(el for el in container.iter() if el.tag.endswith('rootfile'))
+    opf_path = rootfile.attrib['full-path']
+    opf_dir = posixpath.dirname(opf_path)
+
+    package = ET.fromstring(archive.read(opf_path))
+    # Malformed manifest items (no id or href) and spine entries (no idref) are skipped
+    manifest = {
+        item.get('id'): item.get('href')
+        for item in package.iter() if item.tag.endswith('}item') or item.tag == 'item'
+        if item.get('id') and item.get('href')
+    }
+    spine = [
+        itemref.get('idref')
+        for itemref in package.iter() if itemref.tag.endswith('itemref')
+    ]
+    return [posixpath.normpath(posixpath.join(opf_dir, unquote(manifest[idref])))
+            for idref in spine if idref in manifest]
+
+
+def iter_epub_chapters(extractor, file_path: str) -> Generator[str, None, None]:
+    """Yield EPUB text chapter by chapter, reading spine items from the zip one at a time"""
+    with zipfile.ZipFile(file_path) as archive:
+        for chapter_path in _epub_spine(archive):
+            try:
+                with archive.open(chapter_path) as chapter:
+                    for text in _iter_html_stream(chapter):
+                        yield text
+            except KeyError:
+                print(f"⚠️ EPUB spine item missing from archive: {chapter_path}")
+                continue
+            # Never let a chapter's last line run into the next chapter's first
+            yield '\n\n'
+
+
+register_format('html', iter_html_text)
+register_format('htm', iter_html_text)
+register_format('epub', iter_epub_chapters)
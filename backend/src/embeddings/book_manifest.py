@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from config import BOOK_MANIFEST_DIR
+
+# chunk id -> [chunk_index, char_start, char_end] as last stored in the index
+Manifest = Dict[str, List]
+
+
+class BookManifestStore:
+    """Records which chunk vectors each book currently has in the index.
+
+    With content-addressed chunk ids, comparing a re-upload against the stored
+    manifest tells which chunks are new (embed and upsert), unchanged (skip),
+    moved (re-upsert their stored vectors with the new position) or gone
+    (delete). One JSON file per book, replaced atomically once an ingest has
+    fully succeeded, which also records the content id (file digest) of the
+    version it describes.
+
+    Every process storing or deleting a user's books also replaces a per-user
+    stamp file under users/, so processes sharing this directory can tell that
+    their cached search results for the user are stale.
+    """
+
+    def __init__(self, path: str = BOOK_MANIFEST_DIR):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, book_id: str) -> str:
+        return os.path.join(self.path, f"{book_id}.json")
+
+    def load(self, book_id: str) -> Manifest:
+        return self.load_version(book_id)[0]
+
+    def load_version(self, book_id: str) -> Tuple[Manifest, Optional[str]]:
+        """The book's manifest and the content id it was stored with (None if unknown)"""
+        try:
+            with open(self._file(book_id), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}, None
+        except Exception as e:
+            print(f"⚠️ Unreadable manifest for book {book_id}, re-indexing it fully: {e}")
+            return {}, None
+        if "chunks" not in data:
+            # Written before manifests recorded the content id: the file is the bare chunk map
+            return data, None
+        return data["chunks"], data.get("content_id")
+
+    def save(self, book_id: str, manifest: Manifest, content_id: Optional[str] = None):
+        tmp_path = self._file(book_id) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"content_id": content_id, "chunks": manifest}, f, separators=(",", ":"))
+        os.replace(tmp_path, self._file(book_id))
+
+    def delete(self, book_id: str):
+        try:
+            os.remove(self._file(book_id))
+        except FileNotFoundError:
+            pass
+
+    def _stamp_file(self, user_email: str) -> str:
+        return os.path.join(self.path, "users", hashlib.sha1(user_email.encode("utf-8")).hexdigest())
+
+    def touch_user(self, user_email: str):
+        """Mark the user's library as changed, for every process sharing the manifests"""
+        stamp = self._stamp_file(user_email)
+        os.makedirs(os.path.dirname(stamp), exist_ok=True)
+        tmp_path = f"{stamp}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+        # A replaced file is a new inode, so two changes within one mtime tick still differ
+        os.replace(tmp_path, stamp)
+
+    def user_stamp(self, user_email: str) -> Tuple[int, int]:
+        """Identifies the user's last change by any process; (0, 0) if none was recorded"""
+        try:
+            stat = os.stat(self._stamp_file(user_email))
+        except FileNotFoundError:
+            return 0, 0
+        return stat.st_ino, stat.st_mtime_ns
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import threading
+from typing import List, Optional, Sequence
+import numpy as np
+from config import EMBED_WORKERS, EMBED_BATCH_SIZE
+
+# The model the pool workers encode with; set before forking so children share its pages
+_worker_model = None
+
+
+def _init_worker(threads: int):
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False), dtype=np.float32)
+
+
+class BulkEmbedder:
+    """Embeds large lists of chunks in length-bucketed batches across worker processes.
+
+    Texts are sorted by token length (whitespace words when the model has no
+    tokenizer) and cut into batches of `batch_size`, so each batch pads to a
+    similar length. With more than one worker the batches are spread over a
+    forked process pool created right after the model is loaded: the children
+    share the parent's model weights copy-on-write instead of loading their own.
+    Forking a process that already runs other threads can deadlock the children
+    (a lock held by another thread is copied locked), so if any are running the
+    embedder stays in-process. Results are returned in the original order.
+    """
+
+    def __init__(self, model, workers: int = EMBED_WORKERS, batch_size: int = EMBED_BATCH_SIZE):
+        global _worker_model
+        self.model = model
+        self.batch_size = batch_size
+        self.workers = workers
+        self._pool = None
+
+        if workers > 1:
+            if "fork" not in multiprocessing.get_all_start_methods():
+                print("⚠️ Multi-process embedding needs fork; embedding in-process")
+                self.workers = 1
+            elif threading.active_count() > 1:
+                print(f"⚠️ {threading.active_count() - 1} other thread(s) running, forking could deadlock; "
+                      f"embedding in-process")
+                self.workers = 1
+            else:
+                _worker_model = model
+                threads = max(1, (os.cpu_count() or 1) // workers)
+                self._pool = multiprocessing.get_context("fork").Pool(workers, _init_worker, (threads,))
+                print(f"✅ Embedding pool started: {workers} workers x {threads} threads")
+
+    def token_lengths(self, texts: Sequence[str]) -> List[int]:
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is not None:
+            return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+        return [len(text.split()) for text in texts]
+
+    def batches(self, texts: Sequence[str]) -> List[np.ndarray]:
+        """Positions of the texts grouped into length-sorted batches"""
+        order = np.argsort(self.token_lengths(texts), kind="stable")
+        return [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Embeddings of the texts, in their original order"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = self.batches(texts)
+        grouped = [[texts[i] for i in batch] for batch in batches]
+
+        if self._pool is not None and len(batches) > 1:
+            encoded = self._pool.map(_encode_batch, grouped, chunksize=1)
+        else:
+            encoded = [np.asarray(self.model.encode(group, batch_size=len(group), show_progress_bar=False),
+                                  dtype=np.float32) for group in grouped]
+
+        result: Optional[np.ndarray] = None
+        for batch, vectors in zip(batches, encoded):
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            result[batch] = vectors
+        return result
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import zlib
+from typing import Any, Dict, List, Tuple
+from config import CHUNK_STORE_DIR, CHUNK_STORE_BLOCK_BYTES, CHUNK_STORE_CACHE_BLOCKS
+from src.embeddings.query_cache import LRUTTLCache
+
+# zstd compresses text blocks better and faster than zlib; use it when installed
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# File footer: offset and length of the JSON block index
+_FOOTER = struct.Struct("<QQ")
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class BookTextWriter:
+    """Writes one book's chunk texts as compressed blocks while its chunks stream in.
+
+    Texts are packed into blocks of about CHUNK_STORE_BLOCK_BYTES before being
+    compressed and appended to a temporary file; save() adds the block index
+    and footer and moves the file into place, replacing the book's old texts.
+    """
+
+    def __init__(self, store: "ChunkTextStore", user_email: str, book_id: str):
+        self.store = store
+        self.path = store.book_path(user_email, book_id)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+        self._blocks: List[Tuple[int, int]] = []
+        self._ids: Dict[str, Tuple[int, int, int]] = {}
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+
+    def add(self, chunk_id: str, text: str):
+        data = text.encode("utf-8")
+        self._ids[chunk_id] = (len(self._blocks), self._pending_bytes, self._pending_bytes + len(data))
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= self.store.block_bytes:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        compressed = _compress(b"".join(self._pending), self.store.codec)
+        self._blocks.append((self._file.tell(), len(compressed)))
+        self._file.write(compressed)
+        self._pending, self._pending_bytes = [], 0
+
+    def save(self):
+        self._flush()
+        index = json.dumps({"codec": self.store.codec, "blocks": self._blocks, "ids": self._ids},
+                           separators=(",", ":")).encode("utf-8")
+        index_offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(_FOOTER.pack(index_offset, len(index)))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class ChunkTextStore:
+    """Full chunk texts kept on local disk, out of the vector index's metadata.
+
+    One file per user and book of zstd (or zlib) compressed blocks, addressed by
+    vector id: the book id is the id's prefix, and the file's block index maps
+    each id to a byte range of a decompressed block. get_many() reads and
+    decompresses each needed block once, and recently used blocks are kept in
+    an LRU so repeated searches over the same passages skip the decompression.
+    """
+
+    def __init__(self, path: str = CHUNK_STORE_DIR, block_bytes: int = CHUNK_STORE_BLOCK_BYTES,
+                 cache_blocks: int = CHUNK_STORE_CACHE_BLOCKS):
+        self.path = path
+        self.block_bytes = block_bytes
+        self.codec = "zstd" if ZSTD_AVAILABLE else "zlib"
+        self.blocks = LRUTTLCache(cache_blocks, float("inf"))
+        self._indexes = LRUTTLCache(max(16, cache_blocks // 4), float("inf"))
+        self.lookups = 0
+        self.misses = 0  # ids asked for that had no stored text
+        os.makedirs(self.path, exist_ok=True)
+
+    def book_path(self, user_email: str, book_id: str) -> str:
+        user_dir = hashlib.sha1(user_email.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, user_dir, f"{book_id}.chunks")
+
+    def writer(self, user_email: str, book_id: str) -> BookTextWriter:
+        return BookTextWriter(self, user_email, book_id)
+
+    def delete_book(self, user_email: str, book_id: str):
+        try:
+            os.remove(self.book_path(user_email, book_id))
+        except FileNotFoundError:
+            pass
+
+    def _index(self, fd: int, path: str, version: int) -> Dict[str, Any]:
+        index = self._indexes.get((path, version))
+        if index is None:
+            size = os.fstat(fd).st_size
+            index_offset, index_length = _FOOTER.unpack(os.pread(fd, _FOOTER.size, size - _FOOTER.size))
+            index = json.loads(os.pread(fd, index_length, index_offset))
+            self._indexes.put((path, version), index)
+        return index
+
+    def get_many(self, user_email: str, ids: List[str]) -> Dict[str, str]:
+        """Texts of the given vector ids in one pass per book; ids without a stored text are left out"""
+        by_book: Dict[str, List[str]] = {}
+        for vector_id in ids:
+            by_book.setdefault(vector_id.split("_", 1)[0], []).append(vector_id)
+
+        texts = {}
+        for book_id, book_ids in by_book.items():
+            path = self.book_path(user_email, book_id)
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with f:
+                fd = f.fileno()
+                version = os.fstat(fd).st_mtime_ns
+                index = self._index(fd, path, version)
+                for vector_id in book_ids:
+                    location = index["ids"].get(vector_id)
+                    if location is None:
+                        continue
+                    block_no, start, end = location
+                    block = self.blocks.get((path, version, block_no))
+                    if block is None:
+                        offset, length = index["blocks"][block_no]
+                        block = _decompress(os.pread(fd, length, offset), index["codec"])
+                        self.blocks.put((path, version, block_no), block)
+                    texts[vector_id] = block[start:end].decode("utf-8")
+        self.lookups += len(ids)
+        self.misses += len(ids) - len(texts)
+        return texts
+
+    def stats(self) -> Dict[str, Any]:
+        """Codec, texts not found and decompressed block cache hit ratio"""
+        return {"codec": self.codec, "block_bytes": self.block_bytes, "lookups": self.lookups, "misses": self.misses,
+                "blocks": self.blocks.stats()}
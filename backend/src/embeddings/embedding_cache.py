@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB, EMBEDDING_CACHE_DTYPE
+
+# SQLite variables per statement stay well under the default limit
+_LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by a hash of the model name and chunk text.
+
+    Vectors are stored as float16 or float32 blobs in a SQLite file, so re-ingesting
+    a book (or another copy of it) only sends unseen chunks to the model. Lookups
+    and inserts are batched, and the least recently used rows are evicted once the
+    cache holds more than max_mb of vectors.
+    """
+
+    def __init__(self, model_name: str, path: str = EMBEDDING_CACHE_PATH,
+                 max_mb: int = EMBEDDING_CACHE_MAX_MB, dtype: str = EMBEDDING_CACHE_DTYPE, dimension: int = 384):
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.dimension = dimension
+        # Each row holds a 16-byte key, the vector and a timestamp
+        self.max_entries = max(1, max_mb * 1024 * 1024 // (16 + dimension * self.dtype.itemsize + 8))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> bytes:
+        """Cache key: the model name is part of the hash so models never share vectors"""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()[:16]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up a batch of texts; returns float32 vectors, or None for misses"""
+        keys = [self.key(text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[start:start + _LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=self.dtype).astype(np.float32)
+
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for vector in results if vector is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store a batch of vectors, evicting the least recently used rows past the cap"""
+        now = time.time()
+        rows = [(self.key(text), np.asarray(vector, dtype=self.dtype).tobytes(), now)
+                for text, vector in zip(texts, vectors)]
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            self._count += self._conn.total_changes - before
+
+            excess = self._count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self._count -= excess
+                self.evictions += excess
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratio and size of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "dtype": self.dtype.name,
+        }
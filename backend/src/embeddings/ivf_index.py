@@ -0,0 +1,82 @@
+from typing import Dict, List, Optional
+import numpy as np
+from config import LOCAL_ANN_NPROBE
+
+# Rows assigned to centroids per matrix product, bounding the temporary score matrix
+_ASSIGN_BLOCK = 16384
+
+
+class IVFIndex:
+    """Inverted-file ANN index over the rows of a partition's embedding matrix.
+
+    A spherical k-means quantizer splits the (normalised) vectors into `nlist`
+    cells; a query scores only the rows of its `nprobe` closest cells. New rows
+    are assigned to their nearest existing centroid as they are added, so the
+    index is maintained incrementally and retrained only when the owner rebuilds
+    it. The index holds row numbers only; vectors stay in the owner's matrix.
+    """
+
+    def __init__(self, centroids: np.ndarray, nprobe: int = LOCAL_ANN_NPROBE):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe
+        self.nlist = len(self.centroids)
+        self.trained_size = 0
+        self._lists: List[np.ndarray] = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: int, nprobe: int = LOCAL_ANN_NPROBE,
+              iterations: int = 10, sample_per_list: int = 64, seed: int = 0) -> "IVFIndex":
+        """Fit centroids with spherical k-means on a sample of the vectors"""
+        rng = np.random.default_rng(seed)
+        nlist = max(1, min(nlist, len(vectors)))
+        sample_size = min(len(vectors), nlist * sample_per_list)
+        sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))].astype(np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty cells with random sample points
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = sums / norms
+
+        return cls(centroids, nprobe)
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest centroid of each vector"""
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), _ASSIGN_BLOCK):
+            block = np.asarray(vectors[start:start + _ASSIGN_BLOCK], dtype=np.float32)
+            labels[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def add(self, rows: np.ndarray, labels: np.ndarray):
+        """Append rows to the inverted lists of their assigned cells"""
+        order = np.argsort(labels, kind="stable")
+        rows, labels = np.asarray(rows)[order], labels[order]
+        cells, starts = np.unique(labels, return_index=True)
+        bounds = list(starts[1:]) + [len(rows)]
+        for cell, start, end in zip(cells, starts, bounds):
+            self._lists[cell] = np.concatenate([self._lists[cell], rows[start:end]])
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Rows in the `nprobe` cells closest to the query (may include tombstoned rows)"""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cell_scores = self.centroids @ query
+        probe = np.argpartition(-cell_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[cell] for cell in probe])
+
+    def labels_of(self, size: int) -> np.ndarray:
+        """Cell of every row below `size` (-1 for rows not in the index), for persistence"""
+        labels = np.full(size, -1, dtype=np.int32)
+        for cell, rows in enumerate(self._lists):
+            labels[rows[rows < size]] = cell
+        return labels
+
+    def stats(self) -> Dict[str, int]:
+        sizes = [len(rows) for rows in self._lists]
+        return {"nlist": self.nlist, "nprobe": self.nprobe, "rows": sum(sizes), "largest_list": max(sizes)}
@@ -0,0 +1,67 @@
+import random
+import time
+from typing import Any
+
+
+class LatencyInjectingIndex:
+    """Wraps an index and delays every call, optionally failing some, like a remote index.
+
+    Used with the local backend to exercise the ingest pipeline and search paths
+    under network-like conditions: each upsert/query/fetch/update/delete sleeps
+    `latency_ms` and raises ConnectionError with probability `failure_rate`
+    (before touching the wrapped index, so a retried call is safe).
+
+    With `per_vector_us`, queries also cost that much per vector in the
+    namespace they search, modelling a serverless index whose query cost grows
+    with the namespace scanned: a user_email filter over the shared namespace
+    pays for every tenant's vectors, a per-user namespace only for the user's.
+    """
+
+    def __init__(self, index, latency_ms: float, failure_rate: float = 0.0, seed: int = None,
+                 per_vector_us: float = 0.0):
+        self.index = index
+        self.latency = latency_ms / 1000.0
+        self.failure_rate = failure_rate
+        self.per_vector = per_vector_us / 1e6
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def _delay(self, operation: str, scanned: int = 0):
+        self.calls += 1
+        time.sleep(self.latency + self.per_vector * scanned)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            self.failures += 1
+            raise ConnectionError(f"injected {operation} failure")
+
+    def _scanned(self, kwargs) -> int:
+        if not self.per_vector:
+            return 0
+        return self.index.namespace_size(kwargs.get("namespace", ""))
+
+    def upsert(self, *args, **kwargs) -> Any:
+        self._delay("upsert")
+        return self.index.upsert(*args, **kwargs)
+
+    def query(self, *args, **kwargs) -> Any:
+        self._delay("query", self._scanned(kwargs))
+        return self.index.query(*args, **kwargs)
+
+    def query_many(self, *args, **kwargs) -> Any:
+        self._delay("query_many", self._scanned(kwargs))
+        return self.index.query_many(*args, **kwargs)
+
+    def fetch(self, *args, **kwargs) -> Any:
+        self._delay("fetch")
+        return self.index.fetch(*args, **kwargs)
+
+    def update(self, *args, **kwargs) -> Any:
+        self._delay("update")
+        return self.index.update(*args, **kwargs)
+
+    def delete(self, *args, **kwargs) -> Any:
+        self._delay("delete")
+        return self.index.delete(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.index, name)
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import LEXICAL_INDEX_DIR, BM25_K1, BM25_B
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+# Too common to tell chunks apart; leaving them out keeps the postings small
+STOPWORDS = frozenset("""
+a an and are as at be but by for from had has have he her his i in is it its of on or she that the their them
+they this to was were which with you not all so what when who will would there been one we my me him if do no
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class _Segment:
+    """The inverted index of one book, loaded from its .npz file.
+
+    Postings are stored CSR-style: the postings of term i are
+    docs/tfs[offsets[i]:offsets[i + 1]], where docs are positions in chunk_ids.
+    """
+
+    def __init__(self, path: str):
+        with np.load(path) as data:
+            terms = bytes(data["terms"]).decode("utf-8").split("\n") if data["terms"].size else []
+            self.chunk_ids = bytes(data["chunk_ids"]).decode("utf-8").split("\n") if data["chunk_ids"].size else []
+            self.offsets = data["offsets"]
+            self.docs = data["docs"]
+            self.tfs = data["tfs"]
+            self.doc_lengths = data["doc_lengths"]
+        self.term_index = {term: i for i, term in enumerate(terms)}
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = self.term_index.get(term)
+        if i is None:
+            return self.docs[:0], self.tfs[:0]
+        return self.docs[self.offsets[i]:self.offsets[i + 1]], self.tfs[self.offsets[i]:self.offsets[i + 1]]
+
+
+class SegmentBuilder:
+    """Collects the postings of one book while its chunks stream in; save() writes the segment"""
+
+    def __init__(self, index: "LexicalIndex", user_email: str, book_id: str):
+        self.index = index
+        self.user_email = user_email
+        self.book_id = book_id
+        self.chunk_ids: List[str] = []
+        self.doc_lengths = array("I")
+        self._postings: Dict[str, Tuple[array, array]] = {}
+
+    def add(self, chunk_id: str, text: str):
+        doc = len(self.chunk_ids)
+        tokens = tokenize(text)
+        self.chunk_ids.append(chunk_id)
+        self.doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("H"))
+            postings[0].append(doc)
+            postings[1].append(min(tf, 65535))
+
+    def save(self):
+        terms = sorted(self._postings)
+        lengths = np.array([len(self._postings[term][0]) for term in terms], dtype=np.int64)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        docs = np.empty(offsets[-1], dtype=np.uint32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for term, start, end in zip(terms, offsets[:-1], offsets[1:]):
+            docs[start:end], tfs[start:end] = self._postings[term]
+        self.index.write_segment(self.user_email, self.book_id, {
+            "terms": np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+            "chunk_ids": np.frombuffer("\n".join(self.chunk_ids).encode("utf-8"), dtype=np.uint8),
+            "offsets": offsets,
+            "docs": docs,
+            "tfs": tfs,
+            "doc_lengths": np.frombuffer(self.doc_lengths, dtype=np.uint32),
+        })
+
+
+class LexicalIndex:
+    """BM25 inverted index over chunk text, one compressed segment per user and book.
+
+    A segment is built while a book is ingested (see SegmentBuilder) and
+    replaced as a whole when the book is stored again. Search scores every book
+    of the user with BM25, using document frequencies and lengths across the
+    user's whole library. Loaded segments are kept in memory and reloaded when
+    their file changes.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_DIR, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._segments: Dict[str, Tuple[int, _Segment]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _user_dir(self, user_email: str) -> str:
+        return os.path.join(self.path, hashlib.sha1(user_email.encode("utf-8")).hexdigest())
+
+    def builder(self, user_email: str, book_id: str) -> SegmentBuilder:
+        return SegmentBuilder(self, user_email, book_id)
+
+    def write_segment(self, user_email: str, book_id: str, arrays: Dict[str, np.ndarray]):
+        user_dir = self._user_dir(user_email)
+        os.makedirs(user_dir, exist_ok=True)
+        tmp_path = os.path.join(user_dir, f"{book_id}.tmp.npz")
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, os.path.join(user_dir, f"{book_id}.npz"))
+
+    def delete_book(self, user_email: str, book_id: str):
+        segment_path = os.path.join(self._user_dir(user_email), f"{book_id}.npz")
+        with self._lock:
+            self._segments.pop(segment_path, None)
+        try:
+            os.remove(segment_path)
+        except FileNotFoundError:
+            pass
+
+    def _user_segments(self, user_email: str) -> List[_Segment]:
+        user_dir = self._user_dir(user_email)
+        if not os.path.isdir(user_dir):
+            return []
+        segments = []
+        with self._lock:
+            for entry in os.scandir(user_dir):
+                if not entry.name.endswith(".npz") or entry.name.endswith(".tmp.npz"):
+                    continue
+                mtime = entry.stat().st_mtime_ns
+                cached = self._segments.get(entry.path)
+                if cached is None or cached[0] != mtime:
+                    cached = self._segments[entry.path] = (mtime, _Segment(entry.path))
+                segments.append(cached[1])
+        return segments
+
+    def search(self, query: str, user_email: str, top_k: int) -> List[Tuple[str, float]]:
+        """(chunk id, BM25 score) of the best matching chunks in the user's library"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        segments = self._user_segments(user_email)
+        if not terms or not segments:
+            return []
+
+        total_docs = sum(len(segment.chunk_ids) for segment in segments)
+        average_length = max(1.0, sum(float(segment.doc_lengths.sum()) for segment in segments) / max(1, total_docs))
+        postings = [[segment.postings(term) for term in terms] for segment in segments]
+        document_frequency = np.zeros(len(terms))
+        for segment_postings in postings:
+            document_frequency += [len(docs) for docs, _ in segment_postings]
+        idf = np.log1p((total_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        hits: List[Tuple[str, float]] = []
+        for segment, segment_postings in zip(segments, postings):
+            if not any(len(docs) for docs, _ in segment_postings):
+                continue
+            scores = np.zeros(len(segment.chunk_ids), dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * segment.doc_lengths / average_length)
+            for weight, (docs, tfs) in zip(idf, segment_postings):
+                tf = tfs.astype(np.float32)
+                scores[docs] += weight * tf * (self.k1 + 1) / (tf + norm[docs])
+            matched = np.flatnonzero(scores)
+            top = matched[np.argsort(-scores[matched])[:top_k]]
+            hits.extend((segment.chunk_ids[doc], float(scores[doc])) for doc in top)
+
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:top_k]
+
+    def stats(self, user_email: Optional[str] = None) -> Dict[str, int]:
+        """Number of book segments and their bytes on disk, for one user or the whole index"""
+        user_dirs = [self._user_dir(user_email)] if user_email else \
+            [os.path.join(self.path, name) for name in os.listdir(self.path)]
+        books = size = 0
+        for user_dir in user_dirs:
+            if os.path.isdir(user_dir):
+                for entry in os.scandir(user_dir):
+                    if entry.name.endswith(".npz") and not entry.name.endswith(".tmp.npz"):
+                        books += 1
+                        size += entry.stat().st_size
+        return {"books": books, "bytes": size}
@@ -0,0 +1,684 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import quote, unquote
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from config import (LOCAL_INDEX_DIR, LOCAL_TOMBSTONE_MAX_RATIO, LOCAL_ANN_ENABLED,
+                    LOCAL_ANN_MIN_VECTORS, LOCAL_ANN_NLIST, LOCAL_ANN_REBUILD_GROWTH,
+                    LOCAL_QUANTIZATION, LOCAL_RESCORE_FACTOR)
+from src.embeddings.ivf_index import IVFIndex
+from src.embeddings.quantization import quantize_int8, int8_scores
+
+# Namespaced partitions live in this subdirectory, one directory per (quoted) namespace name
+_NAMESPACES_DIR = "namespaces"
+
+# Rows widened to float32 at a time when scanning or rewriting a shard (buffer stays in cache)
+_SCAN_BLOCK = 4096
+
+
+class LocalMatch:
+    """One query hit, shaped like a Pinecone match"""
+
+    def __init__(self, id: str, score: float, metadata: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.score = score
+        self.metadata = metadata or {}
+
+
+class LocalQueryResponse:
+    """Query result, shaped like a Pinecone query response"""
+
+    def __init__(self, matches: List[LocalMatch]):
+        self.matches = matches
+
+
+class LocalVector:
+    """One stored vector, shaped like a Pinecone fetched vector"""
+
+    def __init__(self, id: str, values: List[float], metadata: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.values = values
+        self.metadata = metadata or {}
+
+
+class LocalFetchResponse:
+    """Fetch result, shaped like a Pinecone fetch response: vectors by id"""
+
+    def __init__(self, vectors: Dict[str, LocalVector]):
+        self.vectors = vectors
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Pinecone's metadata filter language the app uses ($eq, $ne, $in, $nin)"""
+    for field, condition in (filter or {}).items():
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$nin" and value in operand:
+                return False
+    return True
+
+
+def _grow(array: np.ndarray, capacity: int, fill=0) -> np.ndarray:
+    grown = np.full(capacity, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _UserPartition:
+    """One user's vectors in an append-only, memory-mapped float16 shard.
+
+    Files in the user's directory (named by generation, see CURRENT):
+      vectors.<gen>.f16      L2-normalised float16 rows, appended as chunks arrive
+      metadata.<gen>.jsonl   one JSON metadata object per row
+      header.<gen>.jsonl     [id, book_id, metadata offset, metadata length] per row;
+                             {"deleted": [rows]} lines tombstone rows
+      ivf.npz, ivf.labels    IVF centroids and the cell of every row
+      codes.<gen>.i8,        int8 codes and per-row scales (LOCAL_QUANTIZATION=int8):
+      scales.<gen>.f32       candidates are scored on these and only the best
+                             top_k * LOCAL_RESCORE_FACTOR are rescored on float16
+    Loading reads only the header. Vectors are searched straight from the mmap,
+    so the OS page cache decides which users stay in memory, and metadata is
+    read from disk only for the rows a query returns. Deletes and overwrites
+    tombstone rows; the shard is rewritten as a new generation once tombstones
+    pass LOCAL_TOMBSTONE_MAX_RATIO.
+    """
+
+    def __init__(self, path: str, dimension: int):
+        self.path = path
+        self.dimension = dimension
+        # Held for every read and write of this partition; LocalIndex takes it, not the methods below
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """(Re)read the partition's current generation from disk, replacing the in-memory state"""
+        self.generation = 0
+        self.ids: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        self.book_code: Dict[Any, int] = {}
+        self.book_codes = np.zeros(0, dtype=np.int32)
+        self.meta_offsets = np.zeros(0, dtype=np.int64)
+        self.meta_lengths = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.dead = 0
+        self.vectors: Optional[np.memmap] = None
+        self.codes: Optional[np.memmap] = None
+        self.scales: Optional[np.memmap] = None
+        self.ivf: Optional[IVFIndex] = None
+
+        current = os.path.join(self.path, "CURRENT")
+        if not os.path.exists(current):
+            return
+        with open(current, "r", encoding="utf-8") as f:
+            self.generation = int(f.read().strip())
+
+        with open(self._file("header.jsonl"), "rb") as f:
+            header = f.read()
+        # A torn last line never committed; drop it so later appends start on a fresh line
+        committed = header.rfind(b"\n") + 1
+        if committed < len(header):
+            os.truncate(self._file("header.jsonl"), committed)
+        # One json.loads over the whole header is far faster than one per line
+        records = json.loads(b"[" + header[:committed].rstrip(b"\n").replace(b"\n", b",") + b"]")
+        rows = [record for record in records if isinstance(record, list)]
+        deleted = [row for record in records if isinstance(record, dict) for row in record["deleted"]]
+
+        # Vector bytes past the last committed row are leftovers of an interrupted append
+        row_bytes = self.dimension * 2
+        if os.path.getsize(self._file("vectors.f16")) > len(rows) * row_bytes:
+            os.truncate(self._file("vectors.f16"), len(rows) * row_bytes)
+
+        self._append_rows(rows)
+        self.delete_rows(deleted, log=False)
+        self._remap()
+        self._sync_codes()
+        self._load_ivf()
+
+    @property
+    def count(self) -> int:
+        """Rows in use, tombstones included"""
+        return len(self.ids)
+
+    @property
+    def size(self) -> int:
+        """Live vectors"""
+        return len(self.ids) - self.dead
+
+    def _file(self, name: str) -> str:
+        stem, ext = name.split(".")
+        return os.path.join(self.path, f"{stem}.{self.generation}.{ext}")
+
+    def _append_rows(self, rows: List[list]):
+        """Add header records ([id, book_id, offset, length]) to the in-memory columns"""
+        first, total = self.count, self.count + len(rows)
+        if total > len(self.alive):
+            capacity = max(total, len(self.alive) * 2, 1024)
+            self.alive = _grow(self.alive, capacity)
+            self.book_codes = _grow(self.book_codes, capacity, -1)
+            self.meta_offsets = _grow(self.meta_offsets, capacity)
+            self.meta_lengths = _grow(self.meta_lengths, capacity)
+
+        ids = [row[0] for row in rows]
+        stale = [self.row_of[vector_id] for vector_id in ids if vector_id in self.row_of]
+        self.ids.extend(ids)
+        self.row_of.update(zip(ids, range(first, total)))
+        codes = [self.book_code.setdefault(row[1], len(self.book_code)) for row in rows]
+        self.book_codes[first:total] = codes
+        self.meta_offsets[first:total] = [row[2] for row in rows]
+        self.meta_lengths[first:total] = [row[3] for row in rows]
+
+        # Only the last row of an id is live; earlier ones are overwrites whose
+        # tombstone was not logged (an interrupted upsert)
+        self.alive[first:total] = False
+        self.alive[[self.row_of[vector_id] for vector_id in ids]] = True
+        stale = [row for row in stale if self.alive[row]]
+        self.alive[stale] = False
+        self.dead += len(stale) + (total - first) - int(self.alive[first:total].sum())
+
+    def _remap(self):
+        self.vectors = self.codes = self.scales = None
+        if not self.count:
+            return
+        self.vectors = np.memmap(self._file("vectors.f16"), dtype=np.float16, mode="r",
+                                 shape=(self.count, self.dimension))
+        if LOCAL_QUANTIZATION == "int8" and os.path.exists(self._file("scales.f32")):
+            if os.path.getsize(self._file("scales.f32")) >= self.count * 4:
+                self.codes = np.memmap(self._file("codes.i8"), dtype=np.int8, mode="r",
+                                       shape=(self.count, self.dimension))
+                self.scales = np.memmap(self._file("scales.f32"), dtype=np.float32, mode="r", shape=(self.count,))
+
+    def _append_codes(self, values: np.ndarray):
+        codes, scales = quantize_int8(values)
+        with open(self._file("codes.i8"), "ab") as f:
+            f.write(codes.tobytes())
+        with open(self._file("scales.f32"), "ab") as f:
+            f.write(scales.tobytes())
+
+    def _sync_codes(self):
+        """Make the int8 codes cover exactly the committed rows (after a crash, or when enabling int8)"""
+        if LOCAL_QUANTIZATION != "int8" or not self.count:
+            return
+        coded = os.path.getsize(self._file("scales.f32")) // 4 if os.path.exists(self._file("scales.f32")) else 0
+        if coded > self.count:
+            os.truncate(self._file("codes.i8"), self.count * self.dimension)
+            os.truncate(self._file("scales.f32"), self.count * 4)
+        elif coded < self.count:
+            # Drop a partially written code row, then encode the rows that have none
+            for name, size in (("codes.i8", coded * self.dimension), ("scales.f32", coded * 4)):
+                with open(self._file(name), "ab") as f:
+                    f.truncate(size)
+            for start in range(coded, self.count, _SCAN_BLOCK):
+                self._append_codes(self.vectors[start:start + _SCAN_BLOCK].astype(np.float32))
+        self._remap()
+
+    def _load_ivf(self):
+        ivf_path = os.path.join(self.path, "ivf.npz")
+        if not os.path.exists(ivf_path):
+            return
+        with np.load(ivf_path) as saved:
+            if int(saved["generation"]) != self.generation:
+                return  # left over from before a compaction
+            self.ivf = IVFIndex(saved["centroids"])
+            self.ivf.trained_size = int(saved["trained_size"])
+        labels = np.fromfile(os.path.join(self.path, "ivf.labels"), dtype=np.int32)[:self.count]
+        if len(labels) < self.count:
+            labels = np.concatenate([labels, self.ivf.assign(self.vectors[len(labels):])])
+        self.ivf.add(np.arange(self.count), labels)
+
+    def _save_ivf(self):
+        np.savez(os.path.join(self.path, "ivf.tmp.npz"), centroids=self.ivf.centroids,
+                 trained_size=self.ivf.trained_size, generation=self.generation)
+        self.ivf.labels_of(self.count).tofile(os.path.join(self.path, "ivf.tmp.labels"))
+        os.replace(os.path.join(self.path, "ivf.tmp.labels"), os.path.join(self.path, "ivf.labels"))
+        os.replace(os.path.join(self.path, "ivf.tmp.npz"), os.path.join(self.path, "ivf.npz"))
+
+    def read_metadata(self, rows) -> List[Dict[str, Any]]:
+        """Metadata of the given rows, read from disk"""
+        with open(self._file("metadata.jsonl"), "rb") as f:
+            fd = f.fileno()
+            return [json.loads(os.pread(fd, int(self.meta_lengths[row]), int(self.meta_offsets[row])))
+                    for row in rows]
+
+    def upsert(self, ids: List[str], values: np.ndarray, metadata: List[Dict[str, Any]]):
+        os.makedirs(self.path, exist_ok=True)
+        if not os.path.exists(os.path.join(self.path, "CURRENT")):
+            self._write_current()
+
+        # An overwritten id gets a new row; its old row becomes a tombstone
+        self.delete_rows([self.row_of[vector_id] for vector_id in ids if vector_id in self.row_of])
+
+        # Vectors and metadata are appended first; the header line commits the rows
+        rows = []
+        with open(self._file("metadata.jsonl"), "ab") as f:
+            offset = f.tell()
+            for vector_id, meta in zip(ids, metadata):
+                line = json.dumps(meta).encode("utf-8") + b"\n"
+                f.write(line)
+                rows.append([vector_id, meta.get("book_id"), offset, len(line)])
+                offset += len(line)
+        with open(self._file("vectors.f16"), "ab") as f:
+            f.write(np.asarray(values, dtype=np.float16).tobytes())
+        if LOCAL_QUANTIZATION == "int8":
+            self._sync_codes()
+            self._append_codes(values)
+        with open(self._file("header.jsonl"), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(row) + "\n" for row in rows))
+
+        first = self.count
+        self._append_rows(rows)
+        self._remap()
+        if self.ivf:
+            labels = self.ivf.assign(values)
+            with open(os.path.join(self.path, "ivf.labels"), "ab") as f:
+                f.write(labels.tobytes())
+            self.ivf.add(np.arange(first, self.count), labels)
+        self.maintain()
+
+    def delete_rows(self, rows: List[int], log: bool = True):
+        """Tombstone rows; they are skipped by search and dropped at the next compaction"""
+        rows = sorted({int(row) for row in rows if self.alive[row]})
+        if not rows:
+            return
+        if log:
+            with open(self._file("header.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps({"deleted": rows}) + "\n")
+        for row in rows:
+            if self.row_of.get(self.ids[row]) == row:
+                del self.row_of[self.ids[row]]
+            self.alive[row] = False
+        self.dead += len(rows)
+
+    def maintain(self):
+        """Compact tombstones and (re)build the IVF index when due"""
+        if self.dead and self.dead > self.count * LOCAL_TOMBSTONE_MAX_RATIO:
+            self.compact()
+        elif not LOCAL_ANN_ENABLED or self.size < LOCAL_ANN_MIN_VECTORS:
+            self.ivf = None
+        elif self.ivf is None or self.count >= self.ivf.trained_size * LOCAL_ANN_REBUILD_GROWTH:
+            self.rebuild_ivf()
+
+    def _write_current(self):
+        with open(os.path.join(self.path, "CURRENT.tmp"), "w", encoding="utf-8") as f:
+            f.write(str(self.generation))
+        os.replace(os.path.join(self.path, "CURRENT.tmp"), os.path.join(self.path, "CURRENT"))
+
+    def compact(self):
+        """Rewrite the live rows as a new generation and rebuild the IVF index"""
+        live = np.flatnonzero(self.alive[:self.count])
+        old_files = [self._file(name) for name in ("vectors.f16", "metadata.jsonl", "header.jsonl",
+                                                   "codes.i8", "scales.f32")]
+        old_vectors, old_metadata = self.vectors, self._file("metadata.jsonl")
+        book_ids = {code: book_id for book_id, code in self.book_code.items()}
+        self.generation += 1
+
+        with open(self._file("vectors.f16"), "wb") as vectors_file, \
+                open(self._file("metadata.jsonl"), "wb") as metadata_file, \
+                open(self._file("header.jsonl"), "w", encoding="utf-8") as header_file, \
+                open(old_metadata, "rb") as source:
+            offset = 0
+            for start in range(0, len(live), _SCAN_BLOCK):
+                block = live[start:start + _SCAN_BLOCK]
+                vectors_file.write(np.ascontiguousarray(old_vectors[block]).tobytes())
+                for row in block:
+                    line = os.pread(source.fileno(), int(self.meta_lengths[row]), int(self.meta_offsets[row]))
+                    metadata_file.write(line)
+                    book_id = book_ids[int(self.book_codes[row])]
+                    header_file.write(json.dumps([self.ids[row], book_id, offset, len(line)]) + "\n")
+                    offset += len(line)
+        self._write_current()
+        for old_file in old_files:
+            if os.path.exists(old_file):
+                os.remove(old_file)
+
+        dead = self.dead
+        self._load()
+        print(f"🧹 Compacted {os.path.basename(self.path)}: dropped {dead} deleted vectors, {self.size} kept")
+        self.maintain()
+
+    def rebuild_ivf(self):
+        """Retrain the quantizer on the live rows and reassign them"""
+        started = time.time()
+        live = np.flatnonzero(self.alive[:self.count])
+        nlist = LOCAL_ANN_NLIST or int(np.sqrt(len(live)))
+        self.ivf = IVFIndex.train(self.vectors[live], nlist)
+        self.ivf.add(live, self.ivf.assign(self.vectors[live]))
+        self.ivf.trained_size = self.count
+        self._save_ivf()
+        print(f"🧭 Built IVF index: {self.ivf.nlist} cells over {len(live)} vectors in {time.time() - started:.1f}s")
+
+    def _top_k(self, rows: np.ndarray, scores: np.ndarray, top_k: int, include_metadata: bool) -> List[LocalMatch]:
+        k = min(top_k, len(rows))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        metadata = self.read_metadata(rows[top]) if include_metadata else [None] * len(top)
+        return [LocalMatch(self.ids[rows[i]], float(scores[i]), meta) for i, meta in zip(top, metadata)]
+
+    def filter_rows(self, rows: np.ndarray, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Rows matching a metadata filter; book_id is answered from the header, other fields from disk"""
+        rest = {}
+        for field, condition in (filter or {}).items():
+            if field != "book_id":
+                rest[field] = condition
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, operand in condition.items():
+                operands = operand if op in ("$in", "$nin") else [operand]
+                codes = [self.book_code[book_id] for book_id in operands if book_id in self.book_code]
+                hit = np.isin(self.book_codes[rows], codes)
+                rows = rows[~hit] if op in ("$ne", "$nin") else rows[hit]
+        if rest and len(rows):
+            mask = [matches_filter(meta, rest) for meta in self.read_metadata(rows)]
+            rows = rows[np.array(mask, dtype=bool)]
+        return rows
+
+    def live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.alive[:self.count])
+
+    def search(self, query: np.ndarray, top_k: int, filter: Optional[Dict[str, Any]],
+               nprobe: Optional[int] = None, include_metadata: bool = True) -> List[LocalMatch]:
+        if not self.size:
+            return []
+        if self.ivf:
+            rows = np.sort(self.ivf.candidates(query, nprobe))
+            rows = self.filter_rows(rows[self.alive[rows]], filter)
+            if self.codes is not None:
+                rows = self._shortlist(rows, int8_scores(self.codes[rows], self.scales[rows], query), top_k)
+            scores = self.vectors[rows].astype(np.float32) @ query
+            matches = self._top_k(rows, scores, top_k, include_metadata)
+            # A selective filter can leave the probed cells short; fall back to the exact scan
+            if len(matches) >= top_k or not filter:
+                return matches
+
+        rows = self.filter_rows(self.live_rows(), filter)
+        if self.codes is None:
+            return self._top_k(rows, self.scan(query)[rows], top_k, include_metadata)
+        rows = self._shortlist(rows, self.scan(query, quantized=True)[rows], top_k)
+        return self._top_k(rows, self.vectors[rows].astype(np.float32) @ query, top_k, include_metadata)
+
+    def search_many(self, queries: np.ndarray, top_k: int, filter: Optional[Dict[str, Any]],
+                    nprobe: Optional[int] = None, include_metadata: bool = True) -> List[List[LocalMatch]]:
+        """Search several queries; an exact scan scores them all in one pass over the shard"""
+        if not self.size:
+            return [[] for _ in queries]
+        if self.ivf:
+            # Each query probes its own cells
+            return [self.search(query, top_k, filter, nprobe, include_metadata) for query in queries]
+
+        rows = self.filter_rows(self.live_rows(), filter)
+        if self.codes is None:
+            scores = self.scan(queries.T)[rows]
+            return [self._top_k(rows, scores[:, i], top_k, include_metadata) for i in range(len(queries))]
+        approximate = self.scan(queries.T, quantized=True)[rows]
+        results = []
+        for i, query in enumerate(queries):
+            shortlist = self._shortlist(rows, approximate[:, i], top_k)
+            results.append(self._top_k(shortlist, self.vectors[shortlist].astype(np.float32) @ query,
+                                       top_k, include_metadata))
+        return results
+
+    @staticmethod
+    def _shortlist(rows: np.ndarray, approximate: np.ndarray, top_k: int) -> np.ndarray:
+        """Best rows by approximate (int8) score, to be rescored at full precision"""
+        keep = top_k * LOCAL_RESCORE_FACTOR
+        if len(rows) <= keep:
+            return rows
+        return np.sort(rows[np.argpartition(-approximate, keep - 1)[:keep]])
+
+    def scan(self, query: np.ndarray, quantized: bool = False) -> np.ndarray:
+        """Score every row against the query (or the columns of a query matrix), block by block straight off the mmap"""
+        scores = np.empty((self.count,) + query.shape[1:], dtype=np.float32)
+        buffer = np.empty((min(_SCAN_BLOCK, self.count), self.dimension), dtype=np.float32)
+        for start in range(0, self.count, _SCAN_BLOCK):
+            end = min(start + _SCAN_BLOCK, self.count)
+            if quantized:
+                scores[start:end] = int8_scores(self.codes[start:end], self.scales[start:end], query, buffer)
+                continue
+            block = self.vectors[start:end]
+            # Widen into a reused buffer: BLAS has no float16 kernels
+            np.copyto(buffer[:len(block)], block)
+            np.dot(buffer[:len(block)], query, out=scores[start:end])
+        return scores
+
+    def bytes_per_vector(self) -> int:
+        """Bytes a search reads per stored vector (codes and scales when quantized)"""
+        return self.dimension + 4 if self.codes is not None else self.dimension * 2
+
+
+class LocalIndex:
+    """Cosine-similarity index kept in NumPy, a drop-in for the Pinecone index.
+
+    Implements the part of the Pinecone Index API VectorStore uses (upsert, query,
+    fetch, update, delete, list, describe_index_stats), plus query_many for
+    batched search. Every call takes an optional `namespace`; each namespace is
+    its own partition under namespaces/. Vectors upserted without one go to the
+    shared space, where they are partitioned by their user_email metadata, so a
+    query filtered on user_email only scores that user's matrix.
+    Small partitions are scanned exactly; partitions past LOCAL_ANN_MIN_VECTORS
+    are searched through an IVF index (pass `nprobe=` to query to trade latency
+    for recall). Each partition is an append-only float16 shard under
+    LOCAL_INDEX_DIR, memory-mapped on first use.
+
+    Each partition has its own lock, so a compaction or IVF rebuild triggered by
+    one user's upsert only blocks that partition; the index-wide lock guards
+    just the registry of loaded partitions.
+    """
+
+    def __init__(self, path: str = LOCAL_INDEX_DIR, dimension: int = 384):
+        self.path = path
+        self.dimension = dimension
+        self._partitions: Dict[str, _UserPartition] = {}  # by directory
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _load(self, path: str) -> _UserPartition:
+        with self._lock:
+            partition = self._partitions.get(path)
+            if partition is not None:
+                return partition
+            loading = self._loading.setdefault(path, threading.Lock())
+        # Reading a partition's header can take a while; only callers of the same partition wait for it
+        with loading:
+            with self._lock:
+                partition = self._partitions.get(path)
+            if partition is None:
+                partition = _UserPartition(path, self.dimension)
+                with self._lock:
+                    self._partitions[path] = partition
+                    self._loading.pop(path, None)
+        return partition
+
+    def _partition(self, user_email: str) -> _UserPartition:
+        """A user's partition of the shared space"""
+        return self._load(os.path.join(self.path, hashlib.sha1(user_email.encode("utf-8")).hexdigest()))
+
+    def _namespace(self, namespace: str) -> _UserPartition:
+        return self._load(os.path.join(self.path, _NAMESPACES_DIR, quote(namespace, safe="")))
+
+    def _all_partitions(self) -> List[_UserPartition]:
+        """Every persisted partition of the shared space, loading the ones not touched yet"""
+        return [self._load(os.path.join(self.path, name)) for name in sorted(os.listdir(self.path))
+                if name != _NAMESPACES_DIR]
+
+    def _namespaces(self) -> List[str]:
+        namespaces_dir = os.path.join(self.path, _NAMESPACES_DIR)
+        return [unquote(name) for name in sorted(os.listdir(namespaces_dir))] if os.path.isdir(namespaces_dir) else []
+
+    def _partitions_for(self, filter: Optional[Dict[str, Any]], namespace: str = ""):
+        """Partitions a filter can match, and what is left of the filter within them"""
+        if namespace:
+            return [self._namespace(namespace)], filter
+        condition = (filter or {}).get("user_email")
+        user_email = condition.get("$eq") if isinstance(condition, dict) else condition
+        if user_email is None:
+            return self._all_partitions(), filter
+        # The partition already is the user_email filter
+        rest = {field: cond for field, cond in filter.items() if field != "user_email"}
+        return [self._partition(user_email)], rest
+
+    def _normalise(self, values) -> np.ndarray:
+        vectors = np.asarray(values, dtype=np.float32).reshape(-1, self.dimension)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = "", **kwargs):
+        by_partition: Dict[str, Tuple[_UserPartition, List[Dict[str, Any]]]] = {}
+        for vector in vectors:
+            partition = self._namespace(namespace) if namespace else \
+                self._partition(vector.get("metadata", {}).get("user_email", ""))
+            by_partition.setdefault(partition.path, (partition, []))[1].append(vector)
+
+        for partition, batch in by_partition.values():
+            values = self._normalise([vector["values"] for vector in batch])
+            with partition.lock:
+                partition.upsert(
+                    [vector["id"] for vector in batch],
+                    values,
+                    [vector.get("metadata", {}) for vector in batch],
+                )
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k: int = 10, filter: Optional[Dict[str, Any]] = None,
+              include_metadata: bool = False, namespace: str = "", **kwargs) -> LocalQueryResponse:
+        query = self._normalise(vector)[0]
+        partitions, filter = self._partitions_for(filter, namespace)
+        matches = []
+        for partition in partitions:
+            with partition.lock:
+                matches.extend(partition.search(query, top_k, filter, kwargs.get("nprobe"), include_metadata))
+
+        matches.sort(key=lambda match: match.score, reverse=True)
+        return LocalQueryResponse(matches[:top_k])
+
+    def _locate(self, ids: List[str], namespace: str = "") -> List[Tuple[_UserPartition, List[str]]]:
+        """Partitions holding the given ids, with the ids each holds; loaded partitions are checked first.
+
+        Rows are looked up again under the partition's lock, as a compaction may renumber them meanwhile.
+        """
+        remaining = set(ids)
+        found = []
+        if namespace:
+            phases = [[self._namespace(namespace)]]
+        else:
+            with self._lock:
+                loaded = [partition for path, partition in self._partitions.items()
+                          if os.path.dirname(path) == self.path]
+            phases = [loaded, None]
+        for partitions in phases:
+            if partitions is None:
+                if not remaining:
+                    break
+                partitions = self._all_partitions()
+            for partition in partitions:
+                with partition.lock:
+                    held = [vector_id for vector_id in remaining if vector_id in partition.row_of]
+                if held:
+                    found.append((partition, held))
+                    remaining.difference_update(held)
+        return found
+
+    def fetch(self, ids: List[str], namespace: str = "", **kwargs) -> LocalFetchResponse:
+        """Stored values and metadata of the given ids; missing ids are left out"""
+        vectors = {}
+        for partition, held in self._locate(ids, namespace):
+            with partition.lock:
+                rows = [partition.row_of[vector_id] for vector_id in held if vector_id in partition.row_of]
+                values = partition.vectors[rows].astype(np.float32)
+                for row, vector, meta in zip(rows, values, partition.read_metadata(rows)):
+                    vectors[partition.ids[row]] = LocalVector(partition.ids[row], vector.tolist(), meta)
+        return LocalFetchResponse(vectors)
+
+    def update(self, id: str, values=None, set_metadata: Optional[Dict[str, Any]] = None,
+               namespace: str = "", **kwargs):
+        """Replace a vector's values and/or merge fields into its metadata"""
+        for partition, _ in self._locate([id], namespace):
+            with partition.lock:
+                row = partition.row_of.get(id)
+                if row is None:
+                    continue
+                metadata = {**partition.read_metadata([row])[0], **(set_metadata or {})}
+                vector = self._normalise(values) if values is not None else \
+                    np.asarray(partition.vectors[row:row + 1], dtype=np.float32)
+                partition.upsert([id], vector, [metadata])
+        return {}
+
+    def query_many(self, vectors, top_k: int = 10, filter: Optional[Dict[str, Any]] = None,
+                   include_metadata: bool = False, namespace: str = "", **kwargs) -> List[LocalQueryResponse]:
+        """Several queries in one call, sharing the filter and the pass over each partition"""
+        queries = self._normalise(vectors)
+        partitions, filter = self._partitions_for(filter, namespace)
+        matches = [[] for _ in queries]
+        for partition in partitions:
+            with partition.lock:
+                partition_matches = partition.search_many(queries, top_k, filter, kwargs.get("nprobe"),
+                                                          include_metadata)
+            for found, hits in zip(matches, partition_matches):
+                found.extend(hits)
+
+        for found in matches:
+            found.sort(key=lambda match: match.score, reverse=True)
+        return [LocalQueryResponse(found[:top_k]) for found in matches]
+
+    def delete(self, ids: Optional[List[str]] = None, filter: Optional[Dict[str, Any]] = None,
+               delete_all: bool = False, namespace: str = "", **kwargs):
+        if ids and not filter:
+            targets = [partition for partition, _ in self._locate(ids, namespace)]
+        elif ids or filter or delete_all:
+            targets, filter = self._partitions_for(filter, namespace)
+        else:
+            targets = []
+        for partition in targets:
+            with partition.lock:
+                rows = [partition.row_of[vector_id] for vector_id in set(ids) if vector_id in partition.row_of] \
+                    if ids else list(partition.filter_rows(partition.live_rows(), filter))
+                if rows:
+                    partition.delete_rows(rows)
+                    partition.maintain()
+        return {}
+
+    def list(self, prefix: Optional[str] = None, namespace: str = "", limit: int = 100, **kwargs):
+        """Live ids, optionally only those starting with `prefix`, in pages of `limit` (like Pinecone's list)"""
+        partitions = [self._namespace(namespace)] if namespace else self._all_partitions()
+        ids = []
+        for partition in partitions:
+            with partition.lock:
+                ids.extend(partition.ids[row] for row in partition.live_rows()
+                           if prefix is None or partition.ids[row].startswith(prefix))
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def namespace_size(self, namespace: str = "") -> int:
+        """Live vectors a query in the namespace has to consider"""
+        partitions = [self._namespace(namespace)] if namespace else self._all_partitions()
+        return sum(partition.size for partition in partitions)
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        shared = self._all_partitions()
+        namespaced = {namespace: self._namespace(namespace) for namespace in self._namespaces()}
+        partitions = shared + list(namespaced.values())
+        namespaces = {namespace: {"vector_count": partition.size} for namespace, partition in namespaced.items()}
+        if shared:
+            namespaces[""] = {"vector_count": sum(partition.size for partition in shared)}
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(partition.size for partition in partitions),
+            "index_fullness": 0.0,
+            "tombstones": sum(partition.dead for partition in partitions),
+            "ann_partitions": sum(1 for partition in partitions if partition.ivf),
+            "quantization": LOCAL_QUANTIZATION,
+        }
@@ -0,0 +1,23 @@
+from typing import Tuple
+import numpy as np
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 codes: v ≈ scale * code, with scale = max|v| / 127"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray,
+                buffer: np.ndarray = None) -> np.ndarray:
+    """Approximate dot products of a query (or a (dimension, n_queries) matrix) with int8-coded vectors"""
+    if buffer is None:
+        widened = codes.astype(np.float32)
+    else:
+        widened = buffer[:len(codes)]
+        np.copyto(widened, codes)
+    scores = widened @ query
+    return scores * (scales if scores.ndim == 1 else scales[:, None])
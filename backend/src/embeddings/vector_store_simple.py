@@ -1,9 +1,27 @@
 import time
 import hashlib
-from typing import List, Dict, Any, Optional
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Iterable, Optional, Tuple, Union
 from pinecone import Pinecone, ServerlessSpec
 import numpy as np
-from config import PINECONE_API_KEY, PINECONE_INDEX_NAME
+from config import (PINECONE_API_KEY, PINECONE_INDEX_NAME, INGEST_BATCH_SIZE, EMBEDDING_CACHE_ENABLED, VECTOR_BACKEND,
+                    EMBED_BATCHING_ENABLED, INGEST_UPSERT_CONCURRENCY, INGEST_UPSERT_RETRIES, INGEST_RETRY_BACKOFF,
+                    VECTOR_INDEX_LATENCY_MS, VECTOR_INDEX_FAILURE_RATE, VECTOR_INDEX_PER_VECTOR_US,
+                    VECTOR_NAMESPACES, QUERY_CACHE_ENABLED,
+                    QUERY_EMBEDDING_CACHE_SIZE, SEARCH_RESULT_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS,
+                    RETRIEVAL_MODE, HYBRID_CANDIDATES_FACTOR, RRF_K, CHUNK_STORE_ENABLED,
+                    CHUNK_STORE_FALLBACK_CHARS, BOOK_VERSION_MIN_SHARED)
+from src.embeddings.book_manifest import BookManifestStore
+from src.embeddings.bulk_embedder import BulkEmbedder
+from src.embeddings.chunk_store import ChunkTextStore
+from src.embeddings.embedding_batcher import EmbeddingBatcher
+from src.embeddings.embedding_cache import EmbeddingCache
+from src.embeddings.latency_index import LatencyInjectingIndex
+from src.embeddings.lexical_index import LexicalIndex
+from src.embeddings.local_index import LocalIndex, LocalQueryResponse
+from src.embeddings.query_cache import LRUTTLCache
 
 # Try to import sentence-transformers, but handle gracefully if not available
 try:
@@ -13,22 +31,62 @@ except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
     print("⚠️ sentence-transformers not available, using mock embeddings")
 
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Pinecone accepts at most 1000 ids per delete call
+DELETE_BATCH_SIZE = 1000
+# Concurrent queries per batch search when the index has no batched query
+SEARCH_BATCH_CONCURRENCY = 8
+
 class VectorStore:
     def __init__(self):
-        """Initialize Pinecone connection and embedding model"""
+        """Initialize the vector index (Pinecone or local) and embedding model"""
         self.embedding_model = None
+        self.embedding_cache = None
+        self.query_batcher = None
+        self.bulk_embedder = None
+        self.manifests = BookManifestStore()
+        self.lexical_index = LexicalIndex()
+        self.chunk_store = ChunkTextStore() if CHUNK_STORE_ENABLED else None
+        self.query_embedding_cache = None
+        self.search_result_cache = None
+        # Bumped whenever a user's vectors change; part of the search result cache key
+        self._index_versions: Dict[str, int] = {}
+        self._versions_lock = threading.Lock()
+        if QUERY_CACHE_ENABLED:
+            self.query_embedding_cache = LRUTTLCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS)
+            self.search_result_cache = LRUTTLCache(SEARCH_RESULT_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS)
         self.index = None
+        self.namespaces = VECTOR_NAMESPACES == "user"
+        # Users with no vectors left in the shared namespace (tools/migrate_namespaces.py has moved them)
+        self._migrated_users = set()
         self.initialized = False
         self.pc = None
         
         try:
             # Initialize embedding model if available
             if SENTENCE_TRANSFORMERS_AVAILABLE:
-                print(f"Loading embedding model: all-MiniLM-L6-v2")
-                self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+                print(f"Loading embedding model: {MODEL_NAME}")
+                self.embedding_model = SentenceTransformer(MODEL_NAME)
+                # Fork the embedding workers now, before any other threads exist
+                self.bulk_embedder = BulkEmbedder(self.embedding_model)
+                if EMBEDDING_CACHE_ENABLED:
+                    self.embedding_cache = EmbeddingCache(MODEL_NAME)
+                if EMBED_BATCHING_ENABLED:
+                    self.query_batcher = EmbeddingBatcher(self.generate_query_embeddings)
             else:
                 print("⚠️ Running in mock mode - embeddings will be random")
             
+            if VECTOR_BACKEND == "local":
+                self.index = LocalIndex(dimension=384)
+                if VECTOR_INDEX_LATENCY_MS or VECTOR_INDEX_FAILURE_RATE or VECTOR_INDEX_PER_VECTOR_US:
+                    self.index = LatencyInjectingIndex(self.index, VECTOR_INDEX_LATENCY_MS, VECTOR_INDEX_FAILURE_RATE,
+                                                       per_vector_us=VECTOR_INDEX_PER_VECTOR_US)
+                    print(f"⚠️ Index calls delayed {VECTOR_INDEX_LATENCY_MS}ms, failing {VECTOR_INDEX_FAILURE_RATE:.0%}")
+                self.initialized = True
+                print("✅ Vector store initialized with the local NumPy index!")
+                return
+            
             # Initialize Pinecone with just the API key
             print(f"Connecting to Pinecone...")
             self.pc = Pinecone(api_key=PINECONE_API_KEY)
@@ -68,65 +126,440 @@ class VectorStore:
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of texts"""
         if SENTENCE_TRANSFORMERS_AVAILABLE and self.embedding_model:
+            if self.embedding_cache:
+                return self._generate_embeddings_cached(texts)
             # Use real embeddings
-            embeddings = self.embedding_model.encode(texts, show_progress_bar=False)
-            return embeddings.tolist()
+            return self.bulk_embedder.encode(texts).tolist()
         else:
             # Generate mock embeddings (random vectors) for testing
             print("⚠️ Using random mock embeddings")
             return [np.random.randn(384).tolist() for _ in texts]
     
-    def store_chunks(self, chunks: List[str], metadata: Dict[str, Any], user_email: str, book_title: str) -> bool:
+    def generate_query_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed search queries, bypassing the on-disk embedding cache.
+        
+        User prompts are not written to disk, and a search writes nothing; repeat
+        queries are served by the in-memory query embedding cache instead.
+        """
+        if SENTENCE_TRANSFORMERS_AVAILABLE and self.embedding_model:
+            return self.bulk_embedder.encode(texts).tolist()
+        return self.generate_embeddings(texts)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed one search query, sharing a model call with concurrent queries when batching is on"""
+        if self.query_embedding_cache:
+            key = self._query_key(query)
+            embedding = self.query_embedding_cache.get(key)
+            if embedding is None:
+                embedding = self._embed_query_uncached(query)
+                self.query_embedding_cache.put(key, embedding)
+            return embedding
+        return self._embed_query_uncached(query)
+    
+    @staticmethod
+    def _query_key(query: str) -> str:
+        """Query embedding cache key; MiniLM's tokenizer lowercases and splits on whitespace too"""
+        return " ".join(query.lower().split())
+    
+    def _result_key(self, user_email: str, query: str, query_embedding: List[float], top_k: int,
+                    version: int, mode: str) -> tuple:
+        """Search result cache key; the version changes whenever the user's vectors do"""
+        embedding_hash = hashlib.sha1(np.asarray(query_embedding, dtype=np.float32).tobytes()).digest()
+        # Hybrid results also depend on the query's terms, which the lexical index sees lowercased
+        terms = self._query_key(query) if mode == "hybrid" else None
+        return (user_email, embedding_hash, top_k, version, terms)
+    
+    def _embed_query_uncached(self, query: str) -> List[float]:
+        if self.query_batcher:
+            return self.query_batcher.encode([query])[0]
+        return self.generate_query_embeddings([query])[0]
+    
+    @staticmethod
+    def namespace_for(user_email: str) -> str:
+        """The user's namespace; its vector ids start with their book id, so each book is an id prefix"""
+        return "u-" + hashlib.sha256(user_email.encode("utf-8")).hexdigest()[:32]
+    
+    def _scope(self, user_email: str) -> Dict[str, Any]:
+        """Index call arguments that address the user's vectors when writing, fetching or deleting by id"""
+        return {"namespace": self.namespace_for(user_email)} if self.namespaces else {}
+    
+    def _query_user(self, vectors: List[List[float]], user_email: str, top_k: int) -> List[Any]:
+        """Index responses for the query vectors, searched among the user's vectors only.
+        
+        Until the user's vectors are all migrated, their namespace and their
+        part of the shared namespace are both searched and the hits merged.
+        """
+        shared_filter = {"user_email": {"$eq": user_email}}
+        if not self.namespaces:
+            return self._query_index(vectors, top_k, filter=shared_filter)
+        responses = self._query_index(vectors, top_k, namespace=self.namespace_for(user_email))
+        if user_email in self._migrated_users:
+            return responses
+        legacy = self._query_index(vectors, top_k, filter=shared_filter)
+        if not any(response.matches for response in legacy):
+            self._migrated_users.add(user_email)
+            return responses
+        merged = []
+        for own, shared in zip(responses, legacy):
+            # An interrupted (or --keep-source) migration leaves some ids in both namespaces
+            best = {}
+            for match in list(own.matches) + list(shared.matches):
+                if match.id not in best or match.score > best[match.id].score:
+                    best[match.id] = match
+            merged.append(LocalQueryResponse(sorted(best.values(), key=lambda match: match.score,
+                                                    reverse=True)[:top_k]))
+        return merged
+    
+    def _has_legacy_vectors(self, user_email: str) -> bool:
+        """Whether some of the user's vectors are still in the shared namespace"""
+        if not self.namespaces or user_email in self._migrated_users:
+            return False
+        probe = self.index.query(vector=[1.0] * 384, top_k=1, filter={"user_email": {"$eq": user_email}},
+                                 include_metadata=False)
+        if probe.matches:
+            return True
+        # Nothing is written to the shared namespace any more, so this stays true
+        self._migrated_users.add(user_email)
+        return False
+    
+    def _query_index(self, vectors: List[List[float]], top_k: int, **scope) -> List[Any]:
+        if len(vectors) == 1:
+            return [self.index.query(vector=vectors[0], top_k=top_k, include_metadata=True, **scope)]
+        if hasattr(self.index, "query_many"):
+            return self.index.query_many(vectors, top_k=top_k, include_metadata=True, **scope)
+        # Pinecone has no batched query
+        with ThreadPoolExecutor(min(len(vectors), SEARCH_BATCH_CONCURRENCY)) as pool:
+            return list(pool.map(lambda vector: self.index.query(vector=vector, top_k=top_k, include_metadata=True,
+                                                                 **scope), vectors))
+    
+    def index_version(self, user_email: str) -> Tuple[int, Tuple[int, int]]:
+        """Changes to the user's vectors: this process's count and the last change by any process"""
+        return self._index_versions.get(user_email, 0), self.manifests.user_stamp(user_email)
+    
+    def _bump_index_version(self, user_email: str):
+        """Invalidate the user's cached search results, here and in processes sharing the manifests"""
+        with self._versions_lock:
+            self._index_versions[user_email] = self._index_versions.get(user_email, 0) + 1
+        try:
+            self.manifests.touch_user(user_email)
+        except OSError as e:
+            print(f"⚠️ Could not record the change for other processes: {e}")
+    
+    def _generate_embeddings_cached(self, texts: List[str]) -> List[List[float]]:
+        """Look the texts up in the embedding cache and only encode the misses"""
+        vectors = self.embedding_cache.get_many(texts)
+        hits = sum(1 for vector in vectors if vector is not None)
+        
+        # Encode each distinct missing text once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = self.bulk_embedder.encode(missing)
+            self.embedding_cache.put_many(missing, encoded)
+            by_text = dict(zip(missing, encoded))
+            vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        
+        if len(texts) > 1:
+            print(f"♻️ {hits}/{len(texts)} embeddings from cache")
+        return np.asarray(vectors, dtype=np.float32).tolist()
+    
+    def store_chunks(self, chunks: List[Union[str, Dict[str, Any]]], metadata: Dict[str, Any], user_email: str,
+                     book_title: str, content_id: Optional[str] = None) -> bool:
         """Store text chunks with embeddings in Pinecone"""
+        return self.store_chunk_stream(iter(chunks), metadata, user_email, book_title, content_id) is not None
+    
+    @staticmethod
+    def book_id_for(user_email: str, book_title: str, content_id: Optional[str] = None) -> str:
+        """Stable id of a user's book, so processing it again lands on the same vectors.
+        
+        Books are keyed on the user and title, so an edited re-upload is diffed
+        against the stored version. With `content_id` (the uploaded file's
+        SHA-256) it is the id of a different file kept apart from the book
+        already stored under that title (see _resolve_book).
+        """
+        key = f"{user_email}\0{book_title}" if content_id is None else f"{user_email}\0{book_title}\0{content_id}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    
+    @staticmethod
+    def chunk_id_for(book_id: str, text: str, occurrence: int) -> str:
+        """Content-addressed chunk id; `occurrence` numbers repeats of the same text within a book"""
+        return f"{book_id}_{hashlib.sha256(text.encode('utf-8')).hexdigest()[:20]}_{occurrence}"
+    
+    def store_chunk_stream(self, chunks: Iterable[Union[str, Dict[str, Any]]], metadata: Dict[str, Any], user_email: str,
+                           book_title: str, content_id: Optional[str] = None, batch_size: int = INGEST_BATCH_SIZE,
+                           upsert_concurrency: int = INGEST_UPSERT_CONCURRENCY) -> Optional[Dict[str, Any]]:
+        """Embed and upsert chunks in bounded batches as they arrive from a generator.
+        
+        Chunks are plain strings or chunker dicts ({"text", "start", "end"}); the
+        character span of a dict chunk is kept in its metadata.
+        
+        The book id comes from the user and title (see _resolve_book), and chunk
+        ids from the chunk text, so re-processing a book (an edited file, or new
+        chunking settings) is compared with its manifest: only chunks with new text are
+        embedded and upserted, chunks that merely moved are re-upserted in
+        batches with their stored vectors and new positions, and chunks no
+        longer in the book are deleted in bulk. Chunks of a book still in the
+        shared namespace are moved into the user's namespace on the way. Every chunk also goes into the book's BM25 segment in
+        the lexical index, which is replaced once the ingest has succeeded.
+        With the chunk store enabled, full texts go to the book's compressed
+        text file and the vectors' metadata keeps only a short prefix.
+        
+        Ingest is pipelined: while batch N is being upserted by a pool of
+        `upsert_concurrency` threads (each call retried on failure), batch N+1
+        is already being embedded. At most `upsert_concurrency` calls are in
+        flight, so memory stays bounded. `upsert_concurrency=0` upserts inline.
+        
+        Returns ingest stats (chunk counts, batches, time to first upserted vector),
+        or None if the store failed. If the chunk stream itself raises (the file
+        could not be fully extracted), no stale chunk is deleted and the book's
+        manifest, BM25 segment and chunk texts are left as they were.
+        """
         if not self.initialized:
             print("Vector store not initialized")
-            return False
+            return None
         
+        pool = ThreadPoolExecutor(upsert_concurrency, thread_name_prefix="upsert") if upsert_concurrency > 0 else None
+        texts = None
+        pending = set()
+        stats_lock = threading.Lock()
         try:
-            # Generate embeddings for all chunks
-            print(f"Generating embeddings for {len(chunks)} chunks...")
-            embeddings = self.generate_embeddings(chunks)
+            started = time.perf_counter()
+            book_id, previous, chunks = self._resolve_book(chunks, user_email, book_title, content_id, batch_size)
+            scope = self._scope(user_email)
+            # Ids of this book not migrated to the user's namespace yet
+            legacy = set()
+            if previous and self._has_legacy_vectors(user_email):
+                legacy = {chunk_id for ids in self.index.list(prefix=f"{book_id}_") for chunk_id in ids}
+            lexical = self.lexical_index.builder(user_email, book_id)
+            if self.chunk_store:
+                texts = self.chunk_store.writer(user_email, book_id)
+            manifest: Dict[str, List] = {}
+            occurrences: Dict[str, int] = {}
+            stats = {"book_id": book_id, "chunks": 0, "embedded": 0, "unchanged": 0, "moved": 0, "migrated": 0,
+                     "deleted": 0, "batches": 0, "first_upsert_seconds": None, "embed_seconds": 0.0, "upsert_retries": 0}
             
-            # Prepare vectors for upsert
-            vectors = []
-            book_id = hashlib.md5(f"{user_email}_{book_title}_{time.time()}".encode()).hexdigest()
+            def count(key, amount, retries):
+                with stats_lock:
+                    stats[key] += amount
+                    stats["upsert_retries"] += retries
             
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                vector_id = f"{book_id}_chunk_{i}"
+            def upsert(vectors):
+                retries = self._call_with_retry(self.index.upsert, vectors=vectors, **scope)
+                with stats_lock:
+                    stats["upsert_retries"] += retries
+                    stats["embedded"] += len(vectors)
+                    stats["batches"] += 1
+                    if stats["first_upsert_seconds"] is None:
+                        stats["first_upsert_seconds"] = round(time.perf_counter() - started, 3)
+                    if stats["batches"] % 10 == 0:
+                        print(f"Upserted {stats['batches']} batches ({stats['embedded']} chunks so far)")
+            
+            def update_positions(moved, source):
+                # One fetch and one upsert per batch; a per-chunk update would cost a round trip each
+                stored = {}
                 
-                # Create metadata
-                chunk_metadata = {
-                    "user_email": user_email,
-                    "book_title": book_title[:100],
-                    "book_id": book_id,
-                    "chunk_index": i,
-                    "text": chunk[:1000],
-                    "timestamp": time.time(),
-                    **metadata
-                }
+                def fetch(ids, **kwargs):
+                    stored.update(self.index.fetch(ids=ids, **kwargs).vectors)
                 
-                vectors.append({
-                    "id": vector_id,
-                    "values": embedding,
-                    "metadata": chunk_metadata
-                })
-            
-            # Upsert in batches
-            batch_size = 100
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i+batch_size]
-                self.index.upsert(vectors=batch)
-                print(f"Upserted batch {i//batch_size + 1}/{(len(vectors)-1)//batch_size + 1}")
-            
-            print(f"✅ Stored {len(chunks)} chunks for book: {book_title}")
-            return True
+                retries = self._call_with_retry(fetch, ids=[chunk["id"] for chunk in moved], **source)
+                vectors, missing = [], []
+                for chunk in moved:
+                    vector = stored.get(chunk["id"])
+                    if vector is None:
+                        missing.append(chunk)
+                        continue
+                    position = {"chunk_index": chunk["index"]}
+                    if "start" in chunk:
+                        position.update(char_start=chunk["start"], char_end=chunk["end"])
+                    vectors.append({"id": chunk["id"], "values": list(vector.values),
+                                    "metadata": {**vector.metadata, **position}})
+                if vectors:
+                    retries += self._call_with_retry(self.index.upsert, vectors=vectors, **scope)
+                if source != scope:
+                    # Copied into the user's namespace; only now drop the shared copies
+                    retries += self._call_with_retry(self.index.delete, ids=[chunk["id"] for chunk in moved], **source)
+                count("migrated" if source != scope else "moved", len(vectors), retries)
+                if missing:
+                    # In the manifest but gone from the index: embed them again
+                    upsert(self._build_vectors(missing, book_id, metadata, user_email, book_title))
+            
+            def delete(stale, source):
+                count("deleted", len(stale), self._call_with_retry(self.index.delete, ids=stale, **source))
+            
+            def run(task, *args):
+                if pool is None:
+                    task(*args)
+                    return
+                # Wait for a free slot; a failed call stops the ingest
+                while len(pending) >= upsert_concurrency:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.discard(future)
+                        future.result()
+                pending.add(pool.submit(task, *args))
+            
+            def embed(batch):
+                embed_started = time.perf_counter()
+                vectors = self._build_vectors(batch, book_id, metadata, user_email, book_title)
+                stats["embed_seconds"] += time.perf_counter() - embed_started
+                run(upsert, vectors)
+            
+            batch, moved, migrating = [], [], []
+            for chunk in chunks:
+                chunk = chunk if isinstance(chunk, dict) else {"text": chunk}
+                digest = hashlib.sha256(chunk["text"].encode("utf-8")).hexdigest()
+                occurrence = occurrences[digest] = occurrences.get(digest, -1) + 1
+                chunk_id = self.chunk_id_for(book_id, chunk["text"], occurrence)
+                position = [stats["chunks"], chunk.get("start"), chunk.get("end")]
+                manifest[chunk_id] = position
+                lexical.add(chunk_id, chunk["text"])
+                if texts:
+                    texts.add(chunk_id, chunk["text"])
+                stats["chunks"] += 1
+                
+                known = previous.get(chunk_id)
+                if known is None:
+                    batch.append({**chunk, "id": chunk_id, "index": position[0]})
+                    if len(batch) >= batch_size:
+                        embed(batch)
+                        batch = []
+                elif chunk_id in legacy:
+                    # Moved or not, it goes into the user's namespace with its stored vector
+                    migrating.append({**chunk, "id": chunk_id, "index": position[0]})
+                    if len(migrating) >= batch_size:
+                        run(update_positions, migrating, {})
+                        migrating = []
+                elif known != position:
+                    moved.append({**chunk, "id": chunk_id, "index": position[0]})
+                    if len(moved) >= batch_size:
+                        run(update_positions, moved, scope)
+                        moved = []
+                else:
+                    stats["unchanged"] += 1
+            if batch:
+                embed(batch)
+            if moved:
+                run(update_positions, moved, scope)
+            if migrating:
+                run(update_positions, migrating, {})
+            
+            # Chunks of the previous version that are gone from this one, deleted where they are
+            stale = [chunk_id for chunk_id in previous if chunk_id not in manifest]
+            for source, ids in ((scope, [chunk_id for chunk_id in stale if chunk_id not in legacy]),
+                                ({}, [chunk_id for chunk_id in stale if chunk_id in legacy])):
+                for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                    run(delete, ids[start:start + DELETE_BATCH_SIZE], source)
+            for future in pending:
+                future.result()
+            if texts:
+                texts.save()
+            lexical.save()
+            self.manifests.save(book_id, manifest, content_id)
+            
+            stats["embed_seconds"] = round(stats["embed_seconds"], 3)
+            stats["total_seconds"] = round(time.perf_counter() - started, 3)
+            print(f"✅ Stored {stats['chunks']} chunks for book: {book_title} ({stats['embedded']} embedded, "
+                  f"{stats['unchanged']} unchanged, {stats['moved']} moved, {stats['migrated']} migrated, "
+                  f"{stats['deleted']} stale deleted; "
+                  f"total {stats['total_seconds']}s)")
+            return stats
             
         except Exception as e:
             print(f"❌ Failed to store chunks: {e}")
-            return False
+            return None
+        finally:
+            if pool is not None:
+                for future in pending:
+                    future.cancel()
+                pool.shutdown(wait=True)
+            if texts:
+                texts.discard()
+            # Even a failed ingest may have changed some vectors
+            self._bump_index_version(user_email)
     
-    def search_similar_chunks(self, query: str, user_email: str, top_k: int = 5) -> List[Dict]:
-        """Search for chunks similar to the query"""
+    def _resolve_book(self, chunks: Iterable[Union[str, Dict[str, Any]]], user_email: str, book_title: str,
+                      content_id: Optional[str], batch_size: int):
+        """Pick the book an upload belongs to; returns (book id, its manifest, the chunks to ingest).
+        
+        An upload is a new version of the book stored under its title when the
+        file is the same or shares at least BOOK_VERSION_MIN_SHARED of its first
+        batch of chunks with it (an edit). A different file under the same
+        title that shares less is another book, stored under an id that also
+        covers its content id. Only that first batch is read ahead.
+        """
+        book_id = self.book_id_for(user_email, book_title)
+        previous, previous_content = self.manifests.load_version(book_id)
+        if not content_id or not previous or previous_content in (None, content_id):
+            return book_id, previous, chunks
+        
+        apart_id = self.book_id_for(user_email, book_title, content_id)
+        apart = self.manifests.load(apart_id)
+        if apart:
+            return apart_id, apart, chunks
+        
+        head = list(itertools.islice(chunks, batch_size))
+        occurrences: Dict[str, int] = {}
+        shared = 0
+        for chunk in head:
+            text = chunk if isinstance(chunk, str) else chunk["text"]
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            occurrences[digest] = occurrences.get(digest, -1) + 1
+            shared += self.chunk_id_for(book_id, text, occurrences[digest]) in previous
+        chunks = itertools.chain(head, chunks)
+        if head and shared < len(head) * BOOK_VERSION_MIN_SHARED:
+            print(f"📚 {book_title} shares {shared}/{len(head)} opening chunks with the stored book of that title, "
+                  f"keeping it as a separate book")
+            return apart_id, {}, chunks
+        return book_id, previous, chunks
+    
+    def _build_vectors(self, batch: List[Dict[str, Any]], book_id: str, metadata: Dict[str, Any],
+                       user_email: str, book_title: str) -> List[Dict[str, Any]]:
+        """Embed one batch of chunks (carrying their "id" and "index") into upsert records"""
+        embeddings = self.generate_embeddings([chunk["text"] for chunk in batch])
+        
+        vectors = []
+        for chunk, embedding in zip(batch, embeddings):
+            # Create metadata
+            chunk_metadata = {
+                "user_email": user_email,
+                "book_title": book_title[:100],
+                "book_id": book_id,
+                "chunk_index": chunk["index"],
+                "timestamp": time.time(),
+                **metadata
+            }
+            # With the chunk store, only a short prefix stays as a fallback for hosts without its files
+            chunk_metadata["text"] = chunk["text"][:CHUNK_STORE_FALLBACK_CHARS if self.chunk_store else 1000]
+            if "start" in chunk:
+                chunk_metadata["char_start"] = chunk["start"]
+                chunk_metadata["char_end"] = chunk["end"]
+            
+            vectors.append({
+                "id": chunk["id"],
+                "values": embedding,
+                "metadata": chunk_metadata
+            })
+        return vectors
+    
+    def _call_with_retry(self, operation, **kwargs) -> int:
+        """Call an index operation, retrying with exponential backoff; returns the number of retries"""
+        for attempt in range(INGEST_UPSERT_RETRIES + 1):
+            try:
+                operation(**kwargs)
+                return attempt
+            except Exception as e:
+                if attempt == INGEST_UPSERT_RETRIES:
+                    raise
+                delay = INGEST_RETRY_BACKOFF * (2 ** attempt)
+                print(f"⚠️ Index {operation.__name__} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    def search_similar_chunks(self, query: str, user_email: str, top_k: int = 5,
+                              mode: str = RETRIEVAL_MODE) -> List[Dict]:
+        """Search for chunks similar to the query.
+        
+        In "hybrid" mode the vector hits are fused with BM25 hits from the
+        lexical index by reciprocal rank; "dense" uses the vector index only.
+        """
         if not self.initialized:
             print("Vector store not initialized")
             return []
@@ -134,26 +567,27 @@ class VectorStore:
         try:
             # Generate embedding for query
             print(f"Searching for: {query[:50]}...")
-            query_embedding = self.generate_embeddings([query])[0]
-            
-            # Search in Pinecone with metadata filter
-            results = self.index.query(
-                vector=query_embedding,
-                filter={"user_email": {"$eq": user_email}},
-                top_k=top_k,
-                include_metadata=True
-            )
-            
-            # Format results
-            chunks = []
-            for match in results.matches:
-                chunks.append({
-                    "text": match.metadata.get("text", ""),
-                    "book_title": match.metadata.get("book_title", "Unknown"),
-                    "chunk_index": match.metadata.get("chunk_index", 0),
-                    "score": match.score
-                })
+            query_embedding = self.embed_query(query)
+            
+            if self.search_result_cache:
+                cache_key = self._result_key(user_email, query, query_embedding, top_k,
+                                             self.index_version(user_email), mode)
+                cached = self.search_result_cache.get(cache_key)
+                if cached is not None:
+                    print(f"✅ Found {len(cached)} relevant chunks (cached)")
+                    return [dict(chunk) for chunk in cached]
             
+            # Search the user's namespace (or the shared one with a metadata filter)
+            results = self._query_user([query_embedding], user_email,
+                                       top_k * HYBRID_CANDIDATES_FACTOR if mode == "hybrid" else top_k)[0]
+            
+            chunks = self._format_matches(results.matches)
+            if mode == "hybrid":
+                chunks = self._fuse_lexical(query, query_embedding, user_email, chunks, top_k)
+            chunks = self._attach_texts(user_email, [chunks])[0]
+            
+            if self.search_result_cache:
+                self.search_result_cache.put(cache_key, [dict(chunk) for chunk in chunks])
             print(f"✅ Found {len(chunks)} relevant chunks")
             return chunks
             
@@ -161,21 +595,200 @@ class VectorStore:
             print(f"❌ Search failed: {e}")
             return []
     
+    def search_similar_chunks_many(self, queries: List[str], user_email: str, top_k: int = 5,
+                                   mode: str = RETRIEVAL_MODE) -> Optional[Dict[str, Any]]:
+        """Search several queries against one user's library together.
+        
+        Queries not in the caches are embedded in one model call and scored in
+        one index call (query_many on the local index, which scores them all in
+        a single pass; Pinecone has no batched query, so there they run
+        concurrently). Returns the chunks for each query, in order, with timing
+        stats for the whole batch, or None if the search failed.
+        """
+        if not self.initialized:
+            print("Vector store not initialized")
+            return None
+        
+        try:
+            started = time.perf_counter()
+            stats = {"queries": len(queries), "embedded": 0, "searched": 0}
+            keys = [self._query_key(query) for query in queries]
+            distinct: Dict[str, str] = {}  # key -> first query with that key
+            for key, query in zip(keys, queries):
+                distinct.setdefault(key, query)
+            
+            # Embed the distinct queries the embedding cache doesn't have in one forward pass
+            embeddings: Dict[str, List[float]] = {}
+            if self.query_embedding_cache:
+                for key in distinct:
+                    embedding = self.query_embedding_cache.get(key)
+                    if embedding is not None:
+                        embeddings[key] = embedding
+            missing = [key for key in distinct if key not in embeddings]
+            if missing:
+                for key, embedding in zip(missing, self.generate_query_embeddings([distinct[key] for key in missing])):
+                    embeddings[key] = embedding
+                    if self.query_embedding_cache:
+                        self.query_embedding_cache.put(key, embedding)
+            stats["embedded"] = len(missing)
+            stats["embed_seconds"] = round(time.perf_counter() - started, 4)
+            
+            # Look the results up, then search whatever is left in one go
+            search_started = time.perf_counter()
+            version = self.index_version(user_email)
+            chunks_of: Dict[str, List[Dict]] = {}
+            result_keys = {key: self._result_key(user_email, distinct[key], embeddings[key], top_k, version, mode)
+                           for key in distinct}
+            if self.search_result_cache:
+                for key in distinct:
+                    cached = self.search_result_cache.get(result_keys[key])
+                    if cached is not None:
+                        chunks_of[key] = cached
+            pending = [key for key in distinct if key not in chunks_of]
+            if pending:
+                dense_k = top_k * HYBRID_CANDIDATES_FACTOR if mode == "hybrid" else top_k
+                responses = self._query_user([embeddings[key] for key in pending], user_email, dense_k)
+                for key, response in zip(pending, responses):
+                    chunks_of[key] = self._format_matches(response.matches)
+                    if mode == "hybrid":
+                        chunks_of[key] = self._fuse_lexical(distinct[key], embeddings[key], user_email,
+                                                            chunks_of[key], top_k)
+                # One chunk store read for every query's texts
+                for key, chunks in zip(pending, self._attach_texts(user_email, [chunks_of[key] for key in pending])):
+                    chunks_of[key] = chunks
+                    if self.search_result_cache:
+                        self.search_result_cache.put(result_keys[key], chunks)
+            stats["searched"] = len(pending)
+            stats["search_seconds"] = round(time.perf_counter() - search_started, 4)
+            stats["total_seconds"] = round(time.perf_counter() - started, 4)
+            
+            print(f"✅ Searched {len(queries)} queries ({stats['embedded']} embedded, "
+                  f"{stats['searched']} searched) in {stats['total_seconds']}s")
+            return {
+                "results": [[dict(chunk) for chunk in chunks_of[key]] for key in keys],
+                "stats": stats,
+            }
+            
+        except Exception as e:
+            print(f"❌ Batch search failed: {e}")
+            return None
+    
+    def _fuse_lexical(self, query: str, query_embedding: List[float], user_email: str, dense: List[Dict],
+                      top_k: int) -> List[Dict]:
+        """Reciprocal-rank fusion of vector hits with the lexical index's BM25 hits.
+        
+        Each chunk scores sum(1 / (RRF_K + rank)) over the rankings it appears
+        in and chunks are returned in that order, the fused score as
+        "rrf_score" and the BM25 score as "bm25_score". "score" stays the
+        cosine similarity the UIs show as relevance; chunks only BM25 found are
+        fetched from the index and their cosine computed from the stored vector.
+        """
+        lexical = self.lexical_index.search(query, user_email, top_k * HYBRID_CANDIDATES_FACTOR)
+        fused: Dict[str, float] = {}
+        for ranking in ([chunk["id"] for chunk in dense], [chunk_id for chunk_id, _ in lexical]):
+            for rank, chunk_id in enumerate(ranking, start=1):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank)
+        best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        
+        by_id = {chunk["id"]: chunk for chunk in dense}
+        missing = [chunk_id for chunk_id in best if chunk_id not in by_id]
+        if missing:
+            fetched = self.index.fetch(ids=missing, **self._scope(user_email)).vectors
+            unmigrated = [chunk_id for chunk_id in missing if chunk_id not in fetched]
+            if unmigrated and self._has_legacy_vectors(user_email):
+                fetched.update(self.index.fetch(ids=unmigrated).vectors)
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            for chunk_id, vector in fetched.items():
+                values = np.asarray(vector.values, dtype=np.float32)
+                cosine = float(values @ query / (np.linalg.norm(values) or 1.0))
+                by_id[chunk_id] = self._format_chunk(chunk_id, vector.metadata, cosine)
+        
+        bm25 = dict(lexical)
+        chunks = []
+        for chunk_id in best:
+            if chunk_id in by_id:
+                chunk = dict(by_id[chunk_id])
+                chunk.update(rrf_score=round(fused[chunk_id], 6), bm25_score=bm25.get(chunk_id))
+                chunks.append(chunk)
+        return chunks
+    
+    def _attach_texts(self, user_email: str, chunk_lists: List[List[Dict]]) -> List[List[Dict]]:
+        """Fill in full chunk texts from the chunk store in one bulk read.
+        
+        Chunks the store has no text for (another host, a wiped cache, a book
+        whose ingest has not finished) keep the truncated text from their
+        metadata; misses are logged and counted in the chunk store's stats.
+        Only chunks with no text anywhere are dropped.
+        """
+        if not self.chunk_store:
+            return chunk_lists
+        ids = list(dict.fromkeys(chunk["id"] for chunks in chunk_lists for chunk in chunks))
+        if not ids:
+            return chunk_lists
+        texts = self.chunk_store.get_many(user_email, ids)
+        if len(texts) < len(ids):
+            print(f"⚠️ {len(ids) - len(texts)}/{len(ids)} chunk texts missing from the chunk store, "
+                  f"using the truncated metadata text")
+        for chunks in chunk_lists:
+            for chunk in chunks:
+                chunk["text"] = texts.get(chunk["id"], chunk["text"])
+        return [[chunk for chunk in chunks if chunk["text"]] for chunks in chunk_lists]
+    
+    @staticmethod
+    def _format_chunk(chunk_id: str, metadata: Dict[str, Any], score: Optional[float]) -> Dict:
+        return {
+            "id": chunk_id,
+            "text": metadata.get("text", ""),
+            "book_title": metadata.get("book_title", "Unknown"),
+            "chunk_index": metadata.get("chunk_index", 0),
+            "book_id": metadata.get("book_id"),
+            "char_start": metadata.get("char_start"),
+            "char_end": metadata.get("char_end"),
+            "score": score
+        }
+    
+    def _format_matches(self, matches) -> List[Dict]:
+        """Result chunks of index matches"""
+        return [self._format_chunk(match.id, match.metadata, match.score) for match in matches]
+    
     def delete_book_chunks(self, book_id: str, user_email: str) -> bool:
         """Delete all chunks for a specific book"""
         try:
-            self.index.delete(
-                filter={
-                    "book_id": {"$eq": book_id},
-                    "user_email": {"$eq": user_email}
-                }
-            )
+            self._bump_index_version(user_email)
+            if self.namespaces:
+                # The book's vectors are the ids with its prefix in the user's namespace
+                scope = self._scope(user_email)
+                for ids in list(self.index.list(prefix=f"{book_id}_", **scope)):
+                    self.index.delete(ids=ids, **scope)
+            if not self.namespaces or self._has_legacy_vectors(user_email):
+                # The shared namespace holds all of them without namespaces, the unmigrated ones with
+                self.index.delete(
+                    filter={
+                        "book_id": {"$eq": book_id},
+                        "user_email": {"$eq": user_email}
+                    }
+                )
+            self.manifests.delete(book_id)
+            self.lexical_index.delete_book(user_email, book_id)
+            if self.chunk_store:
+                self.chunk_store.delete_book(user_email, book_id)
+            self._bump_index_version(user_email)
             print(f"✅ Deleted chunks for book: {book_id}")
             return True
         except Exception as e:
             print(f"❌ Failed to delete chunks: {e}")
             return False
     
+    def query_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Hit ratios of the query embedding and search result caches"""
+        if not self.query_embedding_cache:
+            return None
+        return {
+            "embeddings": self.query_embedding_cache.stats(),
+            "results": self.search_result_cache.stats(),
+        }
+    
     def get_index_stats(self) -> Dict:
         """Get statistics about the index"""
         try:
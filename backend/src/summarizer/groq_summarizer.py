@@ -4,6 +4,7 @@ import time
 import re
 from typing import List, Dict
 from dotenv import load_dotenv
+from src.summarizer.passage_merger import PASSAGE_SEPARATOR
 
 load_dotenv()
 
@@ -110,7 +111,8 @@ class GroqSummarizer:
                 for i, chunk in enumerate(context_chunks[:15]):
                     context_parts.append(chunk["text"])
                 
-                context = " ".join(context_parts)
+                # Passages are merged, non-overlapping spans of the book; keep them apart
+                context = PASSAGE_SEPARATOR.join(context_parts)
                 
                 # Truncate if too long
                 if len(context) > 50000:
@@ -0,0 +1,101 @@
+import math
+from typing import Any, Dict, List, Tuple
+
+# Rough size of a Llama 3 token in English prose; enough to budget and report prompt size
+CHARS_PER_TOKEN = 4
+# A merged passage ranks by its best hit's score plus this share of its other hits' scores
+SUPPORT_WEIGHT = 0.25
+# Separates passages in the prompt (GroqSummarizer joins its context with it)
+PASSAGE_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _text_overlap(left: str, right: str, limit: int = 400) -> int:
+    """Length of the longest suffix of `left` that starts `right`, for hits stored without char spans"""
+    for size in range(min(len(left), len(right), limit), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _join(run: List[Dict[str, Any]]) -> str:
+    """Text of a run of adjacent hits with every overlap kept once"""
+    text = run[0]["text"]
+    for previous, hit in zip(run, run[1:]):
+        if previous.get("char_end") is not None and hit.get("char_start") is not None:
+            overlap = previous["char_end"] - hit["char_start"]
+        else:
+            overlap = _text_overlap(previous["text"], hit["text"])
+        text += hit["text"][overlap:] if overlap > 0 else " " + hit["text"]
+    return text
+
+
+def _passages(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group hits into runs of consecutive chunk_index per book and merge each run into a passage"""
+    by_book: Dict[Any, List[Dict[str, Any]]] = {}
+    for hit in hits:
+        by_book.setdefault(hit.get("book_id") or hit.get("book_title"), []).append(hit)
+
+    passages = []
+    for book_hits in by_book.values():
+        book_hits.sort(key=lambda hit: hit["chunk_index"])
+        runs = [[book_hits[0]]]
+        for hit in book_hits[1:]:
+            # The same index twice (an older copy of the chunk) merges away entirely
+            if hit["chunk_index"] <= runs[-1][-1]["chunk_index"] + 1:
+                runs[-1].append(hit)
+            else:
+                runs.append([hit])
+
+        for run in runs:
+            scores = sorted((hit["score"] or 0.0 for hit in run), reverse=True)
+            passages.append({
+                "text": _join(run),
+                "book_title": run[0].get("book_title", "Unknown"),
+                "book_id": run[0].get("book_id"),
+                "chunk_index": run[0]["chunk_index"],
+                "chunk_indices": [hit["chunk_index"] for hit in run],
+                "char_start": run[0].get("char_start"),
+                "char_end": run[-1].get("char_end"),
+                # "score" stays a hit score (what the UIs show as relevance); rank_score can exceed 1
+                "score": scores[0],
+                "rank_score": scores[0] + SUPPORT_WEIGHT * sum(scores[1:]),
+                "hits": len(run),
+            })
+    passages.sort(key=lambda passage: passage["rank_score"], reverse=True)
+    return passages
+
+
+def merge_passages(hits: List[Dict[str, Any]], top_k: int) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Merge overlapping neighbouring hits into de-duplicated passages for the prompt.
+
+    Consecutive chunks of a book overlap, so sending hits 41, 42 and 43 as-is
+    repeats the shared sentences. Hits are taken in rank order while the
+    merged context stays within what the first `top_k` hits would have cost
+    unmerged; the room freed by merging is filled with further hits. Each
+    passage keeps its best hit's "score" and is ranked by "rank_score" (best
+    score plus a share of the others); passages are returned best first,
+    with prompt size stats: the estimated tokens sent, and how many were
+    saved by removing overlaps.
+    """
+    budget = estimate_tokens(PASSAGE_SEPARATOR.join(hit["text"] for hit in hits[:top_k]))
+    chosen: List[Dict[str, Any]] = []
+    passages: List[Dict[str, Any]] = []
+    for hit in hits:
+        candidate = _passages(chosen + [hit])
+        if estimate_tokens(PASSAGE_SEPARATOR.join(passage["text"] for passage in candidate)) <= budget:
+            chosen.append(hit)
+            passages = candidate
+
+    prompt_tokens = estimate_tokens(PASSAGE_SEPARATOR.join(passage["text"] for passage in passages))
+    unmerged_tokens = estimate_tokens(PASSAGE_SEPARATOR.join(hit["text"] for hit in chosen))
+    return passages, {
+        "hits_used": len(chosen),
+        "extra_hits": max(0, len(chosen) - min(top_k, len(hits))),
+        "passages": len(passages),
+        "prompt_tokens": prompt_tokens,
+        "tokens_saved": unmerged_tokens - prompt_tokens,
+    }
@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+import zlib
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests run against the local index, with every on-disk store in a scratch directory
+_SCRATCH = tempfile.mkdtemp(prefix="booksum-tests-")
+os.environ.update({
+    "VECTOR_BACKEND": "local",
+    "LOCAL_INDEX_DIR": os.path.join(_SCRATCH, "vectors"),
+    "LEXICAL_INDEX_DIR": os.path.join(_SCRATCH, "lexical"),
+    "BOOK_MANIFEST_DIR": os.path.join(_SCRATCH, "manifests"),
+    "CHUNK_STORE_DIR": os.path.join(_SCRATCH, "chunks"),
+    "EXTRACTION_CACHE_DIR": os.path.join(_SCRATCH, "extractions"),
+    "EMBEDDING_CACHE_PATH": os.path.join(_SCRATCH, "embeddings.sqlite3"),
+    "EMBEDDING_CACHE_ENABLED": "false",
+    "EMBED_BATCHING_ENABLED": "false",
+    "QUERY_CACHE_ENABLED": "false",
+})
+
+
+def stand_in_embeddings(texts):
+    """Deterministic 384-d vectors per text, in place of the sentence-transformers model"""
+    return [np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(384).astype(np.float32).tolist()
+            for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A VectorStore on a fresh local index, with its manifests, lexical index and chunk texts under tmp_path"""
+    from src.embeddings.book_manifest import BookManifestStore
+    from src.embeddings.chunk_store import ChunkTextStore
+    from src.embeddings.lexical_index import LexicalIndex
+    from src.embeddings.local_index import LocalIndex
+    from src.embeddings.vector_store_simple import VectorStore
+
+    vector_store = VectorStore()
+    vector_store.index = LocalIndex(str(tmp_path / "vectors"))
+    vector_store.manifests = BookManifestStore(str(tmp_path / "manifests"))
+    vector_store.lexical_index = LexicalIndex(str(tmp_path / "lexical"))
+    vector_store.chunk_store = ChunkTextStore(str(tmp_path / "chunks"))
+    vector_store.generate_embeddings = stand_in_embeddings
+    return vector_store
@@ -0,0 +1,25 @@
+import threading
+
+import numpy as np
+
+from src.embeddings.bulk_embedder import BulkEmbedder
+
+
+class FakeModel:
+    def encode(self, texts, batch_size=None, show_progress_bar=False):
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_no_fork_pool_once_other_threads_run():
+    release = threading.Event()
+    thread = threading.Thread(target=release.wait)
+    thread.start()
+    try:
+        embedder = BulkEmbedder(FakeModel(), workers=4, batch_size=2)
+    finally:
+        release.set()
+        thread.join()
+
+    assert embedder._pool is None and embedder.workers == 1
+    texts = ["a", "bbbb", "cc", "ddd", "eeeee"]
+    assert embedder.encode(texts)[:, 0].tolist() == [1, 4, 2, 3, 5]
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from config import CHUNK_OVERLAP, CHUNK_SIZE
+from src.document_processor.extractor import DocumentExtractor
+
+
+def book_text(seed=7, paragraphs=120):
+    """Prose with paragraph, line and sentence breaks, plus the odd run of whitespace and an unbreakable word"""
+    rng = random.Random(seed)
+    words = ["the", "reader", "turned", "another", "page", "of", "chapter", "while", "rain", "fell", "outside"]
+    parts = []
+    for i in range(paragraphs):
+        sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(4, 30))).capitalize() + "."
+                     for _ in range(rng.randint(1, 8))]
+        paragraph = " ".join(sentences)
+        if i % 17 == 0:
+            paragraph += " " + "x" * (CHUNK_SIZE + 40)
+        if i % 11 == 0:
+            paragraph = paragraph.replace(". ", ".\n", 2)
+        parts.append(paragraph)
+    return "\n\n".join(parts) + "   \n\n  \t" + "The end."
+
+
+def segments(text, seed):
+    rng = random.Random(seed)
+    position = 0
+    while position < len(text):
+        size = rng.choice([1, 7, 120, 999, 4096])
+        yield text[position:position + size]
+        position += size
+
+
+TEXT = book_text()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_streamed_segments_chunk_like_the_whole_text(seed):
+    document = DocumentExtractor()
+    assert list(document.iter_chunks(segments(TEXT, seed))) == document.chunk_spans(TEXT)
+
+
+def test_offsets_point_at_each_chunks_text():
+    chunks = DocumentExtractor().chunk_spans(TEXT)
+    assert len(chunks) > 20
+    for chunk in chunks:
+        assert TEXT[chunk["start"]:chunk["end"]] == chunk["text"]
+        assert 0 < len(chunk["text"]) <= CHUNK_SIZE
+        assert not chunk["text"][0].isspace() and not chunk["text"][-1].isspace()
+
+
+def test_consecutive_chunks_overlap_by_at_most_the_overlap():
+    chunks = DocumentExtractor().chunk_spans(TEXT)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["start"] > previous["start"]
+        assert previous["end"] - chunk["start"] <= CHUNK_OVERLAP
+
+
+def test_every_non_whitespace_character_is_in_a_chunk():
+    covered = [False] * len(TEXT)
+    for chunk in DocumentExtractor().chunk_spans(TEXT):
+        covered[chunk["start"]:chunk["end"]] = [True] * (chunk["end"] - chunk["start"])
+    assert all(covered[i] for i, char in enumerate(TEXT) if not char.isspace())
@@ -0,0 +1,86 @@
+import random
+import re
+
+from src.document_processor.extractor import DocumentExtractor, _clean_lines, _keep_line
+
+
+NOISE_PATTERNS = [
+    r'^page\s+\d+$', r'^\d+$',
+    r'copyright\s+©', r'all rights reserved',
+    r'www\.', r'http', r'@',
+    r'newsletter', r'subscribe',
+    r'terms of service', r'privacy policy',
+    r'ebook', r'kindle', r'epub',
+    r'chapter\s+\d+',
+    r'prologue', r'epilogue', r'appendix',
+    r'illustration', r'figure', r'table',
+    r'[•\-*]\s*',
+]
+
+
+def reference_keep(line: str) -> bool:
+    """The per-line rules as they were before the noise patterns were compiled into one regex"""
+    if not line or len(line) < 20:
+        return False
+    is_noise = False
+    for pattern in NOISE_PATTERNS:
+        if re.search(pattern, line, re.IGNORECASE):
+            if len(line) > 50:
+                continue
+            is_noise = True
+            break
+    special_chars = sum(not c.isalnum() and not c.isspace() for c in line)
+    if special_chars > len(line) * 0.3:
+        return False
+    words = line.split()
+    if words:
+        uppercase_words = sum(1 for w in words if w.isupper() and len(w) > 2)
+        if uppercase_words > len(words) * 0.7:
+            return False
+    return not is_noise
+
+
+def reference_clean(text: str) -> str:
+    if not text:
+        return text
+    cleaned_lines = [line for line in (line.strip() for line in text.split('\n')) if reference_keep(line)]
+    if len(cleaned_lines) < 20:
+        return text
+    return '\n'.join(cleaned_lines)
+
+
+WORDS = ["the", "river", "Stone", "LIGHT", "OK", "a", "Chapter 12", "www.example.com", "page 4", "42",
+         "café", "naïve", "ÉCOLE", "snake_case", "—", "•", "***", "#$%", "Table", "Subscribe", "copyright ©",
+         "all rights reserved", "Прага", "東京", "x1", "I", "AN", "     ", "\t"]
+
+
+def random_line(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 14)))
+
+
+def test_keep_line_matches_reference_line_by_line():
+    rng = random.Random(3)
+    for _ in range(20000):
+        line = random_line(rng).strip()
+        assert _keep_line(line) == reference_keep(line), line
+
+
+def test_clean_lines_matches_reference():
+    rng = random.Random(7)
+    for _ in range(200):
+        text = "\n".join(random_line(rng) for _ in range(rng.randint(0, 80)))
+        kept = _clean_lines(text.split('\n'))
+        expected = reference_clean(text)
+        if len(kept) >= DocumentExtractor.min_clean_lines:
+            assert '\n'.join(kept) == expected
+        assert DocumentExtractor().clean_extracted_text(text) == expected
+
+
+def test_streaming_cleaner_matches_whole_text():
+    rng = random.Random(11)
+    extractor = DocumentExtractor()
+    for _ in range(50):
+        text = "\n".join(random_line(rng) for _ in range(rng.randint(0, 120)))
+        cuts = sorted(rng.sample(range(len(text) + 1), min(5, len(text) + 1)))
+        segments = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+        assert "".join(extractor.iter_clean_text(segments)) == extractor.clean_extracted_text(text)
@@ -0,0 +1,44 @@
+from src.document_processor.dedup import ChunkDeduplicator
+
+
+def test_report_counts_every_duplicate_but_lists_a_capped_sample():
+    deduplicator = ChunkDeduplicator(report_sample=3)
+    text = "the same paragraph of text repeated over and over in a badly scanned book"
+    chunks = [{"text": text, "start": i * 100, "end": i * 100 + len(text)} for i in range(50)]
+    chunks.append({"text": "something else entirely, with other words in it", "start": 5000, "end": 5048})
+
+    kept = list(deduplicator.filter_chunks(chunks))
+    report = deduplicator.report()
+
+    assert [chunk["start"] for chunk in kept] == [0, 5000]
+    assert report["chunks_in"] == 51
+    assert report["chunks_kept"] == 2
+    assert report["collapsed"] == 49
+    assert len(report["duplicates_sample"]) == 3
+    assert report["duplicates_sample"][0] == {"chunk": 1, "start": 100, "end": 100 + len(text), "canonical_index": 0,
+                                              "canonical_start": 0, "canonical_end": len(text)}
+
+    # The sample is capped, the mapping is not
+    assert [pointer["start"] for pointer in deduplicator.collapsed_into] == [i * 100 for i in range(1, 50)]
+    assert {pointer["canonical_index"] for pointer in deduplicator.collapsed_into} == {0}
+
+
+def test_the_full_mapping_is_persisted_with_the_cache_entry(tmp_path):
+    from src.document_processor.extraction_cache import ExtractionCache
+    from src.document_processor.extractor import DocumentExtractor
+
+    paragraph = "the same paragraph of text repeated over and over in a badly scanned book. " * 20
+    path = tmp_path / "book.txt"
+    path.write_text("\n\n".join([paragraph] * 30 + ["an ending unlike anything before it. " * 20]))
+
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    entry = cache.writer("key")
+    document = DocumentExtractor()
+    kept = list(document.stream_chunks(str(path), "txt", entry))
+    entry.commit(document.extraction_metadata)
+
+    pointers = list(cache.iter_duplicates("key"))
+    report = document.extraction_metadata["dedup"]
+    assert len(pointers) == report["collapsed"] > len(report["duplicates_sample"])
+    assert all(pointer["canonical_index"] < len(kept) for pointer in pointers)
+    assert all(kept[pointer["canonical_index"]]["start"] == pointer["canonical_start"] for pointer in pointers)
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from src.embeddings.embedding_batcher import EmbeddingBatcher
+
+
+class RecordingEncoder:
+    """Encodes each text as [len(text)] and records the batches it was called with"""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if self.fail_on and self.fail_on in texts:
+            raise RuntimeError("model crashed")
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture
+def batcher_for():
+    batchers = []
+
+    def make(encode, **settings):
+        batchers.append(EmbeddingBatcher(encode, **settings))
+        return batchers[-1]
+
+    yield make
+    for batcher in batchers:
+        batcher.close()
+
+
+def test_concurrent_requests_share_batches_of_at_most_max_size(batcher_for):
+    encoder = RecordingEncoder()
+    batcher = batcher_for(encoder, max_batch_size=4, max_wait_ms=200)
+    texts = ["x" * n for n in range(1, 11)]
+
+    # One request per caller, as concurrent /generate requests would queue them
+    futures = [batcher.submit(text) for text in texts]
+
+    assert [future.result(timeout=5) for future in futures] == [[float(len(text))] for text in texts]
+    assert sorted(len(batch) for batch in encoder.batches) == [2, 4, 4]
+    assert sorted(text for batch in encoder.batches for text in batch) == sorted(texts)
+    assert batcher.stats()["requests"] == 10
+    assert batcher.stats()["batches"] == 3
+
+
+def test_a_lone_request_is_flushed_after_the_max_wait(batcher_for):
+    encoder = RecordingEncoder()
+    batcher = batcher_for(encoder, max_batch_size=32, max_wait_ms=50)
+
+    started = time.monotonic()
+    assert batcher.encode(["alone"], timeout=5) == [[5.0]]
+    waited = time.monotonic() - started
+
+    assert 0.04 <= waited < 1.0
+    assert encoder.batches == [["alone"]]
+
+
+def test_a_failed_batch_fails_every_future_in_it(batcher_for):
+    encoder = RecordingEncoder(fail_on="poison")
+    batcher = batcher_for(encoder, max_batch_size=8, max_wait_ms=100)
+
+    futures = [batcher.submit(text) for text in ["one", "poison", "three"]]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(timeout=5)
+    assert encoder.batches == [["one", "poison", "three"]]
+
+    # The worker survives the failure
+    assert batcher.encode(["later"], timeout=5) == [[5.0]]
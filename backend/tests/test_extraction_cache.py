@@ -0,0 +1,44 @@
+import pytest
+
+from src.document_processor import extractor
+from src.document_processor.extractor import DocumentExtractor
+
+
+@pytest.mark.parametrize("setting, value", [
+    ("DEDUP_ENABLED", False),
+    ("DEDUP_JACCARD_THRESHOLD", 0.5),
+    ("BOILERPLATE_EDGE_LINES", 5),
+    ("BOILERPLATE_MIN_PAGE_RATIO", 0.9),
+    ("BOILERPLATE_WARMUP_PAGES", 3),
+    ("PDF_ENGINE_MIN_YIELD", 0.5),
+])
+def test_cache_signature_changes_with_output_settings(monkeypatch, setting, value):
+    before = DocumentExtractor().cache_signature()
+    monkeypatch.setattr(extractor, setting, value)
+    assert DocumentExtractor().cache_signature() != before
+
+
+def test_cache_signature_ignores_worker_count():
+    assert DocumentExtractor(workers=1).cache_signature() == DocumentExtractor(workers=8).cache_signature()
+
+
+def test_an_extraction_error_midway_fails_the_stream_and_is_never_cached(tmp_path, monkeypatch):
+    from src.document_processor.extraction_cache import ExtractionCache
+    from src.document_processor.formats import FORMAT_EXTRACTORS
+
+    def pages_then_failure(_, file_path):
+        for page in range(20):
+            yield f"Page {page} of a book that cannot be read to the end.\n" * 5
+        raise ValueError("corrupt page 21")
+
+    monkeypatch.setitem(FORMAT_EXTRACTORS, "broken", pages_then_failure)
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    entry = cache.writer("key")
+    document = DocumentExtractor()
+    with pytest.raises(ValueError):
+        list(document.stream_chunks(str(tmp_path / "book.broken"), "broken", entry))
+    entry.discard()
+
+    assert document.extraction_error == "corrupt page 21"
+    assert cache.lookup("key") is None
+    assert document.extract_text(str(tmp_path / "book.broken"), "broken") is None
@@ -0,0 +1,61 @@
+import zipfile
+
+from src.document_processor.formats import iter_epub_chapters, iter_html_text
+
+CONTAINER = """<?xml version="1.0"?>
+<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container" version="1.0">
+  <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+PACKAGE = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <manifest>
+    <item href="cover.jpg" media-type="image/jpeg"/>
+    <item id="nav" media-type="application/xhtml+xml"/>
+    <item id="one" href="one.xhtml" media-type="application/xhtml+xml"/>
+    <item id="two" href="two.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine><itemref idref="one"/><itemref/><itemref idref="nav"/><itemref idref="two"/></spine>
+</package>"""
+
+
+def test_epub_skips_manifest_items_without_id_or_href(tmp_path):
+    path = tmp_path / "book.epub"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("META-INF/container.xml", CONTAINER)
+        archive.writestr("OEBPS/content.opf", PACKAGE)
+        archive.writestr("OEBPS/one.xhtml", "<html><body><p>First chapter text.</p></body></html>")
+        archive.writestr("OEBPS/two.xhtml", "<html><body><p>Second chapter text.</p></body></html>")
+
+    text = "".join(iter_epub_chapters(None, str(path)))
+    assert "First chapter text." in text
+    assert "Second chapter text." in text
+    assert text.index("First") < text.index("Second")
+
+
+def html_file(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return "".join(iter_html_text(None, str(path)))
+
+
+def test_html_is_decoded_with_its_declared_charset(tmp_path):
+    body = "<p>Café crème, déjà vu — naïve</p>"
+    declared = [
+        ('<html><head><meta charset="windows-1252"></head><body>', "cp1252"),
+        ('<html><head><meta http-equiv="Content-Type" content="text/html; charset=ISO-8859-1"></head><body>',
+         "cp1252"),
+        ('<?xml version="1.0" encoding="iso-8859-15"?><html><body>', "iso-8859-15"),
+        ('<html><head><meta charset="utf-8"></head><body>', "utf-8"),
+    ]
+    for head, encoding in declared:
+        text = html_file(tmp_path, "page.html", (head + body + "</body></html>").encode(encoding, errors="replace"))
+        assert "Café crème, déjà vu" in text
+
+
+def test_undeclared_html_falls_back_to_latin1_for_stray_bytes(tmp_path):
+    data = "<p>Résumé in UTF-8</p>".encode("utf-8") + "<p>Señor in latin-1</p>".encode("latin-1")
+    text = html_file(tmp_path, "page.html", data)
+    assert "Résumé in UTF-8" in text
+    assert "Señor in latin-1" in text
+    assert "�" not in text
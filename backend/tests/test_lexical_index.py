@@ -0,0 +1,120 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from src.embeddings import vector_store_simple
+from src.embeddings.lexical_index import LexicalIndex, tokenize
+from conftest import stand_in_embeddings
+
+USER = "reader@example.com"
+
+BOOKS = {
+    "book-a": ["Whales sing to each other across the ocean",
+               "The whale surfaced, then the whale dived again",
+               "Sailors mended the nets on deck"],
+    "book-b": ["An ocean voyage of forty days and nights",
+               "Nothing about sea creatures in this chunk at all, only a long list of provisions and rope"],
+}
+
+
+def build(index, books=BOOKS, user_email=USER):
+    for book_id, texts in books.items():
+        builder = index.builder(user_email, book_id)
+        for i, text in enumerate(texts):
+            builder.add(f"{book_id}_{i}", text)
+        builder.save()
+
+
+def reference_bm25(query, books, k1, b):
+    """BM25 computed directly from the texts, with statistics over every book of the user"""
+    docs = {f"{book_id}_{i}": tokenize(text) for book_id, texts in books.items() for i, text in enumerate(texts)}
+    average_length = sum(len(tokens) for tokens in docs.values()) / len(docs)
+    scores = {}
+    for term in dict.fromkeys(tokenize(query)):
+        df = sum(term in tokens for tokens in docs.values())
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for chunk_id, tokens in docs.items():
+            tf = tokens.count(term)
+            if tf:
+                norm = k1 * (1 - b + b * len(tokens) / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+def test_scores_match_the_bm25_formula_across_books(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    build(index)
+
+    hits = index.search("whale ocean", USER, top_k=10)
+    expected = reference_bm25("whale ocean", BOOKS, index.k1, index.b)
+    assert dict(hits) == pytest.approx(expected, rel=1e-5)
+    assert [chunk_id for chunk_id, _ in hits] == sorted(expected, key=expected.get, reverse=True)
+    assert index.search("whale ocean", USER, top_k=2) == hits[:2]
+    assert index.search("the of and", USER, top_k=5) == []
+    assert index.search("whale", "someone-else@example.com", top_k=5) == []
+
+
+def test_segments_survive_a_restart_and_reload_when_rewritten(tmp_path):
+    build(LexicalIndex(str(tmp_path)))
+    reopened = LexicalIndex(str(tmp_path))
+    assert reopened.search("nets deck", USER, top_k=3)[0][0] == "book-a_2"
+    assert reopened.stats(USER)["books"] == 2
+
+    # Storing book-a again replaces its segment; the reopened index picks the new file up
+    rewritten = {"book-a": ["Only albatrosses now"], "book-b": BOOKS["book-b"]}
+    build(LexicalIndex(str(tmp_path)), {"book-a": rewritten["book-a"]})
+    segment_path = os.path.join(reopened._user_dir(USER), "book-a.npz")
+    os.utime(segment_path, ns=(os.stat(segment_path).st_mtime_ns + 10 ** 9,) * 2)
+    assert reopened.search("nets deck", USER, top_k=3) == []
+    assert dict(reopened.search("albatrosses ocean", USER, top_k=5)) == pytest.approx(
+        reference_bm25("albatrosses ocean", rewritten, reopened.k1, reopened.b), rel=1e-5)
+
+    reopened.delete_book(USER, "book-a")
+    assert reopened.search("albatrosses", USER, top_k=3) == []
+    assert reopened.stats(USER)["books"] == 1
+
+
+def book(count):
+    return [f"Paragraph {i}: " + "words of the book " * 10 for i in range(count)]
+
+
+def test_fusion_ranks_by_reciprocal_rank_over_both_lists(store):
+    texts = book(20)
+    texts[12] = "The zebra crossed the savanna at dawn, " * 4
+    store.store_chunk_stream(iter(texts), {}, USER, "Book", "digest-1")
+
+    query = "zebra savanna"
+    query_embedding = stand_in_embeddings([query])[0]
+    dense = store.search_similar_chunks(query, USER, top_k=5, mode="dense")
+    lexical = store.lexical_index.search(query, USER, 5 * vector_store_simple.HYBRID_CANDIDATES_FACTOR)
+    fused = store._fuse_lexical(query, query_embedding, USER, dense, top_k=5)
+
+    k = vector_store_simple.RRF_K
+    expected = {}
+    for ranking in ([hit["id"] for hit in dense], [chunk_id for chunk_id, _ in lexical]):
+        for rank, chunk_id in enumerate(ranking, start=1):
+            expected[chunk_id] = expected.get(chunk_id, 0.0) + 1 / (k + rank)
+    assert [hit["id"] for hit in fused] == sorted(expected, key=expected.get, reverse=True)[:5]
+    assert all(hit["rrf_score"] == round(expected[hit["id"]], 6) for hit in fused)
+    assert fused[0]["text"] == texts[12]
+    assert fused[0]["bm25_score"] == pytest.approx(dict(lexical)[fused[0]["id"]])
+
+
+def test_chunks_only_bm25_found_are_fetched_with_their_cosine(store):
+    texts = book(20)
+    texts[12] = "The zebra crossed the savanna at dawn, " * 4
+    store.store_chunk_stream(iter(texts), {}, USER, "Book", "digest-1")
+
+    query = "zebra savanna"
+    query_embedding = stand_in_embeddings([query])[0]
+    fused = store._fuse_lexical(query, query_embedding, USER, [], top_k=3)
+
+    assert [hit["chunk_index"] for hit in fused] == [12]
+    query_vector = np.asarray(query_embedding)
+    chunk_vector = np.asarray(stand_in_embeddings([texts[12]])[0])
+    cosine = chunk_vector @ query_vector / np.linalg.norm(chunk_vector) / np.linalg.norm(query_vector)
+    assert fused[0]["score"] == pytest.approx(cosine, abs=1e-2)
+    assert fused[0]["rrf_score"] == round(1 / (vector_store_simple.RRF_K + 1), 6)
+    assert fused[0]["bm25_score"] > 0
@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+
+from src.embeddings.local_index import LocalIndex
+
+DIMENSION = 8
+
+
+def vectors(count, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+
+
+def upsert(index, ids, values, user_email="reader@example.com", book_id="book"):
+    index.upsert([{"id": vector_id, "values": value.tolist(),
+                   "metadata": {"user_email": user_email, "book_id": book_id, "n": i}}
+                  for i, (vector_id, value) in enumerate(zip(ids, values))])
+
+
+def query_ids(index, vector, top_k=5, user_email="reader@example.com"):
+    response = index.query(vector=vector.tolist(), top_k=top_k, include_metadata=True,
+                           filter={"user_email": {"$eq": user_email}})
+    return [match.id for match in response.matches]
+
+
+def test_upsert_query_and_reload(tmp_path):
+    index = LocalIndex(str(tmp_path), dimension=DIMENSION)
+    values = vectors(50)
+    upsert(index, [f"v{i}" for i in range(50)], values)
+
+    assert query_ids(index, values[7], top_k=1) == ["v7"]
+    reloaded = LocalIndex(str(tmp_path), dimension=DIMENSION)
+    assert query_ids(reloaded, values[7], top_k=1) == ["v7"]
+    assert reloaded.describe_index_stats()["total_vector_count"] == 50
+
+
+def test_overwrites_leave_one_live_row_per_id(tmp_path):
+    index = LocalIndex(str(tmp_path), dimension=DIMENSION)
+    old, new = vectors(10, seed=1), vectors(10, seed=2)
+    upsert(index, [f"v{i}" for i in range(10)], old)
+    # Same id twice in one batch: the last one wins
+    upsert(index, ["v3", "v3"], np.stack([old[0], new[3]]))
+    upsert(index, [f"v{i}" for i in range(5)], new[:5])
+
+    for reopened in (index, LocalIndex(str(tmp_path), dimension=DIMENSION)):
+        stats = reopened.describe_index_stats()
+        assert stats["total_vector_count"] == 10
+        assert query_ids(reopened, new[3], top_k=1) == ["v3"]
+        fetched = reopened.fetch(["v3"]).vectors["v3"]
+        assert np.allclose(fetched.values, new[3] / np.linalg.norm(new[3]), atol=1e-2)
+
+
+def test_delete_by_id_and_filter(tmp_path):
+    index = LocalIndex(str(tmp_path), dimension=DIMENSION)
+    values = vectors(20)
+    upsert(index, [f"a{i}" for i in range(10)], values[:10], book_id="a")
+    upsert(index, [f"b{i}" for i in range(10)], values[10:], book_id="b")
+
+    index.delete(ids=["a0", "a1"])
+    index.delete(filter={"user_email": {"$eq": "reader@example.com"}, "book_id": {"$eq": "b"}})
+
+    remaining = sorted(vector_id for page in index.list() for vector_id in page)
+    assert remaining == [f"a{i}" for i in range(2, 10)]
+    assert "a0" not in query_ids(index, values[0], top_k=20)
+
+
+def test_compaction_drops_tombstones_and_keeps_live_rows(tmp_path):
+    index = LocalIndex(str(tmp_path), dimension=DIMENSION)
+    values = vectors(100)
+    upsert(index, [f"v{i}" for i in range(100)], values)
+    partition = index._partition("reader@example.com")
+    first_generation = partition.generation
+
+    # Past LOCAL_TOMBSTONE_MAX_RATIO of dead rows the partition is rewritten
+    index.delete(ids=[f"v{i}" for i in range(0, 100, 3)])
+
+    assert partition.generation == first_generation + 1
+    assert partition.dead == 0
+    assert partition.size == partition.count == 66
+    assert not any(f".{first_generation}." in name for name in os.listdir(partition.path))
+    for reopened in (index, LocalIndex(str(tmp_path), dimension=DIMENSION)):
+        assert query_ids(reopened, values[1], top_k=1) == ["v1"]
+        assert "v3" not in query_ids(reopened, values[3], top_k=100)
+        assert reopened.fetch(["v98"]).vectors["v98"].metadata["n"] == 98
+
+
+def test_appending_only_marks_the_new_rows(tmp_path):
+    index = LocalIndex(str(tmp_path), dimension=DIMENSION)
+    upsert(index, [f"v{i}" for i in range(10)], vectors(10))
+    partition = index._partition("reader@example.com")
+    partition.alive[3] = False  # a row the append must not resurrect
+    partition.dead += 1
+
+    upsert(index, ["w0", "w1"], vectors(2, seed=5))
+    assert not partition.alive[3]
+    assert partition.alive[10] and partition.alive[11]
+
+
+def test_a_busy_partition_does_not_block_other_users(tmp_path):
+    import threading
+
+    index = LocalIndex(str(tmp_path), dimension=DIMENSION)
+    upsert(index, [f"a{i}" for i in range(10)], vectors(10, seed=1), user_email="a@example.com")
+    upsert(index, [f"b{i}" for i in range(10)], vectors(10, seed=2), user_email="b@example.com")
+
+    # Stands in for a long compaction or IVF rebuild of user a's partition
+    busy = index._partition("a@example.com")
+    with busy.lock:
+        worker = threading.Thread(target=lambda: (
+            upsert(index, ["b10"], vectors(1, seed=3), user_email="b@example.com"),
+            query_ids(index, vectors(1, seed=3)[0], top_k=1, user_email="b@example.com"),
+        ))
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+
+    assert query_ids(index, vectors(1, seed=3)[0], top_k=1, user_email="b@example.com") == ["b10"]
+    assert sorted(index.fetch(ids=["a1", "b3"]).vectors) == ["a1", "b3"]
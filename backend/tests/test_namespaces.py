@@ -0,0 +1,85 @@
+from tools.migrate_namespaces import migrate
+
+USER = "reader@example.com"
+OTHER = "other@example.com"
+
+
+def book(count, prefix="Paragraph"):
+    return [f"{prefix} {i}: " + "words of the book " * 10 for i in range(count)]
+
+
+def shared_ids(store):
+    return [vector_id for page in store.index.list() for vector_id in page]
+
+
+def namespace_ids(store, user_email):
+    return [vector_id for page in store.index.list(namespace=store.namespace_for(user_email)) for vector_id in page]
+
+
+def ingest_before_namespaces(store, texts, title, user_email=USER):
+    """Store a book the way it was stored before per-user namespaces"""
+    store.namespaces = False
+    stats = store.store_chunk_stream(iter(texts), {}, user_email, title, f"digest-{title}")
+    store.namespaces = True
+    return stats
+
+
+def top_book(store, query):
+    return store.search_similar_chunks(query, USER, top_k=3, mode="dense")[0]["book_id"]
+
+
+def test_search_merges_unmigrated_vectors_with_the_users_namespace(store):
+    old = ingest_before_namespaces(store, book(10, "Old"), "old.pdf")
+    new = store.store_chunk_stream(iter(book(10, "New")), {}, USER, "new.pdf", "digest-new")
+    assert len(namespace_ids(store, USER)) == 10
+
+    # The first upload into the namespace must not hide the books still in the shared one
+    assert top_book(store, book(10, "Old")[3]) == old["book_id"]
+    assert top_book(store, book(10, "New")[3]) == new["book_id"]
+    assert USER not in store._migrated_users
+
+
+def test_reingest_moves_unmigrated_chunks_into_the_users_namespace(store):
+    old = ingest_before_namespaces(store, book(20), "book.pdf")
+
+    # A new opening chunk; the last two chunks are gone
+    edited = ["A new opening paragraph " * 5] + book(18)
+    stats = store.store_chunk_stream(iter(edited), {}, USER, "book.pdf", "digest-book.pdf", batch_size=8)
+    assert stats["book_id"] == old["book_id"]
+    assert (stats["embedded"], stats["migrated"], stats["moved"], stats["deleted"]) == (1, 18, 0, 2)
+
+    assert shared_ids(store) == []
+    assert len(namespace_ids(store, USER)) == 19
+    vectors = store.index.fetch(ids=namespace_ids(store, USER), namespace=store.namespace_for(USER)).vectors
+    assert sorted(vector.metadata["chunk_index"] for vector in vectors.values()) == list(range(19))
+    assert top_book(store, edited[5]) == old["book_id"]
+    assert USER in store._migrated_users
+
+
+def test_delete_removes_unmigrated_chunks(store):
+    old = ingest_before_namespaces(store, book(10, "Old"), "old.pdf")
+    new = store.store_chunk_stream(iter(book(10, "New")), {}, USER, "new.pdf", "digest-new")
+
+    assert store.delete_book_chunks(old["book_id"], USER)
+    assert shared_ids(store) == []
+    hits = store.search_similar_chunks(book(10, "Old")[3], USER, top_k=10, mode="dense")
+    assert {hit["book_id"] for hit in hits} == {new["book_id"]}
+
+
+def test_migration_moves_every_users_vectors(store):
+    ingest_before_namespaces(store, book(12, "Mine"), "mine.pdf")
+    ingest_before_namespaces(store, book(7, "Theirs"), "theirs.pdf", user_email=OTHER)
+
+    planned = migrate(store, batch_size=5, dry_run=True)
+    assert (planned["listed"], planned["moved"], planned["users"]) == (19, 19, 2)
+    assert len(shared_ids(store)) == 19
+
+    stats = migrate(store, batch_size=5)
+    assert (stats["moved"], stats["skipped"], stats["users"]) == (19, 0, 2)
+    assert shared_ids(store) == []
+    assert len(namespace_ids(store, USER)) == 12
+    assert len(namespace_ids(store, OTHER)) == 7
+
+    hits = store.search_similar_chunks(book(12, "Mine")[0], USER, top_k=5, mode="dense")
+    assert hits[0]["text"] == book(12, "Mine")[0]
+    assert USER in store._migrated_users
@@ -0,0 +1,66 @@
+import pytest
+
+from src.summarizer.passage_merger import SUPPORT_WEIGHT, estimate_tokens, merge_passages
+
+DOCUMENT = " ".join(f"word{i}" for i in range(600))
+SIZE, OVERLAP = 120, 30
+
+
+def chunk(index, score, book="book-a", spans=True):
+    start = index * (SIZE - OVERLAP)
+    hit = {"id": f"{book}_{index}", "text": DOCUMENT[start:start + SIZE], "book_id": book, "book_title": book,
+           "chunk_index": index, "score": score}
+    if spans:
+        hit.update(char_start=start, char_end=start + SIZE)
+    return hit
+
+
+def test_neighbouring_hits_join_into_the_original_text():
+    hits = [chunk(42, 0.9), chunk(41, 0.8), chunk(43, 0.7)]
+    passages, stats = merge_passages(hits, top_k=3)
+
+    assert len(passages) == 1
+    assert passages[0]["text"] == DOCUMENT[41 * (SIZE - OVERLAP):43 * (SIZE - OVERLAP) + SIZE]
+    assert passages[0]["chunk_indices"] == [41, 42, 43]
+    assert (passages[0]["char_start"], passages[0]["char_end"]) == (41 * (SIZE - OVERLAP), 43 * (SIZE - OVERLAP) + SIZE)
+    assert passages[0]["score"] == 0.9
+    assert passages[0]["rank_score"] == pytest.approx(0.9 + SUPPORT_WEIGHT * (0.8 + 0.7))
+    assert stats["tokens_saved"] > 0
+
+
+def test_hits_without_spans_join_on_their_text_overlap():
+    with_spans, _ = merge_passages([chunk(i, 0.5) for i in (7, 8, 9)], top_k=3)
+    without, _ = merge_passages([chunk(i, 0.5, spans=False) for i in (7, 8, 9)], top_k=3)
+    assert without[0]["text"] == with_spans[0]["text"]
+
+
+def test_the_same_chunk_index_twice_merges_away():
+    passages, _ = merge_passages([chunk(5, 0.9), chunk(5, 0.6)], top_k=2)
+    assert len(passages) == 1
+    assert passages[0]["text"] == chunk(5, 0.9)["text"]
+
+
+def test_distant_hits_and_other_books_stay_separate_best_first():
+    hits = [chunk(10, 0.4), chunk(30, 0.9), chunk(10, 0.6, book="book-b")]
+    passages, _ = merge_passages(hits, top_k=3)
+    assert [(passage["book_id"], passage["chunk_index"]) for passage in passages] == \
+        [("book-a", 30), ("book-b", 10), ("book-a", 10)]
+
+
+def test_supported_passages_rank_higher_but_keep_a_hit_score():
+    hits = [chunk(5, 0.95), chunk(20, 0.9), chunk(21, 0.9), chunk(22, 0.9)]
+    passages, _ = merge_passages(hits, top_k=4)
+    assert passages[0]["chunk_indices"] == [20, 21, 22]
+    assert passages[0]["rank_score"] > 1
+    assert all(0 <= passage["score"] <= 1 for passage in passages)
+
+
+def test_room_freed_by_merging_is_filled_with_more_hits():
+    hits = [chunk(20, 0.9), chunk(21, 0.8), chunk(22, 0.7), chunk(50, 0.6), chunk(60, 0.5)]
+    passages, stats = merge_passages(hits, top_k=3)
+
+    budget = estimate_tokens("\n\n".join(hit["text"] for hit in hits[:3]))
+    assert stats["extra_hits"] >= 1
+    assert stats["hits_used"] == 3 + stats["extra_hits"]
+    assert stats["prompt_tokens"] <= budget
+    assert passages[0]["chunk_indices"] == [20, 21, 22]
@@ -0,0 +1,204 @@
+import numpy as np
+import pytest
+
+from src.embeddings import vector_store_simple
+from src.embeddings.bulk_embedder import BulkEmbedder
+from src.embeddings.latency_index import LatencyInjectingIndex
+from conftest import stand_in_embeddings
+
+
+class FakeModel:
+    def encode(self, texts, batch_size=None, show_progress_bar=False):
+        return np.ones((len(texts), 384), dtype=np.float32)
+
+
+class RecordingCache:
+    def __init__(self):
+        self.texts = []
+
+    def get_many(self, texts):
+        self.texts.extend(texts)
+        return [None] * len(texts)
+
+    def put_many(self, texts, vectors):
+        self.texts.extend(texts)
+
+
+def test_query_embeddings_stay_out_of_the_disk_cache(store, monkeypatch):
+    monkeypatch.setattr(vector_store_simple, "SENTENCE_TRANSFORMERS_AVAILABLE", True)
+    del store.generate_embeddings
+    store.embedding_model = FakeModel()
+    store.bulk_embedder = BulkEmbedder(store.embedding_model, workers=1)
+    store.embedding_cache = RecordingCache()
+
+    store.embed_query("what happens to the lighthouse keeper?")
+    store.search_similar_chunks_many(["first question", "second question"], "reader@example.com")
+    assert store.embedding_cache.texts == []
+
+    store.generate_embeddings(["a chunk of the book"])
+    assert store.embedding_cache.texts == ["a chunk of the book", "a chunk of the book"]
+
+
+USER = "reader@example.com"
+
+
+def book(count, prefix="Paragraph"):
+    return [f"{prefix} {i}: " + "words of the book " * 10 for i in range(count)]
+
+
+def spans(texts):
+    chunks, offset = [], 0
+    for text in texts:
+        chunks.append({"text": text, "start": offset, "end": offset + len(text)})
+        offset += len(text) - 20  # neighbouring chunks overlap
+    return chunks
+
+
+def stored_positions(store, book_id):
+    ids = [vector_id for page in store.index.list(prefix=f"{book_id}_", **store._scope(USER)) for vector_id in page]
+    vectors = store.index.fetch(ids=ids, **store._scope(USER)).vectors
+    return {vector.metadata["chunk_index"]: (vector.metadata.get("char_start"), vector_id)
+            for vector_id, vector in vectors.items()}
+
+
+def test_reingest_diffs_new_moved_and_stale_chunks(store):
+    first = store.store_chunk_stream(iter(spans(book(30))), {}, USER, "Book", "digest-1", batch_size=8)
+    assert (first["embedded"], first["unchanged"], first["moved"], first["deleted"]) == (30, 0, 0, 0)
+
+    again = store.store_chunk_stream(iter(spans(book(30))), {}, USER, "Book", "digest-1", batch_size=8)
+    assert (again["embedded"], again["unchanged"], again["moved"], again["deleted"]) == (0, 30, 0, 0)
+
+    # A new opening chunk shifts every later one; the last two chunks are gone
+    edited = ["A new opening paragraph " * 5] + book(28)
+    counted = store.index = LatencyInjectingIndex(store.index, latency_ms=0)
+    stats = store.store_chunk_stream(iter(spans(edited)), {}, USER, "Book", "digest-1", batch_size=8)
+    assert (stats["embedded"], stats["unchanged"], stats["moved"], stats["deleted"]) == (1, 0, 28, 2)
+    # Moved chunks cost one fetch and one upsert per batch of 8, not a call each
+    assert counted.calls <= 2 * 4 + 1 + 1
+
+    positions = stored_positions(store, stats["book_id"])
+    assert sorted(positions) == list(range(29))
+    expected = spans(edited)
+    assert all(positions[i][0] == expected[i]["start"] for i in range(29))
+    assert len(store.manifests.load(stats["book_id"])) == 29
+
+
+def test_same_title_with_different_content_is_a_separate_book(store):
+    novel = store.store_chunk_stream(iter(book(10, "Novel")), {}, USER, "notes.pdf", "digest-novel")
+    essay = store.store_chunk_stream(iter(book(6, "Essay")), {}, USER, "notes.pdf", "digest-essay")
+
+    assert novel["book_id"] != essay["book_id"]
+    assert essay["deleted"] == 0
+    assert len(stored_positions(store, novel["book_id"])) == 10
+    assert len(stored_positions(store, essay["book_id"])) == 6
+
+    again = store.store_chunk_stream(iter(book(6, "Essay")), {}, USER, "notes.pdf", "digest-essay")
+    assert again["book_id"] == essay["book_id"]
+    assert (again["embedded"], again["unchanged"], again["deleted"]) == (0, 6, 0)
+
+
+def test_an_edited_file_under_the_same_title_replaces_the_stored_version(store):
+    first = store.store_chunk_stream(iter(spans(book(30))), {}, USER, "Book", "digest-1", batch_size=8)
+    edited = book(12) + ["A rewritten paragraph " * 6] + book(30)[13:28]
+    stats = store.store_chunk_stream(iter(spans(edited)), {}, USER, "Book", "digest-2", batch_size=8)
+
+    assert stats["book_id"] == first["book_id"]
+    assert (stats["embedded"], stats["unchanged"], stats["moved"], stats["deleted"]) == (1, 12, 15, 3)
+    assert len(stored_positions(store, first["book_id"])) == 28
+    assert store.manifests.load_version(first["book_id"])[1] == "digest-2"
+
+
+def test_hits_missing_from_the_chunk_store_keep_their_metadata_text(store, tmp_path):
+    from src.embeddings.chunk_store import ChunkTextStore
+
+    texts = [text * 3 for text in book(10)]  # longer than the metadata's prefix
+    store.store_chunk_stream(iter(texts), {}, USER, "Book", "digest-1")
+    assert store.search_similar_chunks(texts[4], USER, top_k=3, mode="dense")[0]["text"] == texts[4]
+
+    # A host that never saw the ingest (or whose cache was wiped)
+    store.chunk_store = ChunkTextStore(str(tmp_path / "elsewhere"))
+    hits = store.search_similar_chunks(texts[4], USER, top_k=3, mode="dense")
+    assert len(hits) == 3
+    assert hits[0]["text"] == texts[4][:vector_store_simple.CHUNK_STORE_FALLBACK_CHARS]
+    assert store.chunk_store.stats()["misses"] == 3
+
+
+def test_a_failing_chunk_stream_keeps_the_previous_version(store):
+    first = store.store_chunk_stream(iter(spans(book(30))), {}, USER, "Book", "digest-1", batch_size=8)
+
+    def truncated():
+        yield from spans(book(30))[:10]
+        raise ValueError("extraction failed after 10 chunks")
+
+    assert store.store_chunk_stream(truncated(), {}, USER, "Book", "digest-1", batch_size=8) is None
+    assert len(store.manifests.load(first["book_id"])) == 30
+    assert len(stored_positions(store, first["book_id"])) == 30
+
+
+def test_hybrid_hits_keep_their_cosine_score_next_to_the_fused_one(store):
+    texts = book(40)
+    texts[30] = "The zebra crossed the savanna at dawn, " * 4
+    store.store_chunk_stream(iter(texts), {}, USER, "Book", "digest-1")
+
+    query = "zebra savanna"
+    query_vector = np.asarray(stand_in_embeddings([query])[0])
+    hits = store.search_similar_chunks(query, USER, top_k=3, mode="hybrid")
+    zebra = next(hit for hit in hits if hit["text"] == texts[30])
+    chunk_vector = np.asarray(stand_in_embeddings([texts[30]])[0])
+    cosine = chunk_vector @ query_vector / np.linalg.norm(chunk_vector) / np.linalg.norm(query_vector)
+    assert zebra["score"] == pytest.approx(cosine, abs=1e-2)
+    assert zebra["bm25_score"] > 0
+    assert all(0 < hit["rrf_score"] <= round(2 / (vector_store_simple.RRF_K + 1), 6) for hit in hits)
+    assert [hit["rrf_score"] for hit in hits] == sorted((hit["rrf_score"] for hit in hits), reverse=True)
+
+
+def test_failed_index_calls_are_retried(store, monkeypatch):
+    monkeypatch.setattr(vector_store_simple, "INGEST_RETRY_BACKOFF", 0)
+    first = store.store_chunk_stream(iter(spans(book(30))), {}, USER, "Book", "digest-1", batch_size=8)
+    assert not store._has_legacy_vectors(USER)  # settled once, before the index turns flaky
+
+    # Every index call of the re-ingest (new, moved and stale chunks) fails now and then
+    store.index = LatencyInjectingIndex(store.index, latency_ms=0, failure_rate=0.25, seed=1)
+    edited = ["A new opening paragraph " * 5] + book(30)[5:] + book(40)[30:]
+    stats = store.store_chunk_stream(iter(spans(edited)), {}, USER, "Book", "digest-2", batch_size=8,
+                                     upsert_concurrency=0)
+    flaky, store.index = store.index, store.index.index
+    assert stats["book_id"] == first["book_id"]
+    assert flaky.failures > 0
+    assert stats["upsert_retries"] == flaky.failures
+    assert sorted(stored_positions(store, first["book_id"])) == list(range(len(edited)))
+
+
+def test_exhausted_retries_fail_the_ingest_and_keep_the_previous_version(store, monkeypatch):
+    monkeypatch.setattr(vector_store_simple, "INGEST_RETRY_BACKOFF", 0)
+    first = store.store_chunk_stream(iter(spans(book(30))), {}, USER, "Book", "digest-1", batch_size=8)
+    assert not store._has_legacy_vectors(USER)
+
+    store.index = LatencyInjectingIndex(store.index, latency_ms=0, failure_rate=1.0)
+    edited = book(30)[:20] + ["A new closing paragraph " * 5]
+    assert store.store_chunk_stream(iter(spans(edited)), {}, USER, "Book", "digest-2", batch_size=8,
+                                    upsert_concurrency=0) is None
+    # One call and INGEST_UPSERT_RETRIES retries, then the ingest gives up
+    assert store.index.calls == vector_store_simple.INGEST_UPSERT_RETRIES + 1
+
+    store.index = store.index.index
+    assert len(store.manifests.load(first["book_id"])) == 30
+    assert len(stored_positions(store, first["book_id"])) == 30
+
+
+def test_a_change_by_another_process_invalidates_cached_results(store):
+    from src.embeddings.query_cache import LRUTTLCache
+    from src.embeddings.vector_store_simple import VectorStore
+
+    texts = book(10)
+    stats = store.store_chunk_stream(iter(texts), {}, USER, "Book", "digest-1")
+    store.search_result_cache = LRUTTLCache(100, 600)
+    assert len(store.search_similar_chunks(texts[3], USER, top_k=3, mode="dense")) == 3
+
+    # Another worker on the same host: its own in-memory versions, the same files
+    other = VectorStore()
+    other.index, other.manifests = store.index, store.manifests
+    other.lexical_index, other.chunk_store = store.lexical_index, store.chunk_store
+    assert other.delete_book_chunks(stats["book_id"], USER)
+
+    assert store.search_similar_chunks(texts[3], USER, top_k=3, mode="dense") == []
@@ -0,0 +1,77 @@
+"""Move vectors from the shared namespace into per-user namespaces.
+
+Run from the backend directory, with the same environment as the API:
+    python tools/migrate_namespaces.py [--dry-run] [--batch-size 100] [--keep-source]
+
+Every id in the shared ("") namespace is listed first. The vectors are then
+fetched page by page with their values and metadata, upserted into the
+namespace of their user_email (VectorStore.namespace_for) and only then
+deleted from the shared namespace, so an interrupted run can simply be
+started again. Vectors without a user_email stay where they are.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.embeddings.vector_store_simple import VectorStore
+
+
+def migrate(store: VectorStore, batch_size: int = 100, dry_run: bool = False,
+            keep_source: bool = False) -> Dict[str, int]:
+    """Move the shared namespace's vectors into their users' namespaces; returns counts"""
+    stats = {"listed": 0, "moved": 0, "skipped": 0, "users": 0}
+    users = set()
+    # List everything before deleting anything, so pagination never skips ids
+    ids = [vector_id for page in store.index.list(namespace="", limit=batch_size) for vector_id in page]
+    stats["listed"] = len(ids)
+    print(f"Found {len(ids)} vectors in the shared namespace")
+
+    for start in range(0, len(ids), batch_size):
+        fetched = store.index.fetch(ids=ids[start:start + batch_size], namespace="").vectors
+        by_namespace: Dict[str, list] = {}
+        for vector_id, vector in fetched.items():
+            user_email = (vector.metadata or {}).get("user_email")
+            if not user_email:
+                stats["skipped"] += 1
+                continue
+            users.add(user_email)
+            by_namespace.setdefault(store.namespace_for(user_email), []).append(
+                {"id": vector_id, "values": list(vector.values), "metadata": vector.metadata})
+
+        for namespace, vectors in by_namespace.items():
+            if not dry_run:
+                store._call_with_retry(store.index.upsert, vectors=vectors, namespace=namespace)
+                if not keep_source:
+                    store._call_with_retry(store.index.delete, ids=[vector["id"] for vector in vectors], namespace="")
+            stats["moved"] += len(vectors)
+        print(f"Moved {stats['moved']}/{len(ids)} vectors")
+
+    stats["users"] = len(users)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=100, help="ids fetched, upserted and deleted per call")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be moved")
+    parser.add_argument("--keep-source", action="store_true", help="copy without deleting from the shared namespace")
+    args = parser.parse_args()
+
+    store = VectorStore()
+    if not store.initialized:
+        print("❌ Vector store not initialized")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    stats = migrate(store, args.batch_size, args.dry_run, args.keep_source)
+    action = "Would move" if args.dry_run else "Moved"
+    print(f"✅ {action} {stats['moved']} vectors of {stats['users']} users into per-user namespaces "
+          f"({stats['skipped']} without a user_email left in place) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -70,7 +70,7 @@ const Home = () => {
                 <input
                     type="file"
                     onChange={handleFileChange}
-                    accept=".pdf,.txt"
+                    accept=".pdf,.txt,.epub,.html,.htm"
                     style={{ display: 'none' }}
                 />
                 <div className="upload-icon-wrapper">
@@ -82,7 +82,7 @@ const Home = () => {
                 <div className="upload-subtitle" style={{ color: 'var(--text-light)' }}>
                     {file ?
                         `${(file.size / (1024 * 1024)).toFixed(2)} MB` :
-                        "Support for PDF and TXT files"
+                        "Support for PDF, EPUB, HTML and TXT files"
                     }
                 </div>
             </label>
@@ -38,6 +38,8 @@ export const document = {
         });
     },
     generate: (prompt) => api.post('/generate', { prompt, email: localStorage.getItem('user_email') || '' }),
+    // Several prompts against the library in one request; results come back in the same order
+    searchMany: (queries, topK = 5) => api.post('/search/batch', { queries, top_k: topK }),
     // Backend expects email in body? No, it extracts from token usually, but let's check backend/app.py
     // Backend: `generate_summary(req: GenerateRequest, email: str = Depends(get_current_user_email))`
     // `GenerateRequest` has `email: str` ?